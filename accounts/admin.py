@@ -1,14 +1,28 @@
 from django.contrib import admin
 from .models import CustomUser, Category, Brand, Product, Order, Message, Review
+from .sales import SalesChanges
 
 # admin.site.register(CustomUser)
 admin.site.register(Category)
 admin.site.register(Brand)
 admin.site.register(Product)
-admin.site.register(Order)
 admin.site.register(Message)
 admin.site.register(Review)
 
+
+@admin.register(Order)
+class OrderAdmin(admin.ModelAdmin):
+    # Admin edits go through the sales summary like API writes do; deletes
+    # are covered by the Order post_delete signal
+    def save_model(self, request, obj, form, change):
+        changes = SalesChanges()
+        if change:
+            changes.order_removed(Order.objects.get(pk=obj.pk))
+        super().save_model(request, obj, form, change)
+        changes.order_added(obj)
+        changes.apply()
+
+
 admin.site.site_header = 'ladyfirst.me'
 admin.site.site_title = 'ladyfirst.me'
 admin.site.site_url = 'ladyfirst.me'
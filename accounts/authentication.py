@@ -1,54 +1,73 @@
 from rest_framework.authentication import SessionAuthentication
-from django.contrib.auth.backends import BaseBackend
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
 from django.contrib.auth import get_user_model
+from django.db import router
 import logging
+import time
+
+from .models import SnapshotUser
 
 logger = logging.getLogger(__name__)
 
-class CustomAuthenticationBackend(BaseBackend):
-    def authenticate(self, request, username=None, password=None, **kwargs):
-        User = get_user_model()
+class CustomAuthenticationBackend(ModelBackend):
+    """
+    Authenticates by email, phone number or username with a single user
+    lookup and at most one password hash.
+
+    ``username`` is treated as an email if it contains '@', as a phone number
+    if it starts with '+', and as a username otherwise. Unknown users still
+    pay for one hash so response times do not reveal which accounts exist.
+    Outdated password hashes are upgraded by ``check_password`` on success.
+    """
+
+    def credentials_lookup(self, username=None, email=None, phone_number=None):
+        if email:
+            return {'email': email}
+        if phone_number:
+            return {'phone_number': normalize_phone_number(phone_number)}
         if not username:
-            logger.warning("Authentication attempted with no username.")
             return None
+        if '@' in username:
+            return {'email': username}
+        if username.startswith('+'):
+            return {'phone_number': normalize_phone_number(username)}
+        return {'username': username}
 
-        # Validate username length to prevent malformed inputs
-        if len(username) > 255:
+    def authenticate(self, request, username=None, password=None, email=None, phone_number=None, **kwargs):
+        if password is None:
+            return None
+        if username is None:
+            username = kwargs.get(get_user_model().USERNAME_FIELD)
+        lookup = self.credentials_lookup(username, email, phone_number)
+        if lookup is None:
+            logger.warning("Authentication attempted with no username.")
+            return None
+        # Validate identifier length to prevent malformed inputs
+        if any(len(str(value)) > 255 for value in lookup.values()):
             logger.warning("Authentication attempted with excessively long username.")
             return None
 
-        # Normalize phone number by removing spaces and dashes
-        if not '@' in username:
-            username = username.replace(" ", "").replace("-", "")
-
-        # Try email first
-        if '@' in username:
-            try:
-                user = User.objects.get(email=username)
-            except User.DoesNotExist:
-                logger.info(f"User with email not found (length: {len(username)}).")
-                return None
-        else:
-            # Try phone number
-            try:
-                user = User.objects.get(phone_number=username)
-            except User.DoesNotExist:
-                logger.info(f"User with phone number not found (length: {len(username)}).")
-                return None
-
-        if user and user.is_active and user.check_password(password):
+        user = get_user_model()._default_manager.filter(**lookup).first()
+        if user is None:
+            # Same cost as a real check (see ModelBackend.authenticate)
+            get_user_model()().set_password(password)
+            logger.info(f"User with {next(iter(lookup))} not found.")
+            return None
+        if user.check_password(password) and self.user_can_authenticate(user):
             logger.info(f"User {user.id} authenticated successfully.")
             return user
-        logger.warning(f"Authentication failed for user ID {user.id if user else 'unknown'}: Invalid password or inactive user.")
+        logger.warning(f"Authentication failed for user ID {user.id}: Invalid password or inactive user.")
         return None
 
-    def get_user(self, user_id):
-        try:
-            user = get_user_model().objects.get(pk=user_id)
-            return user
-        except User.DoesNotExist:
-            logger.warning(f"User with ID {user_id} not found.")
-            return None
+
+def normalize_phone_number(phone_number):
+    # Same normalization as CustomUser.save()
+    return phone_number.replace(" ", "").replace("-", "")
 
 
 class CsrfExemptSessionAuthentication(SessionAuthentication):
@@ -57,4 +76,64 @@ class CsrfExemptSessionAuthentication(SessionAuthentication):
     WARNING: Use only in development. In production, use proper CSRF handling or token-based auth.
     """
     def enforce_csrf(self, request):
-        return  # Do nothing – disables CSRF validation
\ No newline at end of file
+        return  # Do nothing – disables CSRF validation
+
+# Enough for permission checks and ownership filters; anything else loads lazily.
+# Kept in model field order, as Model.from_db expects.
+SNAPSHOT_FIELDS = tuple(
+    field.attname for field in SnapshotUser._meta.concrete_fields
+    if field.attname in ('id', 'username', 'is_active', 'is_staff', 'is_superuser')
+)
+
+# user id -> (monotonic expiry, snapshot values); one per worker process
+_user_snapshots = {}
+
+
+def invalidate_user(user_id):
+    _user_snapshots.pop(user_id, None)
+
+
+def get_user_snapshot(user_id):
+    entry = _user_snapshots.get(user_id)
+    if entry is not None and entry[0] > time.monotonic():
+        return entry[1]
+    values = SnapshotUser._base_manager.filter(pk=user_id).values_list(*SNAPSHOT_FIELDS).first()
+    if values is None:
+        invalidate_user(user_id)
+        return None
+    if len(_user_snapshots) >= settings.AUTH_USER_CACHE_MAX_ENTRIES:
+        _user_snapshots.clear()
+    _user_snapshots[user_id] = (time.monotonic() + settings.AUTH_USER_CACHE_TTL, values)
+    return values
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that skips the per-request user query.
+
+    Each worker keeps a compact snapshot (SNAPSHOT_FIELDS) of recently seen
+    users for AUTH_USER_CACHE_TTL seconds and returns it as a SnapshotUser,
+    which loads the full row only if a view reads another field. Saving or
+    deleting a user drops their snapshot in the worker that did it; other
+    workers pick the change up when the snapshot expires, so a deactivated
+    user can keep using an access token for at most AUTH_USER_CACHE_TTL
+    seconds. Set AUTH_USER_CACHE_TTL to 0 to load the user on every request.
+    """
+
+    def get_user(self, validated_token):
+        if settings.AUTH_USER_CACHE_TTL <= 0 or api_settings.USER_ID_FIELD != 'id':
+            return super().get_user(validated_token)
+        try:
+            user_id = int(validated_token[api_settings.USER_ID_CLAIM])
+        except KeyError:
+            raise InvalidToken("Token contained no recognizable user identification")
+        except (TypeError, ValueError):
+            raise AuthenticationFailed("User not found", code="user_not_found")
+
+        values = get_user_snapshot(user_id)
+        if values is None:
+            raise AuthenticationFailed("User not found", code="user_not_found")
+        user = SnapshotUser.from_db(router.db_for_read(SnapshotUser), SNAPSHOT_FIELDS, values)
+        if not user.is_active:
+            raise AuthenticationFailed("User is inactive", code="user_inactive")
+        return user
@@ -0,0 +1,103 @@
+"""
+Shared caching for the product catalog.
+
+All catalog caches (anonymous list responses, list totals and facets) live in
+the cache alias named by ``PRODUCT_LIST_CACHE_ALIAS`` and embed the current
+catalog version in their keys. Any Product, Category or Brand write bumps the
+version (see ``accounts.signals``), which orphans every older entry at once
+instead of deleting keys one by one. Works with any Django cache backend,
+including the local-memory and file-based ones.
+"""
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .filters import normalize_product_filters, filters_cache_key
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = 'catalog:version'
+HITS_KEY = 'catalog:list_hits'
+MISSES_KEY = 'catalog:list_misses'
+
+# Query parameters besides the filters that change a list response
+LIST_RESPONSE_PARAMS = ('sort_by', 'page', 'limit', 'pagination', 'cursor', 'fields', 'expand')
+
+
+def catalog_cache():
+    return caches[getattr(settings, 'PRODUCT_LIST_CACHE_ALIAS', 'default')]
+
+
+def catalog_version():
+    cache = catalog_cache()
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Seed from the clock so an evicted counter never reuses an old version
+        cache.add(VERSION_KEY, int(time.time() * 1000), None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def bump_catalog_version():
+    cache = catalog_cache()
+    try:
+        return cache.incr(VERSION_KEY)
+    except ValueError:
+        catalog_version()
+        return cache.incr(VERSION_KEY)
+
+
+def versioned_key(prefix, filters):
+    return filters_cache_key(f"{prefix}:v{catalog_version()}", filters)
+
+
+def _increment(key):
+    cache = catalog_cache()
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, None):
+            cache.incr(key)
+
+
+def list_response_key(request):
+    """Cache key for a product list response, from the normalized query parameters."""
+    params = request.query_params
+    normalized = normalize_product_filters(params)
+    for name in LIST_RESPONSE_PARAMS:
+        value = params.get(name)
+        if name in ('fields', 'expand') and value:
+            value = ','.join(sorted({part.strip() for part in value.split(',') if part.strip()}))
+        if value:
+            normalized[name] = value
+    if normalized.get('page') == '1':
+        del normalized['page']
+    # image_url is absolute, so the host is part of the response
+    normalized['host'] = request.build_absolute_uri('/')
+    return versioned_key('product_list', normalized)
+
+
+def get_list_response(key):
+    data = catalog_cache().get(key)
+    _increment(HITS_KEY if data is not None else MISSES_KEY)
+    return data
+
+
+def set_list_response(key, data):
+    catalog_cache().set(key, data, getattr(settings, 'PRODUCT_LIST_CACHE_TTL', 300))
+
+
+def list_cache_stats():
+    cache = catalog_cache()
+    hits = cache.get(HITS_KEY) or 0
+    misses = cache.get(MISSES_KEY) or 0
+    total = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": round(hits / total, 4) if total else None,
+        "catalog_version": catalog_version(),
+        "backend": settings.CACHES[getattr(settings, 'PRODUCT_LIST_CACHE_ALIAS', 'default')]['BACKEND'],
+    }
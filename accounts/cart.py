@@ -0,0 +1,158 @@
+"""
+Server-side shopping carts.
+
+Cart lines are stored as ``CartItem`` rows carrying a snapshot of the
+product's price, title, slug and image, and each user's cart is cached as a
+compact list of tuples in the ``CART_CACHE_ALIAS`` cache. Reads are served
+from that entry; a miss is rebuilt from ``CartItem`` alone, so listing a cart
+never queries Product. Writes go to the database and drop the cache entry once
+the transaction commits. Adding a line also reserves the product's stock for
+``STOCK_RESERVATION_TTL`` seconds (see ``accounts.inventory``).
+
+``checkout_cart`` turns the cart into orders through ``place_orders`` at the
+snapshotted prices and empties it in the same transaction. If a seller has
+changed a price in the meantime the checkout is refused with 409 and the
+snapshots are refreshed, so the buyer can review the new total and retry.
+"""
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework import status
+
+from .checkout import CheckoutError, PriceChanged, place_orders
+from .inventory import StockError, release, reserve
+from .models import CartItem, Product
+
+# Field order of the cached line tuples
+LINE_FIELDS = ('product_id', 'quantity', 'unit_price', 'title', 'product_slug', 'image')
+
+
+def cart_cache():
+    return caches[settings.CART_CACHE_ALIAS]
+
+
+def cart_key(user_id):
+    return f'cart:{user_id}'
+
+
+def invalidate_cart(user_id):
+    key = cart_key(user_id)
+    transaction.on_commit(lambda: cart_cache().delete(key))
+
+
+def load_cart_lines(user_id):
+    return [
+        (product_id, quantity, str(unit_price), title, slug, image)
+        for product_id, quantity, unit_price, title, slug, image in
+        CartItem.objects.filter(user_id=user_id).order_by('added_at', 'id').values_list(*LINE_FIELDS)
+    ]
+
+
+def get_cart_lines(user):
+    cache = cart_cache()
+    lines = cache.get(cart_key(user.pk))
+    if lines is None:
+        lines = load_cart_lines(user.pk)
+        cache.set(cart_key(user.pk), lines, settings.CART_CACHE_TTL)
+    return lines
+
+
+def render_cart(lines, request=None):
+    storage = Product._meta.get_field('image').storage
+    items = []
+    total = Decimal('0')
+    for product_id, quantity, unit_price, title, slug, image in lines:
+        line_total = Decimal(unit_price) * quantity
+        total += line_total
+        image_url = None
+        if image and request is not None:
+            image_url = request.build_absolute_uri(storage.url(image))
+        items.append({
+            "product": product_id,
+            "title": title,
+            "product_slug": slug,
+            "image_url": image_url,
+            "unit_price": unit_price,
+            "quantity": quantity,
+            "line_total": str(line_total),
+        })
+    return {
+        "items": items,
+        "count": sum(quantity for _, quantity, *_ in lines),
+        "total": str(total),
+    }
+
+
+def parse_quantity(value):
+    if isinstance(value, bool) or not str(value).isdigit() or int(value) < 1:
+        raise CheckoutError("quantity must be a positive integer")
+    return int(value)
+
+
+def add_item(user, product_id, quantity=1):
+    """Put ``quantity`` of a product in the user's cart, replacing any earlier quantity."""
+    if not str(product_id).isdigit():
+        raise CheckoutError(f"Product with ID {product_id} not found", status.HTTP_404_NOT_FOUND)
+    quantity = parse_quantity(quantity)
+    product = (
+        Product.objects.only('id', 'seller_id', 'second_hand_price', 'title', 'product_slug', 'image')
+        .filter(id=product_id).first()
+    )
+    if product is None:
+        raise CheckoutError(f"Product with ID {product_id} not found", status.HTTP_404_NOT_FOUND)
+    if product.seller_id == user.pk:
+        raise CheckoutError("You cannot add your own product to your cart")
+
+    snapshot = {
+        "quantity": quantity,
+        "unit_price": product.second_hand_price,
+        "title": product.title,
+        "product_slug": product.product_slug,
+        "image": product.image.name or '',
+    }
+    try:
+        with transaction.atomic():
+            created = not CartItem.objects.filter(user=user, product=product).update(**snapshot)
+            if created:
+                if CartItem.objects.filter(user=user).count() >= settings.CART_MAX_ITEMS:
+                    raise CheckoutError(f"A cart can hold at most {settings.CART_MAX_ITEMS} products")
+                CartItem.objects.create(user=user, product=product, **snapshot)
+            reserve(user, product.id, quantity)
+            invalidate_cart(user.pk)
+    except StockError as e:
+        raise CheckoutError(e.message, e.status_code)
+    return created
+
+
+def remove_item(user, product_id):
+    with transaction.atomic():
+        deleted, _ = CartItem.objects.filter(user=user, product_id=product_id).delete()
+        if deleted:
+            release(user, product_id)
+            invalidate_cart(user.pk)
+    return bool(deleted)
+
+
+def checkout_cart(user):
+    """Place orders for everything in the user's cart and empty it, atomically."""
+    try:
+        with transaction.atomic():
+            items = list(CartItem.objects.filter(user=user).values_list('product_id', 'quantity', 'unit_price'))
+            if not items:
+                raise CheckoutError("Your cart is empty")
+            orders = place_orders(
+                user,
+                [{"product": product_id, "quantity": quantity} for product_id, quantity, _ in items],
+                expected_prices={product_id: unit_price for product_id, _, unit_price in items},
+            )
+            CartItem.objects.filter(user=user).delete()
+            invalidate_cart(user.pk)
+    except PriceChanged as e:
+        with transaction.atomic():
+            for product_id, price in e.prices.items():
+                CartItem.objects.filter(user=user, product_id=product_id).update(unit_price=price)
+            invalidate_cart(user.pk)
+        raise
+    return orders
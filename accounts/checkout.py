@@ -0,0 +1,116 @@
+"""
+Set-based checkout.
+
+``place_orders`` validates a whole cart before writing anything: the products
+are loaded in one query, every line is checked up front, and the orders are
+inserted with a single ``bulk_create`` inside a transaction (together with
+the stock decrement and the sellers' sales summary updates), so a cart either
+goes through completely or not at all. The query count does not grow with
+the number of lines.
+"""
+from django.db import IntegrityError, transaction
+from rest_framework import status
+
+from .inventory import StockError, consume_reservations
+from .models import Order, Product
+from .sales import record_orders_placed
+
+
+class CheckoutError(Exception):
+    def __init__(self, message, status_code=status.HTTP_400_BAD_REQUEST):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+class PriceChanged(CheckoutError):
+    """Some products no longer cost what the buyer was shown; ``prices`` has the current ones."""
+
+    def __init__(self, prices):
+        super().__init__(
+            f"Prices changed for product(s): {', '.join(map(str, sorted(prices)))}",
+            status.HTTP_409_CONFLICT,
+        )
+        self.prices = prices
+
+
+def parse_order_lines(orders_data):
+    """Return ``[(product_id, quantity), ...]`` or raise CheckoutError."""
+    if not isinstance(orders_data, list):
+        raise CheckoutError("orders must be a list")
+
+    lines = []
+    seen = set()
+    for item in orders_data:
+        if not isinstance(item, dict):
+            raise CheckoutError("Each order must be an object with a product ID")
+        product_id = str(item.get("product"))
+        if not product_id.isdigit():
+            raise CheckoutError(f"Product with ID {item.get('product')} not found", status.HTTP_404_NOT_FOUND)
+        quantity = item.get("quantity", 1)
+        if isinstance(quantity, bool) or not str(quantity).isdigit() or int(quantity) < 1:
+            raise CheckoutError(f"Invalid quantity for product {product_id}")
+        if product_id in seen:
+            raise CheckoutError(f"Product {product_id} is listed more than once")
+        seen.add(product_id)
+        lines.append((int(product_id), int(quantity)))
+    return lines
+
+
+def place_orders(buyer, orders_data, expected_prices=None):
+    """
+    Create one order per cart line in a single transaction and return them.
+
+    ``expected_prices`` maps product ids to the unit price the buyer saw; if
+    any product's price differs, nothing is ordered and PriceChanged is raised.
+    """
+    lines = parse_order_lines(orders_data)
+
+    # Everything OrderSerializer reads comes back with the products
+    products = Product.objects.select_related('seller', 'category', 'brand').in_bulk(
+        [product_id for product_id, _ in lines]
+    )
+    for product_id, _ in lines:
+        if product_id not in products:
+            raise CheckoutError(f"Product with ID {product_id} not found", status.HTTP_404_NOT_FOUND)
+
+    if expected_prices:
+        changed = {
+            product_id: products[product_id].second_hand_price
+            for product_id, _ in lines
+            if product_id in expected_prices and products[product_id].second_hand_price != expected_prices[product_id]
+        }
+        if changed:
+            raise PriceChanged(changed)
+
+    already_ordered = list(
+        Order.objects.filter(buyer=buyer, product_id__in=products).values_list('product_id', flat=True)
+    )
+    if already_ordered:
+        raise CheckoutError(
+            f"You have already ordered product(s): {', '.join(map(str, sorted(already_ordered)))}",
+            status.HTTP_409_CONFLICT,
+        )
+
+    # bulk_create skips Order.save(), so seller and total_price are set here
+    orders = [
+        Order(
+            buyer=buyer,
+            seller_id=products[product_id].seller_id,
+            product=products[product_id],
+            quantity=quantity,
+            total_price=products[product_id].second_hand_price * quantity,
+        )
+        for product_id, quantity in lines
+    ]
+    try:
+        with transaction.atomic():
+            consume_reservations(buyer, lines)
+            Order.objects.bulk_create(orders)
+            record_orders_placed(orders)
+    except StockError as e:
+        raise CheckoutError(e.message, e.status_code)
+    except IntegrityError:
+        # A concurrent checkout ordered one of the products first
+        raise CheckoutError("One or more products were ordered in the meantime", status.HTTP_409_CONFLICT)
+    return orders
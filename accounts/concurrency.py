@@ -0,0 +1,48 @@
+"""
+Optimistic concurrency for Order and Product writes.
+
+Both models carry a ``version`` column that every write increments. Instead of
+holding row locks across a read-modify-write, updates are issued as
+``UPDATE ... WHERE id = ? AND version = ?``; when no row matches, someone else
+changed the row first and the client gets 409 with the current version.
+
+Clients pass the version they last saw as ``If-Match`` (the ``ETag`` of the
+detail response) or as ``version`` in the request body. Without one, the
+version read at the start of the request is used, so concurrent writers still
+cannot overwrite each other silently.
+"""
+from rest_framework import status
+
+
+class VersionConflict(Exception):
+    status_code = status.HTTP_409_CONFLICT
+
+    def __init__(self, message, current_version=None):
+        super().__init__(message)
+        self.message = message
+        self.current_version = current_version
+
+
+def etag(version):
+    return f'"{version}"'
+
+
+def expected_version(request):
+    """
+    Return the version the client expects to update, or None if it sent none.
+
+    Raises ValueError for a value that is not a positive integer.
+    """
+    value = request.headers.get('If-Match')
+    if value is not None:
+        value = value.strip()
+        if value.startswith('W/'):
+            value = value[2:]
+        value = value.strip('"')
+    else:
+        value = request.data.get('version') if hasattr(request.data, 'get') else None
+    if value is None or value == '':
+        return None
+    if not str(value).isdigit() or int(value) < 1:
+        raise ValueError("version must be a positive integer")
+    return int(value)
@@ -0,0 +1,109 @@
+# accounts/facets.py
+from collections import Counter
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import Case, Count, IntegerField, Value, When
+
+from .caching import catalog_cache, versioned_key
+from .filters import filter_products
+from .models import Product
+
+# Lower bounds of the price buckets; the last bucket is open-ended.
+PRICE_BUCKETS = [0, 25, 50, 100, 250, 500, 1000]
+
+FACET_CACHE_PREFIX = 'product_facets'
+
+
+def _price_bucket_expression():
+    whens = [
+        When(second_hand_price__lt=upper, then=Value(index))
+        for index, upper in enumerate(PRICE_BUCKETS[1:])
+    ]
+    return Case(*whens, default=Value(len(PRICE_BUCKETS) - 1), output_field=IntegerField())
+
+
+def _price_ranges(counts):
+    ranges = []
+    cent = Decimal('0.01')
+    for index, lower in enumerate(PRICE_BUCKETS):
+        upper = PRICE_BUCKETS[index + 1] if index + 1 < len(PRICE_BUCKETS) else None
+        # Ranges are inclusive like ?price_range=, so "25_49.99" feeds straight back in
+        high = Decimal(upper) - cent if upper is not None else None
+        ranges.append({
+            "range": f"{lower}_{high}" if high is not None else f"{lower}_",
+            "min": lower,
+            "max": upper,
+            "count": counts.get(index, 0),
+        })
+    return ranges
+
+
+def _choice_facet(counts, choices):
+    labels = dict(choices)
+    return [
+        {"value": value, "label": labels.get(value, value), "count": count}
+        for value, count in counts.most_common()
+    ]
+
+
+def _related_facet(counts, titles):
+    return [
+        {"id": pk, "title": titles[pk], "count": count}
+        for pk, count in counts.most_common()
+        if pk is not None
+    ]
+
+
+def compute_product_facets(filters):
+    """
+    Count the filtered catalog per category, brand, condition, size, color and
+    price bucket.
+
+    Everything comes from one GROUP BY over the facet columns; the per-facet
+    totals are rolled up from those groups in Python.
+    """
+    queryset, _ = filter_products(Product.objects.all(), filters)
+    groups = (
+        queryset.order_by()
+        .annotate(price_bucket=_price_bucket_expression())
+        .values('category_id', 'category__title', 'brand_id', 'brand__title',
+                'condition', 'size', 'color', 'price_bucket')
+        .annotate(count=Count('id'))
+    )
+
+    total = 0
+    categories, brands, conditions, sizes, colors, prices = (Counter() for _ in range(6))
+    category_titles, brand_titles = {}, {}
+    for group in groups:
+        count = group['count']
+        total += count
+        categories[group['category_id']] += count
+        category_titles[group['category_id']] = group['category__title']
+        brands[group['brand_id']] += count
+        brand_titles[group['brand_id']] = group['brand__title']
+        conditions[group['condition']] += count
+        sizes[group['size']] += count
+        colors[group['color']] += count
+        prices[group['price_bucket']] += count
+
+    return {
+        "found_products": total,
+        "categories": _related_facet(categories, category_titles),
+        "brands": _related_facet(brands, brand_titles),
+        "conditions": _choice_facet(conditions, Product.CONDITION_CHOICES),
+        "sizes": _choice_facet(sizes, Product.SIZE_CHOICES),
+        "colors": _choice_facet(colors, Product.COLOR_CHOICES),
+        "price_ranges": _price_ranges(prices),
+    }
+
+
+def get_product_facets(filters):
+    """Cached compute_product_facets, keyed by the normalized filter set."""
+    cache = catalog_cache()
+    key = versioned_key(FACET_CACHE_PREFIX, filters)
+    facets = cache.get(key)
+    if facets is None:
+        facets = compute_product_facets(filters)
+        cache.set(key, facets, getattr(settings, 'PRODUCT_FACETS_CACHE_TTL', 60))
+    return facets
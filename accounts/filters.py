@@ -0,0 +1,151 @@
+# accounts/filters.py
+import hashlib
+import json
+import logging
+from datetime import datetime, time
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from . import search
+from .models import Order
+
+logger = logging.getLogger(__name__)
+
+PRODUCT_SORTS = {
+    "a_z": "title",
+    "z_a": "-title",
+    "low_to_high": "second_hand_price",
+    "high_to_low": "-second_hand_price",
+    "date-acs": "created_at",
+    "date-desc": "-created_at",
+}
+
+
+def normalize_product_filters(params):
+    """
+    Parse the catalog filter query parameters into a canonical dict.
+
+    Malformed values are dropped the same way the product list always ignored
+    them, so two requests that filter the same rows normalize to the same dict.
+    """
+    filters = {}
+
+    keyword = ' '.join((params.get('keyword') or '').split())
+    if keyword:
+        filters['keyword'] = keyword.lower()
+
+    price_range = params.get('price_range')
+    if price_range:
+        try:
+            min_price, max_price = price_range.split("_")
+            # An empty upper bound ("1000_") means no upper limit
+            filters['price_range'] = [float(min_price), float(max_price) if max_price else None]
+        except ValueError:
+            logger.warning(f"Invalid price range format: {price_range}")
+
+    category = params.get('category')
+    if category and category.isdigit():
+        filters['category'] = int(category)
+
+    brand = params.get('brand')
+    if brand and brand.isdigit():
+        filters['brand'] = int(brand)
+
+    return filters
+
+
+def filter_products(queryset, filters):
+    """
+    Apply normalized catalog filters to a Product queryset.
+
+    Returns ``(queryset, ranked)`` where ``ranked`` tells whether the queryset
+    went through the full-text index and can be ordered by relevance.
+    """
+    ranked = False
+    if 'keyword' in filters:
+        queryset, ranked = search.filter_products(queryset, filters['keyword'])
+
+    if 'price_range' in filters:
+        min_price, max_price = filters['price_range']
+        queryset = queryset.filter(second_hand_price__gte=min_price)
+        if max_price is not None:
+            queryset = queryset.filter(second_hand_price__lte=max_price)
+
+    if 'category' in filters:
+        queryset = queryset.filter(category__id=filters['category'])
+
+    if 'brand' in filters:
+        queryset = queryset.filter(brand__id=filters['brand'])
+
+    return queryset, ranked
+
+
+def order_products(queryset, sort_by, ranked=False):
+    # Keyword searches default to relevance order unless a sort is requested
+    if ranked and sort_by in (None, "relevance"):
+        return search.annotate_rank(queryset).order_by("search_rank", "-created_at")
+    return queryset.order_by(PRODUCT_SORTS.get(sort_by, "-created_at"))
+
+
+def _parse_date_bound(value, end_of_day=False):
+    """Parse a YYYY-MM-DD date or ISO datetime into an aware datetime."""
+    try:
+        parsed = parse_datetime(value)
+        if parsed is None:
+            day = parse_date(value)
+            if day is None:
+                return None
+            # A bare end date includes the whole day
+            parsed = datetime.combine(day, time.max if end_of_day else time.min)
+    except ValueError:
+        return None
+    return timezone.make_aware(parsed) if timezone.is_naive(parsed) else parsed
+
+
+def normalize_order_filters(params):
+    """
+    Parse the order list filters: ``status`` and ``payment_status`` (one value or
+    a comma-separated list) and a ``created_from``/``created_to`` date range.
+    Unknown values are dropped, as with the catalog filters.
+    """
+    filters = {}
+    choices = {
+        'status': {value for value, _ in Order.ORDER_STATUS_CHOICES},
+        'payment_status': {value for value, _ in Order.PAYMENT_STATUS_CHOICES},
+    }
+    for name, allowed in choices.items():
+        values = [value.strip() for value in (params.get(name) or '').split(',') if value.strip()]
+        valid = sorted(value for value in set(values) if value in allowed)
+        if len(valid) != len(set(values)):
+            logger.warning(f"Ignoring invalid {name} filter: {params.get(name)}")
+        if valid:
+            filters[name] = valid
+
+    for name in ('created_from', 'created_to'):
+        value = params.get(name)
+        if value:
+            bound = _parse_date_bound(value, end_of_day=name == 'created_to')
+            if bound is None:
+                logger.warning(f"Invalid {name} date: {value}")
+            else:
+                filters[name] = bound
+
+    return filters
+
+
+def filter_orders(queryset, filters):
+    if 'status' in filters:
+        queryset = queryset.filter(status__in=filters['status'])
+    if 'payment_status' in filters:
+        queryset = queryset.filter(payment_status__in=filters['payment_status'])
+    if 'created_from' in filters:
+        queryset = queryset.filter(created_at__gte=filters['created_from'])
+    if 'created_to' in filters:
+        queryset = queryset.filter(created_at__lte=filters['created_to'])
+    return queryset
+
+
+def filters_cache_key(prefix, filters):
+    digest = hashlib.md5(json.dumps(filters, sort_keys=True).encode()).hexdigest()
+    return f"{prefix}:{digest}"
@@ -0,0 +1,137 @@
+"""
+Set-based order status changes for sellers.
+
+``bulk_update_status`` reads ownership and current status for the whole batch
+in one locked query, applies the change with one ``UPDATE ... WHERE id IN
+(...) AND status IN (...)`` and folds the sales summary deltas into a
+constant number of writes, so the query count does not depend on how many
+orders are in the batch.
+
+``update_order_status`` changes a single order without row locks: the new
+status is written with ``UPDATE ... WHERE version = ? AND status = ?`` so a
+concurrent change, or a transition that is no longer allowed, is a 409.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from rest_framework import status
+
+from .concurrency import VersionConflict
+from .models import Order
+from .sales import SalesChanges
+
+UPDATED = 'updated'
+UNCHANGED = 'unchanged'
+NOT_FOUND = 'not_found'
+INVALID_TRANSITION = 'invalid_transition'
+
+
+class OrderStatusError(Exception):
+    def __init__(self, message, status_code=status.HTTP_400_BAD_REQUEST):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+def parse_order_ids(order_ids):
+    if not isinstance(order_ids, list) or not order_ids:
+        raise OrderStatusError("order_ids must be a non-empty list")
+    if len(order_ids) > settings.BULK_ORDER_STATUS_MAX_IDS:
+        raise OrderStatusError(f"At most {settings.BULK_ORDER_STATUS_MAX_IDS} orders can be updated at once")
+    if not all(str(order_id).isdigit() for order_id in order_ids):
+        raise OrderStatusError("order_ids must contain integer order IDs")
+    # Keep the caller's order but report each id once
+    return list(dict.fromkeys(int(order_id) for order_id in order_ids))
+
+
+def bulk_update_status(seller, order_ids, target):
+    """
+    Move the seller's orders in ``order_ids`` to ``target``.
+
+    Returns ``[{"id": ..., "result": ...}, ...]`` in request order. Orders
+    that do not exist or belong to another seller are both ``not_found``.
+    """
+    if target not in dict(Order.ORDER_STATUS_CHOICES):
+        raise OrderStatusError("Invalid status")
+    order_ids = parse_order_ids(order_ids)
+    sources = Order.statuses_leading_to(target)
+
+    with transaction.atomic():
+        rows = {
+            row['id']: row
+            for row in Order.objects.select_for_update()
+            .filter(id__in=order_ids, seller=seller)
+            .values('id', 'seller_id', 'status', 'payment_status', 'total_price', 'created_at')
+        }
+
+        results = []
+        changes = SalesChanges()
+        to_update = []
+        for order_id in order_ids:
+            row = rows.get(order_id)
+            if row is None:
+                results.append({"id": order_id, "result": NOT_FOUND})
+            elif row['status'] == target:
+                results.append({"id": order_id, "result": UNCHANGED})
+            elif row['status'] not in sources:
+                results.append({"id": order_id, "result": INVALID_TRANSITION, "status": row['status']})
+            else:
+                results.append({"id": order_id, "result": UPDATED})
+                to_update.append(order_id)
+                changes.state_changed(
+                    row['seller_id'], row['created_at'],
+                    (row['status'], row['payment_status'], row['total_price']),
+                    (target, row['payment_status'], row['total_price']),
+                )
+
+        if to_update:
+            # The status predicate re-checks the transition at write time
+            updated = Order.objects.filter(id__in=to_update, seller=seller, status__in=sources).update(
+                status=target, version=F('version') + 1,
+            )
+            if updated != len(to_update):
+                raise OrderStatusError("Some orders changed while updating; please retry", status.HTTP_409_CONFLICT)
+            changes.apply()
+    return results
+
+
+def update_order_status(seller, order_id, target, expected_version=None):
+    """
+    Move one of the seller's orders to ``target``. Returns ``(result, version)``.
+
+    Raises Order.DoesNotExist, VersionConflict when the order is not at
+    ``expected_version`` or changed concurrently, and OrderStatusError (409)
+    for a transition ``STATUS_TRANSITIONS`` does not allow.
+    """
+    if target not in dict(Order.ORDER_STATUS_CHOICES):
+        raise OrderStatusError("Invalid status")
+    row = (
+        Order.objects.filter(id=order_id, seller=seller)
+        .values('seller_id', 'status', 'payment_status', 'total_price', 'created_at', 'version').first()
+    )
+    if row is None:
+        raise Order.DoesNotExist
+    if expected_version is not None and row['version'] != expected_version:
+        raise VersionConflict("Order was modified by another request.", row['version'])
+    if row['status'] == target:
+        return UNCHANGED, row['version']
+    if target not in Order.STATUS_TRANSITIONS[row['status']]:
+        raise OrderStatusError(
+            f"Cannot change status from {row['status']} to {target}", status.HTTP_409_CONFLICT,
+        )
+
+    with transaction.atomic():
+        updated = Order.objects.filter(id=order_id, version=row['version'], status=row['status']).update(
+            status=target, version=F('version') + 1,
+        )
+        if not updated:
+            current = Order.objects.filter(id=order_id).values_list('version', flat=True).first()
+            raise VersionConflict("Order was modified by another request.", current)
+        changes = SalesChanges()
+        changes.state_changed(
+            row['seller_id'], row['created_at'],
+            (row['status'], row['payment_status'], row['total_price']),
+            (target, row['payment_status'], row['total_price']),
+        )
+        changes.apply()
+    return UPDATED, row['version'] + 1
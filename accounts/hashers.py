@@ -0,0 +1,24 @@
+"""
+Password hashers whose cost comes from settings.
+
+``PASSWORD_HASH_ALGORITHM`` picks which of these is listed first in
+``PASSWORD_HASHERS`` and ``PASSWORD_HASH_ITERATIONS`` /
+``PASSWORD_HASH_SCRYPT_WORK_FACTOR`` set its cost. They keep Django's
+algorithm names, so existing hashes still verify; when the profile changes,
+``check_password`` sees ``must_update()`` and re-hashes the password on the
+user's next successful login.
+"""
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher, ScryptPasswordHasher
+
+
+class TunablePBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    @property
+    def iterations(self):
+        return settings.PASSWORD_HASH_ITERATIONS
+
+
+class TunableScryptPasswordHasher(ScryptPasswordHasher):
+    @property
+    def work_factor(self):
+        return settings.PASSWORD_HASH_SCRYPT_WORK_FACTOR
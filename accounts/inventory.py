@@ -0,0 +1,148 @@
+"""
+Product stock and time-limited reservations.
+
+Stock only ever changes through conditional UPDATEs: ``take_stock`` moves the
+quantities for a whole cart in one ``UPDATE ... SET stock = stock - CASE ...
+WHERE id IN (...) AND stock >= CASE ...`` and succeeds only if every row
+matched, so two buyers can never both get the last item.
+
+Putting a product in the cart reserves it: the units leave ``stock`` and are
+held by a ``StockReservation`` until ``STOCK_RESERVATION_TTL`` runs out.
+Checkout consumes the buyer's reservations, and the ``release_reservations``
+sweeper returns expired ones to stock. A reservation is consumed or released
+by deleting its row and the count of deleted rows is checked, so the same
+units can never be both sold and returned.
+
+The stock UPDATEs bypass ``Product.save()`` and so the post_save signal; they
+bump the catalog version themselves once the transaction commits.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, IntegerField, OuterRef, Subquery, Sum, Value, When
+from django.utils import timezone
+from rest_framework import status
+
+from .caching import bump_catalog_version
+from .models import Product, StockReservation
+
+
+class StockError(Exception):
+    def __init__(self, message, status_code=status.HTTP_409_CONFLICT):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+def _per_product(deltas, default=0):
+    return Case(
+        *[When(id=product_id, then=Value(delta)) for product_id, delta in deltas.items()],
+        default=Value(default), output_field=IntegerField(),
+    )
+
+
+def take_stock(deltas):
+    """
+    Apply ``{product_id: units}`` to stock in one statement; negative units
+    are returned. Must run inside a transaction. Raises StockError naming the
+    products that are short, in which case nothing is changed.
+    """
+    deltas = {product_id: delta for product_id, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    updated = Product.objects.filter(id__in=deltas, stock__gte=_per_product(deltas)).update(
+        stock=F('stock') - _per_product(deltas),
+        version=F('version') + 1,
+    )
+    if updated != len(deltas):
+        available = dict(Product.objects.filter(id__in=deltas).values_list('id', 'stock'))
+        short = sorted(product_id for product_id, delta in deltas.items() if available.get(product_id, 0) < delta)
+        raise StockError(f"Not enough stock for product(s): {', '.join(map(str, short))}")
+    transaction.on_commit(bump_catalog_version)
+
+
+def consume_reservations(user, lines):
+    """
+    Take stock for checkout ``lines`` (``[(product_id, quantity), ...]``),
+    using the user's reservations first. Must run inside a transaction.
+    """
+    held = dict(
+        StockReservation.objects.filter(user=user, product_id__in=[product_id for product_id, _ in lines])
+        .values_list('product_id', 'quantity')
+    )
+    # A larger reservation than the order gives the difference back
+    take_stock({product_id: quantity - held.get(product_id, 0) for product_id, quantity in lines})
+    if held:
+        deleted, _ = StockReservation.objects.filter(user=user, product_id__in=held).delete()
+        if deleted != len(held):
+            # The sweeper released one of them after it was read
+            raise StockError("Your reservation expired while checking out; please try again")
+
+
+def reserve(user, product_id, quantity):
+    """
+    Hold ``quantity`` units of a product for the user. Changing the quantity
+    of a live reservation keeps its expiry, so a cart cannot hold stock past
+    ``STOCK_RESERVATION_TTL`` by being edited; an expired one starts afresh.
+    """
+    now = timezone.now()
+    existing = (
+        StockReservation.objects.filter(user=user, product_id=product_id)
+        .values('id', 'quantity', 'expires_at').first()
+    )
+    held = existing['quantity'] if existing else 0
+    if existing and existing['expires_at'] > now:
+        expires_at = existing['expires_at']
+    else:
+        expires_at = now + timedelta(seconds=settings.STOCK_RESERVATION_TTL)
+    try:
+        with transaction.atomic():
+            take_stock({product_id: quantity - held})
+            if existing is None:
+                StockReservation.objects.create(user=user, product_id=product_id, quantity=quantity, expires_at=expires_at)
+            elif not StockReservation.objects.filter(id=existing['id'], quantity=held).update(
+                quantity=quantity, expires_at=expires_at,
+            ):
+                raise StockError("Your reservation changed; please try again")
+    except IntegrityError:
+        raise StockError("Your reservation changed; please try again")
+    return expires_at
+
+
+def release(user, product_id):
+    """Return the user's reserved units of a product to stock. Returns the number released."""
+    existing = StockReservation.objects.filter(user=user, product_id=product_id).values('id', 'quantity').first()
+    if existing is None:
+        return 0
+    with transaction.atomic():
+        if not StockReservation.objects.filter(id=existing['id'], quantity=existing['quantity']).delete()[0]:
+            return 0
+        take_stock({product_id: -existing['quantity']})
+    return existing['quantity']
+
+
+def release_expired(batch_size=500, now=None):
+    """Return up to ``batch_size`` expired reservations to stock. Returns how many were released."""
+    now = now or timezone.now()
+    with transaction.atomic():
+        ids = list(
+            StockReservation.objects.select_for_update(skip_locked=True)
+            .filter(expires_at__lte=now).order_by('expires_at')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            return 0
+        expired = StockReservation.objects.filter(id__in=ids)
+        # Both statements see the same rows: the first write holds the lock until commit
+        held = (
+            expired.filter(product_id=OuterRef('pk')).order_by()
+            .values('product_id').annotate(total=Sum('quantity')).values('total')
+        )
+        Product.objects.filter(id__in=expired.values('product_id')).update(
+            stock=F('stock') + Subquery(held, output_field=IntegerField()),
+            version=F('version') + 1,
+        )
+        released, _ = expired.delete()
+        transaction.on_commit(bump_catalog_version)
+    return released
@@ -0,0 +1,139 @@
+import itertools
+import statistics
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import override_settings
+from rest_framework.test import APIClient
+
+from accounts.models import CustomUser
+
+FLOOD_CACHE_ALIAS = 'auth-flood'
+
+
+class Command(BaseCommand):
+    help = (
+        "Load test for the login throttles: legitimate users log in while attacker threads "
+        "flood POST /api/auth/login/ with guessed credentials from a few addresses at a fixed offered rate. Runs "
+        "without a flood, with a flood and no throttling, and with a flood under "
+        "AUTH_THROTTLE_RATES. Synthetic users are committed (the threads use their own "
+        "connections) and deleted afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=50, help="Legitimate accounts, each on its own address.")
+        parser.add_argument('--user-threads', type=int, default=2, help="Concurrent legitimate clients.")
+        parser.add_argument('--attackers', type=int, default=8, help="Attacker threads.")
+        parser.add_argument(
+            '--flood-rate', type=float, default=100.0,
+            help="Attack requests per second offered in total, whether or not earlier ones were answered.",
+        )
+        parser.add_argument('--attacker-ips', type=int, default=2, help="Addresses the attackers share.")
+        parser.add_argument('--duration', type=float, default=15.0, help="Seconds per phase.")
+        parser.add_argument(
+            '--iterations', type=int, default=100000,
+            help="PASSWORD_HASH_ITERATIONS during the test (lower than production to keep runs short).",
+        )
+
+    def handle(self, *args, **options):
+        prefix = f"flood-{uuid.uuid4().hex[:8]}"
+        caches = {
+            **settings.CACHES,
+            FLOOD_CACHE_ALIAS: {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': prefix},
+        }
+        with override_settings(PASSWORD_HASH_ITERATIONS=options['iterations'], CACHES=caches,
+                               AUTH_THROTTLE_CACHE_ALIAS=FLOOD_CACHE_ALIAS):
+            users = []
+            for i in range(options['users']):
+                user = CustomUser(username=f'{prefix}-{i}', email=f'{prefix}-{i}@example.invalid')
+                user.set_password('legit-password')
+                users.append(user)
+            CustomUser.objects.bulk_create(users)
+            try:
+                self.stdout.write(
+                    f"{'phase':>18} {'logins/s':>9} {'2nd half /s':>13} {'p50 ms':>7} {'p95 ms':>7} {'failed':>6} "
+                    f"{'flood req/s':>11} {'flood hashed':>12} {'throttled':>9}"
+                )
+                phases = [
+                    ('no flood', 0, settings.AUTH_THROTTLE_RATES),
+                    ('flood, unthrottled', options['attackers'], {}),
+                    ('flood, throttled', options['attackers'], settings.AUTH_THROTTLE_RATES),
+                ]
+                for name, attackers, rates in phases:
+                    with override_settings(AUTH_THROTTLE_RATES=rates):
+                        self.run_phase(name, users, attackers, options)
+            finally:
+                CustomUser.objects.filter(username__startswith=prefix).delete()
+
+    def run_phase(self, name, users, attackers, options):
+        from django.core.cache import caches
+        caches[FLOOD_CACHE_ALIAS].clear()
+        deadline = time.perf_counter() + options['duration']
+        # Throttled floods get their initial burst through first; the second half shows the steady state
+        halfway = deadline - options['duration'] / 2
+        legit = []
+        flood = []
+        lock = threading.Lock()
+        accounts = itertools.cycle(enumerate(users))
+
+        def legitimate_client():
+            client = APIClient(HTTP_HOST='localhost')
+            try:
+                while time.perf_counter() < deadline:
+                    with lock:
+                        index, user = next(accounts)
+                    started = time.perf_counter()
+                    response = client.post(
+                        '/api/auth/login/', {'email': user.email, 'password': 'legit-password'},
+                        format='json', REMOTE_ADDR=f'10.0.{index // 250}.{index % 250 + 1}',
+                    )
+                    finished = time.perf_counter()
+                    with lock:
+                        legit.append((response.status_code, (finished - started) * 1000, finished >= halfway))
+            finally:
+                connection.close()
+
+        def attacker(number):
+            client = APIClient(HTTP_HOST='localhost')
+            address = f'203.0.113.{number % options["attacker_ips"] + 1}'
+            interval = attackers / options['flood_rate']
+            next_send = time.perf_counter() + interval * number / attackers
+            try:
+                for guess in itertools.count():
+                    # Open loop: send on schedule; a slow server does not slow the attacker
+                    time.sleep(max(0.0, next_send - time.perf_counter()))
+                    next_send += interval
+                    if time.perf_counter() >= deadline:
+                        break
+                    response = client.post(
+                        '/api/auth/login/',
+                        {'email': f'victim{number}-{guess}@example.invalid', 'password': 'guess'},
+                        format='json', REMOTE_ADDR=address,
+                    )
+                    with lock:
+                        flood.append(response.status_code)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=legitimate_client) for _ in range(options['user_threads'])]
+        threads += [threading.Thread(target=attacker, args=(number,)) for number in range(attackers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        ok = sorted(latency for code, latency, _ in legit if code == 200)
+        steady = sum(1 for code, _, late in legit if code == 200 and late)
+        failed = sum(1 for code, _, _ in legit if code != 200)
+        p50 = statistics.median(ok) if ok else 0
+        p95 = ok[max(0, int(len(ok) * 0.95) - 1)] if ok else 0
+        throttled = sum(1 for code in flood if code == 429)
+        self.stdout.write(
+            f"{name:>18} {len(ok) / options['duration']:>9.1f} {steady / (options['duration'] / 2):>13.1f} "
+            f"{p50:>7.0f} {p95:>7.0f} {failed:>6} "
+            f"{len(flood) / options['duration']:>11.1f} {len(flood) - throttled:>12} {throttled:>9}"
+        )
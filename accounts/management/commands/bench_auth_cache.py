@@ -0,0 +1,73 @@
+import statistics
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from accounts import authentication
+from accounts.models import Category, CustomUser, Product
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure JWT-authenticated GET /api/auth/user/ and /api/auth/my-products/ on one thread, "
+        "loading the user on every request (AUTH_USER_CACHE_TTL=0) and with the per-worker user "
+        "snapshot. Synthetic rows are created in a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500, help="Timed requests per endpoint and mode.")
+        parser.add_argument('--products', type=int, default=20, help="Products owned by the benchmark user.")
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, options):
+        user = CustomUser.objects.create(
+            username='bench-auth', email='bench-auth@example.invalid', country='Myanmar', city='Yangon',
+            full_address='No. 1, Example Road', weight_kg=55, height_cm=165, chest_bust=86, waist=66,
+            hip=92, inseam=76, foot_size_us=7,
+        )
+        category = Category.objects.create(title='Bench category', category_slug='bench-auth-category')
+        Product.objects.bulk_create([
+            Product(
+                seller=user, title=f'Bench product {i}', product_slug=f'bench-auth-product-{i}',
+                description='Synthetic product', second_hand_price=Decimal('19.99'), category=category,
+            )
+            for i in range(options['products'])
+        ])
+        client = APIClient(HTTP_HOST='localhost')
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+
+        self.stdout.write(f"{'endpoint':>22} {'user cache':>11} {'queries':>8} {'p50 ms':>7} {'req/s':>7}")
+        for path in ('/api/auth/user/', '/api/auth/my-products/'):
+            for label, ttl in (('off', 0), ('snapshot', 30)):
+                with override_settings(AUTH_USER_CACHE_TTL=ttl):
+                    authentication._user_snapshots.clear()
+                    client.get(path)  # warm up (and fill the snapshot)
+                    timings = []
+                    started = time.perf_counter()
+                    for _ in range(options['requests']):
+                        with CaptureQueriesContext(connection) as queries:
+                            request_started = time.perf_counter()
+                            response = client.get(path)
+                            timings.append((time.perf_counter() - request_started) * 1000)
+                        assert response.status_code == 200, response.content
+                    elapsed = time.perf_counter() - started
+                self.stdout.write(
+                    f"{path:>22} {label:>11} {len(queries):>8} {statistics.median(timings):>7.2f} "
+                    f"{options['requests'] / elapsed:>7.0f}"
+                )
@@ -0,0 +1,172 @@
+import itertools
+import random
+import statistics
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from accounts import search
+from accounts.filters import PRODUCT_SORTS, filter_products, order_products
+from accounts.models import CustomUser, Category, Brand, Product
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the product catalog filter/sort combinations against a synthetic "
+        "catalog and print EXPLAIN QUERY PLAN output and timings. The synthetic rows "
+        "are created inside a transaction that is rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=50000)
+        parser.add_argument('--categories', type=int, default=20)
+        parser.add_argument('--brands', type=int, default=50)
+        parser.add_argument('--sellers', type=int, default=500)
+        parser.add_argument('--repeat', type=int, default=5, help="Timed runs per query (median is reported).")
+        parser.add_argument('--page-size', type=int, default=20)
+        parser.add_argument('--analyze', action='store_true', help="Run ANALYZE after loading the synthetic rows.")
+        parser.add_argument('--quiet-plans', action='store_true', help="Only print the summary table.")
+        parser.add_argument('--fail-on-scan', action='store_true', help="Exit with an error if any query scans the product table.")
+
+    def handle(self, *args, **options):
+        self.options = options
+        random.seed(1234)
+        try:
+            with transaction.atomic():
+                self.populate()
+                results = self.run_benchmarks()
+                raise Rollback
+        except Rollback:
+            pass
+
+        scans = [name for name, plan, _, _ in results if self.is_table_scan(plan)]
+        sorts = [name for name, plan, _, _ in results if 'USE TEMP B-TREE' in plan]
+        self.stdout.write("")
+        self.stdout.write(f"{'query':<48} {'page ms':>9} {'count ms':>9}  plan")
+        for name, plan, page_ms, count_ms in results:
+            flag = 'TABLE SCAN' if name in scans else ('temp sort' if name in sorts else 'index')
+            self.stdout.write(f"{name:<48} {page_ms:>9.2f} {count_ms:>9.2f}  {flag}")
+        self.stdout.write("")
+        self.stdout.write(f"{len(results)} queries, {len(scans)} table scans, {len(sorts)} temp sorts")
+        if scans and options['fail_on_scan']:
+            raise CommandError(f"Table scans in: {', '.join(scans)}")
+
+    def populate(self):
+        opts = self.options
+        self.stdout.write(f"Creating {opts['products']} synthetic products...")
+        started = time.perf_counter()
+
+        sellers = CustomUser.objects.bulk_create([
+            CustomUser(username=f'bench-seller-{i}', email=f'bench-seller-{i}@example.invalid')
+            for i in range(opts['sellers'])
+        ])
+        categories = Category.objects.bulk_create([
+            Category(title=f'Bench category {i}', category_slug=f'bench-category-{i}')
+            for i in range(opts['categories'])
+        ])
+        brands = Brand.objects.bulk_create([
+            Brand(title=f'Bench brand {i}', brand_slug=f'bench-brand-{i}')
+            for i in range(opts['brands'])
+        ])
+        words = ['jacket', 'dress', 'coat', 'skirt', 'leather', 'denim', 'silk', 'vintage', 'summer', 'wool']
+        now = timezone.now()
+        conditions = [choice for choice, _ in Product.CONDITION_CHOICES]
+        sizes = [choice for choice, _ in Product.SIZE_CHOICES]
+        colors = [choice for choice, _ in Product.COLOR_CHOICES]
+
+        batch = []
+        for i in range(opts['products']):
+            batch.append(Product(
+                seller=random.choice(sellers),
+                title=f"{' '.join(random.sample(words, 3))} {i}",
+                product_slug=f'bench-product-{i}',
+                description=' '.join(random.choices(words, k=12)),
+                second_hand_price=Decimal(random.randint(100, 100000)) / 100,
+                category=random.choice(categories),
+                brand=random.choice(brands) if random.random() < 0.9 else None,
+                condition=random.choice(conditions),
+                size=random.choice(sizes),
+                color=random.choice(colors),
+            ))
+            if len(batch) >= 2000:
+                self.insert_products(batch, now)
+                batch = []
+        if batch:
+            self.insert_products(batch, now)
+
+        if opts['analyze'] and connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE")
+
+        self.sellers, self.categories, self.brands = sellers, categories, brands
+        self.stdout.write(f"Loaded in {time.perf_counter() - started:.1f}s")
+
+    def insert_products(self, batch, now):
+        created = Product.objects.bulk_create(batch)
+        # auto_now_add would stamp every row with the same instant; spread them out
+        for product in created:
+            product.created_at = now - timedelta(minutes=random.randint(0, 525600))
+        Product.objects.bulk_update(created, ['created_at'])
+        search.index_products([product.pk for product in created])
+
+    def combinations(self):
+        category = self.categories[0].pk
+        brand = self.brands[0].pk
+        filter_sets = {
+            'all': {},
+            'category': {'category': category},
+            'brand': {'brand': brand},
+            'price': {'price_range': [50.0, 150.0]},
+            'category+price': {'category': category, 'price_range': [50.0, 150.0]},
+            'brand+price': {'brand': brand, 'price_range': [50.0, 150.0]},
+            'category+brand': {'category': category, 'brand': brand},
+            'keyword': {'keyword': 'leather jacket'},
+        }
+        for (filter_name, filters), sort_by in itertools.product(filter_sets.items(), PRODUCT_SORTS):
+            queryset, ranked = filter_products(Product.objects.all(), filters)
+            yield f"{filter_name} / {sort_by}", order_products(queryset, sort_by, ranked)
+
+        queryset, ranked = filter_products(Product.objects.all(), filter_sets['keyword'])
+        yield "keyword / relevance", order_products(queryset, None, ranked)
+
+        seller = self.sellers[0]
+        yield "seller / date-desc", Product.objects.filter(seller=seller).order_by('-created_at')
+        yield "seller username / date-desc", Product.objects.filter(seller__username=seller.username).order_by('-created_at')
+
+    def run_benchmarks(self):
+        results = []
+        page_size = self.options['page_size']
+        for name, queryset in self.combinations():
+            page = queryset[:page_size]
+            plan = page.explain()
+            page_ms = self.time(lambda: list(page.all()))
+            count_ms = self.time(lambda: queryset.order_by().values('pk')[:10001].count())
+            if not self.options['quiet_plans']:
+                self.stdout.write(f"\n-- {name}\n{plan}")
+            results.append((name, plan, page_ms, count_ms))
+        return results
+
+    def time(self, func):
+        timings = []
+        for _ in range(self.options['repeat']):
+            started = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
+
+    @staticmethod
+    def is_table_scan(plan):
+        table = Product._meta.db_table
+        for line in plan.splitlines():
+            line = line.strip(' |-`')
+            if line.startswith(f"SCAN {table}") and 'USING' not in line:
+                return True
+        return False
@@ -0,0 +1,64 @@
+import statistics
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from accounts.models import CustomUser, Category, Product, Order
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Time POST /api/auth/place-order/ for growing cart sizes and report the query count "
+        "per request. Synthetic rows are created in a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1,5,10,25,50', help="Comma-separated cart sizes.")
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['sizes'].split(',')]
+        try:
+            with transaction.atomic():
+                self.run_benchmarks(sizes, options['repeat'])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run_benchmarks(self, sizes, repeat):
+        seller = CustomUser.objects.create(username='bench-seller', email='bench-seller@example.invalid')
+        buyer = CustomUser.objects.create(username='bench-buyer', email='bench-buyer@example.invalid')
+        category = Category.objects.create(title='Bench category', category_slug='bench-category')
+        products = Product.objects.bulk_create([
+            Product(
+                seller=seller, title=f'Bench product {i}', product_slug=f'bench-product-{i}',
+                description='Synthetic product', second_hand_price=Decimal('19.99'), category=category,
+            )
+            for i in range(max(sizes))
+        ])
+        client = APIClient(HTTP_HOST='localhost')
+        client.force_authenticate(buyer)
+
+        self.stdout.write(f"{'cart size':>9} {'queries':>8} {'median ms':>10} {'ms/item':>8}")
+        for size in sizes:
+            payload = {'orders': [{'product': product.pk, 'quantity': 1} for product in products[:size]]}
+            timings = []
+            for _ in range(repeat):
+                # Orders are unique per (buyer, product), so clear the previous run's and restock
+                Order.objects.filter(buyer=buyer).delete()
+                Product.objects.filter(seller=seller).update(stock=1)
+                with CaptureQueriesContext(connection) as queries:
+                    started = time.perf_counter()
+                    response = client.post('/api/auth/place-order/', payload, format='json')
+                    timings.append((time.perf_counter() - started) * 1000)
+                assert response.status_code == 200, response.content
+            median = statistics.median(timings)
+            self.stdout.write(f"{size:>9} {len(queries):>8} {median:>10.1f} {median / size:>8.2f}")
@@ -0,0 +1,98 @@
+import statistics
+import time
+import uuid
+
+from django.conf import settings
+from django.contrib.auth.hashers import identify_hasher
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.test import APIClient
+
+from accounts.models import CustomUser
+
+BENCH_CACHE_ALIAS = 'bench-login'
+
+COST_SETTINGS = {
+    'pbkdf2_sha256': 'PASSWORD_HASH_ITERATIONS',
+    'scrypt': 'PASSWORD_HASH_SCRYPT_WORK_FACTOR',
+}
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure POST /api/auth/login/ on one thread (so logins/s is per core) for a range "
+        "of password hash costs, checking that each profile change re-hashes the password "
+        "on the next login. Synthetic rows are created in a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        cost_setting = COST_SETTINGS.get(settings.PASSWORD_HASH_ALGORITHM)
+        parser.add_argument(
+            '--costs', default=str(getattr(settings, cost_setting, '')) if cost_setting else '',
+            help=f"Comma-separated values for {cost_setting or 'the hash cost'} (default: current).",
+        )
+        parser.add_argument('--logins', type=int, default=10, help="Timed logins per outcome and cost.")
+
+    def handle(self, *args, **options):
+        cost_setting = COST_SETTINGS.get(settings.PASSWORD_HASH_ALGORITHM)
+        if cost_setting is None:
+            raise CommandError(f"No tunable cost for PASSWORD_HASH_ALGORITHM={settings.PASSWORD_HASH_ALGORITHM}")
+        costs = [int(cost) for cost in options['costs'].split(',')]
+        # Every timed login comes from one address and repeats one identifier, so
+        # the auth throttles are off and kept out of the shared cache
+        caches = {
+            **settings.CACHES,
+            BENCH_CACHE_ALIAS: {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                'LOCATION': f"bench-login-{uuid.uuid4().hex[:8]}",
+            },
+        }
+        try:
+            with override_settings(CACHES=caches, AUTH_THROTTLE_CACHE_ALIAS=BENCH_CACHE_ALIAS,
+                                   AUTH_THROTTLE_RATES={}), transaction.atomic():
+                self.run_benchmarks(cost_setting, costs, options['logins'])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run_benchmarks(self, cost_setting, costs, logins):
+        user = CustomUser(username='bench-login', email='bench-login@example.invalid', phone_number='+950000000001')
+        user.set_password('bench-password')
+        user.save()
+        client = APIClient(HTTP_HOST='localhost')
+        outcomes = {
+            'ok': {'email': user.email, 'password': 'bench-password'},
+            'bad password': {'phone_number': user.phone_number, 'password': 'wrong-password'},
+            'unknown user': {'email': 'nobody@example.invalid', 'password': 'wrong-password'},
+        }
+
+        self.stdout.write(
+            f"{settings.PASSWORD_HASH_ALGORITHM}: {'cost':>8} {'outcome':>13} {'queries':>8} "
+            f"{'median ms':>10} {'logins/s/core':>14}"
+        )
+        for cost in costs:
+            with override_settings(**{cost_setting: cost}):
+                # The first login after a profile change upgrades the stored hash
+                client.post('/api/auth/login/', outcomes['ok'], format='json')
+                user.refresh_from_db()
+                if identify_hasher(user.password).must_update(user.password):
+                    raise CommandError(f"Password was not re-hashed for {cost_setting}={cost}")
+
+                for outcome, payload in outcomes.items():
+                    timings = []
+                    for _ in range(logins):
+                        with CaptureQueriesContext(connection) as queries:
+                            started = time.perf_counter()
+                            response = client.post('/api/auth/login/', payload, format='json')
+                            timings.append((time.perf_counter() - started) * 1000)
+                        assert response.status_code == (200 if outcome == 'ok' else 401), response.content
+                    median = statistics.median(timings)
+                    self.stdout.write(
+                        f"{'':{len(settings.PASSWORD_HASH_ALGORITHM) + 1}} {cost:>8} {outcome:>13} "
+                        f"{len(queries):>8} {median:>10.1f} {1000 / median:>14.1f}"
+                    )
@@ -0,0 +1,78 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test.utils import override_settings
+from rest_framework.test import APIClient
+
+from accounts import outbox
+from accounts.models import OutboxMessage
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure POST /api/auth/send-otp/ now that it only queues the email, then drain the queue "
+        "through a FakeTransport with SMTP-like latencies, once over one reused connection (the "
+        "process_outbox worker) and once with a new connection per message (the old send_mail path). "
+        "Everything runs in a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=100)
+        parser.add_argument('--connect-ms', type=float, default=200.0, help="Simulated SMTP connect + TLS + login.")
+        parser.add_argument('--send-ms', type=float, default=30.0, help="Simulated time to send one message.")
+        parser.add_argument('--batch-size', type=int, default=50)
+
+    def handle(self, *args, **options):
+        try:
+            # No throttling: every request comes from the same test client
+            with override_settings(AUTH_THROTTLE_RATES={}), transaction.atomic():
+                self.run(options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, options):
+        count = options['messages']
+        connect, send = options['connect_ms'] / 1000, options['send_ms'] / 1000
+        client = APIClient(HTTP_HOST='localhost')
+        timings = []
+        for i in range(count):
+            started = time.perf_counter()
+            response = client.post('/api/auth/send-otp/', {'email': f'bench-outbox-{i}@example.invalid'}, format='json')
+            timings.append((time.perf_counter() - started) * 1000)
+            assert response.status_code == 200, response.content
+        timings.sort()
+        self.stdout.write(
+            f"send-otp (enqueue only): p50 {statistics.median(timings):.1f} ms, "
+            f"p95 {timings[max(0, int(count * 0.95) - 1)]:.1f} ms"
+        )
+        self.stdout.write(
+            f"send-otp with inline delivery would add ~{(connect + send) * 1000:.0f} ms per request"
+        )
+
+        self.stdout.write(f"{'delivery':>24} {'messages':>9} {'connections':>12} {'seconds':>8} {'msgs/s':>8}")
+        ids = list(OutboxMessage.objects.filter(status='Pending').values_list('id', flat=True))
+
+        transport = outbox.FakeTransport(latency=send, connect_latency=connect)
+        started = time.perf_counter()
+        delivered = 0
+        while batch := outbox.claim_batch(options['batch_size']):
+            delivered += outbox.deliver_batch(batch, {'email': transport})[0]
+        self.report('outbox, reused connection', delivered, transport.connections, time.perf_counter() - started)
+
+        OutboxMessage.objects.filter(id__in=ids).update(status='Pending', attempts=0, locked_until=None)
+        transport = outbox.FakeTransport(latency=send, connect_latency=connect)
+        started = time.perf_counter()
+        for message in OutboxMessage.objects.filter(id__in=ids):
+            transport.send(message)
+            transport.close()
+        self.report('connection per message', len(ids), transport.connections, time.perf_counter() - started)
+
+    def report(self, name, messages, connections, seconds):
+        self.stdout.write(f"{name:>24} {messages:>9} {connections:>12} {seconds:>8.2f} {messages / seconds:>8.1f}")
@@ -0,0 +1,121 @@
+import random
+import statistics
+import time
+import tracemalloc
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from accounts.fast_serializers import ValuesSerializer
+from accounts.models import CustomUser, Category, Brand, Product
+from accounts.renderers import FastJSONRenderer, iter_json_array
+from accounts.serializers import ProductListSerializer
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare render time and peak memory of the stock JSONRenderer, FastJSONRenderer "
+        "and the streaming mode for a full product list (synthetic rows, rolled back afterwards)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=10000)
+        parser.add_argument('--repeat', type=int, default=3)
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        self.options = options
+        random.seed(1234)
+        try:
+            with transaction.atomic():
+                self.populate(options['products'])
+                self.run_benchmarks()
+                raise Rollback
+        except Rollback:
+            pass
+
+    def populate(self, count):
+        self.stdout.write(f"Creating {count} synthetic products...")
+        sellers = CustomUser.objects.bulk_create([
+            CustomUser(username=f'bench-seller-{i}', email=f'bench-seller-{i}@example.invalid')
+            for i in range(50)
+        ])
+        category = Category.objects.create(title='Bench category', category_slug='bench-category')
+        brand = Brand.objects.create(title='Bench brand', brand_slug='bench-brand')
+        Product.objects.bulk_create([
+            Product(
+                seller=random.choice(sellers), title=f'Bench product {i} – vintage',
+                product_slug=f'bench-product-{i}', description='Synthetic product',
+                original_price=Decimal(random.randint(1000, 90000)) / 100 if i % 2 else None,
+                second_hand_price=Decimal(random.randint(100, 50000)) / 100,
+                category=category, brand=brand if i % 4 else None,
+                image=f'products/bench_{i}.jpg' if i % 5 else '',
+            )
+            for i in range(count)
+        ], batch_size=2000)
+
+    def run_benchmarks(self):
+        request = Request(APIRequestFactory().get('/api/auth/products/', HTTP_HOST='localhost'))
+        fast = ValuesSerializer(ProductListSerializer(context={'request': request}))
+        queryset = fast.values(Product.objects.order_by('-created_at', '-id'))
+        batch_size = self.options['batch_size']
+
+        def buffered(renderer):
+            return lambda: renderer.render(fast.render(queryset.all()))
+
+        def streamed():
+            rows = fast.iter_render(queryset.all().iterator(chunk_size=batch_size))
+            return b''.join(iter_json_array(rows, batch_size=batch_size))
+
+        def streamed_sink():
+            # What a client connection sees: chunks are sent and dropped
+            size = 0
+            rows = fast.iter_render(queryset.all().iterator(chunk_size=batch_size))
+            for chunk in iter_json_array(rows, batch_size=batch_size):
+                size += len(chunk)
+            return size
+
+        stock = buffered(JSONRenderer())()
+        if buffered(FastJSONRenderer())() != stock or streamed() != stock:
+            raise CommandError("FastJSONRenderer or streaming output differs from JSONRenderer")
+
+        self.stdout.write(f"Body size {len(stock) / 1024 / 1024:.1f} MiB, outputs identical\n")
+        self.stdout.write(f"{'mode':<28} {'time ms':>9} {'peak MiB':>9}")
+        for name, func in [
+            ('JSONRenderer', buffered(JSONRenderer())),
+            ('FastJSONRenderer', buffered(FastJSONRenderer())),
+            ('streaming', streamed_sink),
+        ]:
+            self.stdout.write(f"{name:<28} {self.time(func):>9.1f} {self.peak_memory(func):>9.1f}")
+
+        # Encoding alone, from already serialized rows
+        data = fast.render(queryset.all())
+        self.stdout.write("")
+        self.stdout.write(f"{'encode only':<28} {'time ms':>9}")
+        for name, renderer in [('JSONRenderer', JSONRenderer()), ('FastJSONRenderer', FastJSONRenderer())]:
+            self.stdout.write(f"{name:<28} {self.time(lambda: renderer.render(data)):>9.1f}")
+
+    def time(self, func):
+        timings = []
+        for _ in range(self.options['repeat']):
+            started = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
+
+    @staticmethod
+    def peak_memory(func):
+        tracemalloc.start()
+        try:
+            func()
+            return tracemalloc.get_traced_memory()[1] / 1024 / 1024
+        finally:
+            tracemalloc.stop()
@@ -0,0 +1,132 @@
+import random
+import statistics
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from accounts.fast_serializers import ValuesSerializer
+from accounts.models import CustomUser, Category, Brand, Product, Order
+from accounts.serializers import CustomUserSerializer, OrderSerializer, ProductListSerializer
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare ModelSerializer list rendering with the ValuesSerializer fast path on "
+        "synthetic data (rolled back afterwards) and check the JSON is byte-for-byte identical."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000, help="Rows per list.")
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        self.options = options
+        random.seed(1234)
+        mismatches = []
+        try:
+            with transaction.atomic():
+                self.populate(options['rows'])
+                for name, serializer_class, queryset, params in self.cases():
+                    if not self.compare(name, serializer_class, queryset, params):
+                        mismatches.append(name)
+                raise Rollback
+        except Rollback:
+            pass
+        if mismatches:
+            raise CommandError(f"Output differs for: {', '.join(mismatches)}")
+        self.stdout.write(self.style.SUCCESS("All fast-path outputs are byte-for-byte identical."))
+
+    def populate(self, rows):
+        self.stdout.write(f"Creating {rows} synthetic products, users and orders...")
+        users = CustomUser.objects.bulk_create([
+            CustomUser(
+                username=f'bench-user-{i}', email=f'bench-user-{i}@example.invalid',
+                profile_picture=f'profile_pics/bench {i}.jpg' if i % 3 else '',
+                country='Myanmar', city='Yangon', weight_kg=random.choice([None, 55, 61.5]),
+                hip=random.choice([None, 90.0]), last_login=timezone.now() if i % 2 else None,
+                full_address=f'{i} Bench Street',
+            )
+            for i in range(rows)
+        ])
+        category = Category.objects.create(title='Bench category', category_slug='bench-category')
+        brand = Brand.objects.create(title='Bench brand', brand_slug='bench-brand')
+        products = Product.objects.bulk_create([
+            Product(
+                seller=users[i % len(users)], title=f'Bench product {i}', product_slug=f'bench-product-{i}',
+                description='Synthetic product for serializer benchmarks',
+                original_price=Decimal(random.randint(1000, 90000)) / 100 if i % 2 else None,
+                second_hand_price=Decimal(random.randint(100, 50000)) / 100,
+                category=category, brand=brand if i % 4 else None,
+                image=f'products/bench_{i}.jpg' if i % 5 else '',
+                authenticity_document=f'authenticity_documents/doc {i}.pdf' if i % 7 == 0 else '',
+            )
+            for i in range(rows)
+        ])
+        buyer = users[0]
+        Order.objects.bulk_create([
+            Order(buyer=buyer, product=product, seller_id=product.seller_id, quantity=1, total_price=product.second_hand_price)
+            for product in products
+        ])
+        self.buyer = buyer
+
+    def cases(self):
+        # select_related keeps the ModelSerializer side free of N+1 queries
+        products = Product.objects.select_related('seller', 'category', 'brand').order_by('-created_at', '-id')
+        orders = (
+            Order.objects.filter(buyer=self.buyer)
+            .select_related('buyer', 'product__seller', 'product__category', 'product__brand')
+            .order_by('-created_at', '-id')
+        )
+        users = CustomUser.objects.filter(username__startswith='bench-user-').order_by('id')
+        yield 'product list', ProductListSerializer, products, {}
+        yield 'product list ?expand=seller', ProductListSerializer, products, {'expand': 'seller'}
+        yield 'product list ?fields=id,title,image_url', ProductListSerializer, products, {'fields': 'id,title,image_url'}
+        yield 'order history', OrderSerializer, orders, {}
+        yield 'user list', CustomUserSerializer, users, {}
+
+    def compare(self, name, serializer_class, queryset, params):
+        request = Request(APIRequestFactory().get('/api/auth/bench/', params, HTTP_HOST='localhost'))
+        renderer = JSONRenderer()
+
+        def model_serializer():
+            serializer = serializer_class(queryset.all(), many=True, context={'request': request})
+            return renderer.render(serializer.data)
+
+        def fast_path():
+            fast = ValuesSerializer(serializer_class(context={'request': request}))
+            return renderer.render(fast.render(fast.values(queryset.all())))
+
+        expected, actual = model_serializer(), fast_path()
+        slow_ms, fast_ms = self.time(model_serializer), self.time(fast_path)
+        identical = expected == actual
+        self.stdout.write(
+            f"{name:<42} ModelSerializer {slow_ms:8.1f} ms   fast path {fast_ms:8.1f} ms   "
+            f"x{slow_ms / fast_ms:4.1f}   {'identical' if identical else 'DIFFERENT'}"
+        )
+        if not identical:
+            position = next(
+                (i for i, (a, b) in enumerate(zip(expected, actual)) if a != b),
+                min(len(expected), len(actual))
+            )
+            self.stdout.write(f"  first difference at byte {position}:")
+            self.stdout.write(f"  expected ...{expected[max(0, position - 80):position + 80]!r}")
+            self.stdout.write(f"  actual   ...{actual[max(0, position - 80):position + 80]!r}")
+        return identical
+
+    def time(self, func):
+        timings = []
+        for _ in range(self.options['repeat']):
+            started = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
@@ -0,0 +1,52 @@
+import logging
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from accounts import outbox
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        "Run the outbox worker: claim queued OTP and password-reset messages in batches and "
+        "deliver them over long-lived OUTBOX_TRANSPORTS connections. Safe to run in several processes at once."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.OUTBOX_BATCH_SIZE, help="Messages claimed at a time.")
+        parser.add_argument('--poll-interval', type=float, default=1.0, help="Seconds to sleep when nothing is due.")
+        parser.add_argument('--once', action='store_true', help="Drain what is due now, then exit.")
+
+    def handle(self, *args, **options):
+        transports = outbox.get_transports()
+        self.stdout.write(
+            "Processing outbox via " + ", ".join(f"{channel}: {type(t).__name__}" for channel, t in transports.items())
+        )
+        totals = [0, 0, 0]
+        try:
+            while True:
+                close_old_connections()
+                messages = outbox.claim_batch(max(1, options['batch_size']))
+                if messages:
+                    counts = outbox.deliver_batch(messages, transports)
+                    totals = [total + count for total, count in zip(totals, counts)]
+                    continue
+                # Idle: let go of SMTP connections before the server times them out
+                for transport in transports.values():
+                    transport.close()
+                outbox.purge_delivered()
+                if options['once']:
+                    break
+                time.sleep(options['poll_interval'])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            for transport in transports.values():
+                transport.close()
+        self.stdout.write(self.style.SUCCESS(
+            f"Sent {totals[0]} messages, {totals[1]} to retry, {totals[2]} failed."
+        ))
@@ -0,0 +1,61 @@
+import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+
+from accounts import payments
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        "Run the payment worker: claim queued payment attempts and charge them through "
+        "PAYMENT_GATEWAY on a thread pool. Safe to run in several processes at once."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=settings.PAYMENT_WORKERS, help="Concurrent gateway calls.")
+        parser.add_argument('--poll-interval', type=float, default=1.0, help="Seconds to sleep when nothing is due.")
+        parser.add_argument('--once', action='store_true', help="Drain what is due now, then exit.")
+
+    def handle(self, *args, **options):
+        workers = max(1, options['workers'])
+        gateway = payments.get_gateway()
+        self.stdout.write(f"Processing payments with {workers} workers via {type(gateway).__name__}")
+        processed = 0
+        in_flight = set()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            try:
+                while True:
+                    close_old_connections()
+                    claimed = payments.claim_due_attempts(workers - len(in_flight)) if len(in_flight) < workers else []
+                    in_flight.update(pool.submit(self.process, attempt_id, gateway) for attempt_id in claimed)
+
+                    if not in_flight:
+                        if options['once']:
+                            break
+                        time.sleep(options['poll_interval'])
+                        continue
+                    done, in_flight = wait(in_flight, timeout=options['poll_interval'], return_when=FIRST_COMPLETED)
+                    for future in done:
+                        future.result()
+                        processed += 1
+            except KeyboardInterrupt:
+                self.stdout.write("Stopping; waiting for in-flight payments...")
+                wait(in_flight)
+        self.stdout.write(self.style.SUCCESS(f"Processed {processed} payment attempts."))
+
+    @staticmethod
+    def process(attempt_id, gateway):
+        try:
+            return payments.process_attempt(attempt_id, gateway)
+        except Exception:
+            # The lease expires and another pass retries it
+            logger.exception(f"Payment worker failed on attempt {attempt_id}")
+        finally:
+            # Each pool thread holds its own database connection
+            connection.close()
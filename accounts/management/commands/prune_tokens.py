@@ -0,0 +1,67 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.utils import timezone
+
+from accounts.tokens import BlacklistFilter, prune_expired_tokens, token_table_stats
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete expired outstanding and blacklisted JWTs in small batches, each in its own short "
+        "transaction (a chunked flushexpiredtokens), then report table sizes and the blacklist "
+        "filter a worker would build. Run it from cron, or with --loop as a service."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help="Outstanding tokens deleted per transaction.")
+        parser.add_argument('--pause', type=float, default=0.05, help="Seconds to yield between batches.")
+        parser.add_argument('--loop', action='store_true', help="Keep running, pruning every --interval seconds.")
+        parser.add_argument('--interval', type=float, default=3600.0)
+
+    def handle(self, *args, **options):
+        try:
+            while True:
+                self.prune(options['batch_size'], options['pause'])
+                if not options['loop']:
+                    break
+                time.sleep(options['interval'])
+                close_old_connections()
+        except KeyboardInterrupt:
+            pass
+
+    def prune(self, batch_size, pause):
+        before = token_table_stats()
+        cutoff = timezone.now()
+        outstanding = blacklisted = batches = last_id = 0
+        slowest = 0.0
+        started = time.perf_counter()
+        while True:
+            batch_started = time.perf_counter()
+            deleted, deleted_blacklisted, last_id = prune_expired_tokens(batch_size, now=cutoff, after_id=last_id)
+            if not deleted:
+                break
+            slowest = max(slowest, time.perf_counter() - batch_started)
+            outstanding += deleted
+            blacklisted += deleted_blacklisted
+            batches += 1
+            time.sleep(pause)
+        after = token_table_stats()
+        self.stdout.write(self.style.SUCCESS(
+            f"Deleted {outstanding} outstanding and {blacklisted} blacklisted tokens in {batches} batches "
+            f"({time.perf_counter() - started:.1f}s, slowest batch {slowest * 1000:.0f} ms)."
+        ))
+        self.stdout.write(
+            f"Outstanding tokens: {before['outstanding']} -> {after['outstanding']}; "
+            f"blacklisted: {before['blacklisted']} -> {after['blacklisted']}"
+        )
+        blacklist_filter = BlacklistFilter()
+        built = time.perf_counter()
+        blacklist_filter.rebuild()
+        stats = blacklist_filter.stats()
+        self.stdout.write(
+            f"Blacklist filter: {stats['items']} tokens, {stats['bits'] // 8 / 1024:.1f} KiB, "
+            f"{stats['hashes']} hashes, estimated false-positive rate {stats['estimated_fp_rate']:.4%}, "
+            f"built in {(time.perf_counter() - built) * 1000:.0f} ms"
+        )
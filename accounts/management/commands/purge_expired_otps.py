@@ -0,0 +1,51 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.utils import timezone
+
+from accounts.otp import purge_expired_otps
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete expired one-time codes in small batches, each in its own short transaction, "
+        "so sign-ups are never blocked for long. Run it from cron, or with --loop as a service."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help="Rows deleted per transaction.")
+        parser.add_argument('--pause', type=float, default=0.05, help="Seconds to yield between batches.")
+        parser.add_argument('--loop', action='store_true', help="Keep running, purging every --interval seconds.")
+        parser.add_argument('--interval', type=float, default=300.0)
+
+    def handle(self, *args, **options):
+        try:
+            while True:
+                self.purge(options['batch_size'], options['pause'])
+                if not options['loop']:
+                    break
+                time.sleep(options['interval'])
+                close_old_connections()
+        except KeyboardInterrupt:
+            pass
+
+    def purge(self, batch_size, pause):
+        # Rows expiring while the purge runs wait for the next one
+        cutoff = timezone.now()
+        total = batches = 0
+        slowest = 0.0
+        started = time.perf_counter()
+        while True:
+            batch_started = time.perf_counter()
+            deleted = purge_expired_otps(batch_size, now=cutoff)
+            if not deleted:
+                break
+            slowest = max(slowest, time.perf_counter() - batch_started)
+            total += deleted
+            batches += 1
+            time.sleep(pause)
+        self.stdout.write(self.style.SUCCESS(
+            f"Deleted {total} expired OTP codes in {batches} batches "
+            f"({time.perf_counter() - started:.1f}s, slowest batch {slowest * 1000:.0f} ms)."
+        ))
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from accounts import sales
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the seller sales summary and daily rollup rows from the order table, "
+        "report rows that had drifted, and replace the stored rows."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true', help="Only compare; exit with an error if anything differs.")
+        parser.add_argument('--show', type=int, default=10, help="Number of differing rows to print.")
+
+    def handle(self, *args, **options):
+        # Orders written between reading the order table and replacing the
+        # rows would be lost from the summary, so it is all one transaction
+        with transaction.atomic():
+            expected = sales.compute_sales_from_orders()
+            mismatches = sales.diff_sales_summary(expected)
+            if not options['check']:
+                sales.rebuild_sales_summary(expected)
+
+        for label, stored, computed in mismatches[:options['show']]:
+            changed = {field: (stored[field], computed[field]) for field in stored if stored[field] != computed[field]}
+            self.stdout.write(f"{label}: " + ", ".join(f"{field} {old} -> {new}" for field, (old, new) in changed.items()))
+        if len(mismatches) > options['show']:
+            self.stdout.write(f"... and {len(mismatches) - options['show']} more")
+
+        if options['check']:
+            if mismatches:
+                raise CommandError(f"{len(mismatches)} summary rows differ from the order table.")
+            self.stdout.write(self.style.SUCCESS(
+                f"Sales summary matches the order table ({len(expected.totals)} sellers, {len(expected.daily)} days)."
+            ))
+            return
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {len(expected.totals)} seller summaries and {len(expected.daily)} daily rows "
+            f"({len(mismatches)} had drifted)."
+        ))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from accounts import search
+
+
+class Command(BaseCommand):
+    help = "Rebuild the product full-text search index from the product table."
+
+    def handle(self, *args, **options):
+        if not search.is_available():
+            self.stderr.write("The full-text index table does not exist on this database.")
+            return
+        count = search.rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} products."))
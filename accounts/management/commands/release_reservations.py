@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from accounts import inventory
+
+
+class Command(BaseCommand):
+    help = (
+        "Return expired stock reservations to their products' stock. Runs continuously "
+        "unless --once is given; safe to run in several processes at once."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help="Reservations released per transaction.")
+        parser.add_argument('--interval', type=float, default=30.0, help="Seconds to sleep when nothing has expired.")
+        parser.add_argument('--once', action='store_true', help="Release what has expired now, then exit.")
+
+    def handle(self, *args, **options):
+        total = 0
+        try:
+            while True:
+                close_old_connections()
+                released = inventory.release_expired(options['batch_size'])
+                total += released
+                if released:
+                    self.stdout.write(f"Released {released} expired reservations")
+                    continue
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS(f"Released {total} reservations in total."))
@@ -0,0 +1,95 @@
+import statistics
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection
+
+from accounts.checkout import CheckoutError, place_orders
+from accounts.models import CustomUser, Category, Product, Order
+
+
+class Command(BaseCommand):
+    help = (
+        "Concurrency test for stock decrements: many buyers check out the same product at "
+        "the same moment, in several rounds. Fails if anything is oversold. Synthetic users "
+        "and products are committed (the buyers run on their own connections) and deleted "
+        "afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--buyers', type=int, default=50, help="Simultaneous buyers per round.")
+        parser.add_argument('--stock', type=int, default=10, help="Units of the contested product.")
+        parser.add_argument('--rounds', type=int, default=5)
+
+    def handle(self, *args, **options):
+        buyers, stock, rounds = options['buyers'], options['stock'], options['rounds']
+        prefix = f"contention-{uuid.uuid4().hex[:8]}"
+        seller = CustomUser.objects.create(username=f'{prefix}-seller', email=f'{prefix}-seller@example.invalid')
+        users = CustomUser.objects.bulk_create([
+            CustomUser(username=f'{prefix}-buyer-{i}', email=f'{prefix}-buyer-{i}@example.invalid')
+            for i in range(buyers)
+        ])
+        category = Category.objects.create(title=prefix, category_slug=prefix)
+        oversold = False
+        try:
+            self.stdout.write(
+                f"{'round':>5} {'sold':>5} {'sold out':>8} {'errors':>6} {'left':>5} "
+                f"{'wall ms':>8} {'p50 ms':>7} {'p95 ms':>7} {'req/s':>7}"
+            )
+            for round_number in range(1, rounds + 1):
+                product = Product.objects.create(
+                    seller=seller, title=f'{prefix} item {round_number}', description='Contested item',
+                    second_hand_price=Decimal('25.00'), category=category, stock=stock,
+                )
+                results, wall = self.run_round(product, users)
+                sold = sum(1 for outcome, _ in results if outcome == 'sold')
+                sold_out = sum(1 for outcome, _ in results if outcome == 'sold_out')
+                errors = len(results) - sold - sold_out
+                product.refresh_from_db()
+                orders = Order.objects.filter(product=product).count()
+                latencies = sorted(latency for _, latency in results)
+                self.stdout.write(
+                    f"{round_number:>5} {sold:>5} {sold_out:>8} {errors:>6} {product.stock:>5} "
+                    f"{wall:>8.1f} {statistics.median(latencies):>7.1f} "
+                    f"{latencies[int(len(latencies) * 0.95) - 1]:>7.1f} {len(results) / wall * 1000:>7.0f}"
+                )
+                if orders != sold or sold + product.stock != stock:
+                    oversold = True
+                    self.stderr.write(
+                        f"Round {round_number}: {orders} orders for {sold} successful checkouts, "
+                        f"{product.stock} of {stock} units left"
+                    )
+        finally:
+            Order.objects.filter(seller=seller).delete()
+            CustomUser.objects.filter(username__startswith=prefix).delete()
+            category.delete()
+        if oversold:
+            raise CommandError("Stock and orders disagree: items were oversold.")
+        self.stdout.write(self.style.SUCCESS("No overselling: orders always matched the stock taken."))
+
+    def run_round(self, product, users):
+        barrier = threading.Barrier(len(users))
+
+        def buy(user):
+            try:
+                barrier.wait()
+                started = time.perf_counter()
+                try:
+                    place_orders(user, [{'product': product.pk, 'quantity': 1}])
+                    outcome = 'sold'
+                except CheckoutError as e:
+                    outcome = 'sold_out' if e.status_code == 409 else 'error'
+                except OperationalError:
+                    outcome = 'error'
+                return outcome, (time.perf_counter() - started) * 1000
+            finally:
+                connection.close()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=len(users)) as pool:
+            results = list(pool.map(buy, users))
+        return results, (time.perf_counter() - started) * 1000
@@ -0,0 +1,37 @@
+from django.db import migrations
+
+FTS_TABLE = 'accounts_product_fts'
+
+
+def create_fts_table(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+        "title, description, brand, category, "
+        "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+    )
+    schema_editor.execute(
+        f"INSERT INTO {FTS_TABLE}(rowid, title, description, brand, category) "
+        "SELECT p.id, p.title, p.description, COALESCE(b.title, ''), COALESCE(c.title, '') "
+        "FROM accounts_product p "
+        "LEFT JOIN accounts_brand b ON b.id = p.brand_id "
+        "LEFT JOIN accounts_category c ON c.id = p.category_id"
+    )
+
+
+def drop_fts_table(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0014_otpcode_identifier_alter_otpcode_user'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts_table, drop_fts_table),
+    ]
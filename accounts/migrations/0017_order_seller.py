@@ -0,0 +1,54 @@
+# Generated by Django 5.1.6 on 2026-10-18 12:34
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+BACKFILL_BATCH_SIZE = 5000
+
+
+def backfill_order_seller(apps, schema_editor):
+    Order = apps.get_model('accounts', 'Order')
+    Product = apps.get_model('accounts', 'Product')
+    seller = Subquery(Product.objects.filter(pk=OuterRef('product_id')).values('seller_id')[:1])
+    # Walk the table in id ranges so no single UPDATE touches every row
+    last_id = Order.objects.order_by('-id').values_list('id', flat=True).first() or 0
+    for start in range(0, last_id, BACKFILL_BATCH_SIZE):
+        Order.objects.filter(
+            id__gt=start, id__lte=start + BACKFILL_BATCH_SIZE, seller__isnull=True,
+        ).update(seller=seller)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0016_product_catalog_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='seller',
+            field=models.ForeignKey(db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='sales', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(backfill_order_seller, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='order',
+            name='seller',
+            field=models.ForeignKey(db_index=False, editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='sales', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='order',
+            name='buyer',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['seller', 'created_at'], name='order_seller_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['buyer', 'created_at'], name='order_buyer_created_idx'),
+        ),
+    ]
@@ -0,0 +1,104 @@
+# Generated by Django 5.1.6 on 2026-10-18 12:36
+
+from collections import defaultdict
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+# Frozen copies of accounts.sales at the time of this migration
+STATUS_COLUMNS = {
+    'Pending': 'pending_orders',
+    'Shipped': 'shipped_orders',
+    'Delivered': 'delivered_orders',
+}
+PAYMENT_COLUMNS = {
+    'Pending': ('unpaid_orders', 'unpaid_revenue'),
+    'Paid': ('paid_orders', 'paid_revenue'),
+    'Failed': ('failed_orders', 'failed_revenue'),
+}
+
+
+def seed_sales_summary(apps, schema_editor):
+    # Existing orders must be counted before status and payment changes start
+    # applying deltas to the (unsigned) counters
+    Order = apps.get_model('accounts', 'Order')
+    SellerSalesSummary = apps.get_model('accounts', 'SellerSalesSummary')
+    SellerDailySales = apps.get_model('accounts', 'SellerDailySales')
+    totals = defaultdict(lambda: defaultdict(int))
+    daily = defaultdict(lambda: defaultdict(int))
+    rows = (
+        Order.objects.annotate(day=TruncDate('created_at'))
+        .values('seller_id', 'day', 'status', 'payment_status')
+        .annotate(count=Count('id'), total=Sum('total_price'))
+        .order_by()
+    )
+    for row in rows:
+        count_column, revenue_column = PAYMENT_COLUMNS[row['payment_status']]
+        for counters in (totals[row['seller_id']], daily[(row['seller_id'], row['day'])]):
+            for column in ('orders', STATUS_COLUMNS[row['status']], count_column):
+                counters[column] += row['count']
+            for column in ('revenue', revenue_column):
+                counters[column] += row['total']
+    SellerSalesSummary.objects.bulk_create([
+        SellerSalesSummary(seller_id=seller_id, **counters) for seller_id, counters in totals.items()
+    ], batch_size=1000)
+    SellerDailySales.objects.bulk_create([
+        SellerDailySales(seller_id=seller_id, day=day, **counters) for (seller_id, day), counters in daily.items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0017_order_seller'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SellerSalesSummary',
+            fields=[
+                ('orders', models.PositiveIntegerField(default=0)),
+                ('pending_orders', models.PositiveIntegerField(default=0)),
+                ('shipped_orders', models.PositiveIntegerField(default=0)),
+                ('delivered_orders', models.PositiveIntegerField(default=0)),
+                ('paid_orders', models.PositiveIntegerField(default=0)),
+                ('unpaid_orders', models.PositiveIntegerField(default=0)),
+                ('failed_orders', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('paid_revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('unpaid_revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('failed_revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('seller', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='sales_summary', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='SellerDailySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('orders', models.PositiveIntegerField(default=0)),
+                ('pending_orders', models.PositiveIntegerField(default=0)),
+                ('shipped_orders', models.PositiveIntegerField(default=0)),
+                ('delivered_orders', models.PositiveIntegerField(default=0)),
+                ('paid_orders', models.PositiveIntegerField(default=0)),
+                ('unpaid_orders', models.PositiveIntegerField(default=0)),
+                ('failed_orders', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('paid_revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('unpaid_revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('failed_revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('day', models.DateField()),
+                ('seller', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('seller', 'day')},
+            },
+        ),
+        migrations.RunPython(seed_sales_summary, migrations.RunPython.noop),
+    ]
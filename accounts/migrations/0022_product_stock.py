@@ -0,0 +1,44 @@
+# Generated by Django 5.1.6 on 2026-10-18 12:48
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Exists, OuterRef
+
+
+def mark_ordered_products_sold(apps, schema_editor):
+    Order = apps.get_model('accounts', 'Order')
+    Product = apps.get_model('accounts', 'Product')
+    # Second-hand listings are single items; anything already ordered is gone
+    Product.objects.filter(Exists(Order.objects.filter(product_id=OuterRef('pk')))).update(stock=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0021_cart_item'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='stock',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.RunPython(mark_ordered_products_sold, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name='StockReservation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField()),
+                ('expires_at', models.DateTimeField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='accounts.product')),
+                ('user', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='stock_reservations', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['expires_at'], name='stock_reservation_expiry_idx')],
+                'constraints': [models.UniqueConstraint(fields=('user', 'product'), name='stock_reservation_user_product')],
+            },
+        ),
+    ]
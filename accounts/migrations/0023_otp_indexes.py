@@ -0,0 +1,26 @@
+# Generated by Django 5.1.6 on 2026-10-18 13:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0022_product_stock'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='otpcode',
+            name='code',
+            field=models.CharField(max_length=6),
+        ),
+        migrations.AddIndex(
+            model_name='otpcode',
+            index=models.Index(fields=['identifier', 'code'], name='otp_identifier_code_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='otpcode',
+            index=models.Index(fields=['expires_at'], name='otp_expires_idx'),
+        ),
+    ]
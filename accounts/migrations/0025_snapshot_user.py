@@ -0,0 +1,28 @@
+# Generated by Django 5.1.6 on 2026-10-18 13:13
+
+import django.contrib.auth.models
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0024_outbox_message'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SnapshotUser',
+            fields=[
+            ],
+            options={
+                'proxy': True,
+                'indexes': [],
+                'constraints': [],
+            },
+            bases=('accounts.customuser',),
+            managers=[
+                ('objects', django.contrib.auth.models.UserManager()),
+            ],
+        ),
+    ]
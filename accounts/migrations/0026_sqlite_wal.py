@@ -0,0 +1,22 @@
+from django.db import migrations
+
+
+def enable_wal(apps, schema_editor):
+    # journal_mode=WAL persists in the database file; it cannot be changed
+    # inside a transaction, hence atomic = False
+    if schema_editor.connection.vendor == 'sqlite':
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode=WAL')
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('accounts', '0025_snapshot_user'),
+    ]
+
+    operations = [
+        migrations.RunPython(enable_wal, migrations.RunPython.noop),
+    ]
@@ -47,15 +47,38 @@ class CustomUser(AbstractUser):
 
         super().save(*args, **kwargs)
 
+class SnapshotUser(CustomUser):
+    """
+    A CustomUser built from CachedJWTAuthentication's compact snapshot. Only
+    the snapshot fields are loaded; touching any other field loads the rest
+    of the row in one query.
+    """
+
+    class Meta:
+        proxy = True
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        deferred = self.get_deferred_fields()
+        if fields is not None and deferred and set(fields) <= deferred:
+            fields = deferred
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+
 # ... other imports and models remain unchanged ...
 
 class OTPCode(models.Model):
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, null=True, blank=True)
     identifier = models.CharField(max_length=255, null=True, blank=True)  # New field
-    code = models.CharField(max_length=6, db_index=True)
+    code = models.CharField(max_length=6)
     created_at = models.DateTimeField(auto_now_add=True)
     expires_at = models.DateTimeField()
 
+    class Meta:
+        # Verification looks up (identifier, code); the purge walks expires_at
+        indexes = [
+            models.Index(fields=['identifier', 'code'], name='otp_identifier_code_idx'),
+            models.Index(fields=['expires_at'], name='otp_expires_idx'),
+        ]
+
     def is_valid(self):
         return timezone.now() <= self.expires_at
 
@@ -146,24 +169,43 @@ class Product(models.Model):
         ('magenta', 'Magenta'),
     ]
     
-    seller = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
+    # The FK indexes are covered by the composite indexes in Meta
+    seller = models.ForeignKey(CustomUser, on_delete=models.CASCADE, db_index=False)
     title = models.CharField(max_length=255)
     product_slug = models.SlugField(max_length=255, unique=True, blank=True)
     description = models.TextField()
     original_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     second_hand_price = models.DecimalField(max_digits=10, decimal_places=2)
-    category = models.ForeignKey(Category, on_delete=models.CASCADE)
-    brand = models.ForeignKey(Brand, on_delete=models.CASCADE, null=True, blank=True)
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, db_index=False)
+    brand = models.ForeignKey(Brand, on_delete=models.CASCADE, null=True, blank=True, db_index=False)
     condition = models.CharField(max_length=20, choices=CONDITION_CHOICES, default='gently_used')
     size = models.CharField(max_length=100, choices=SIZE_CHOICES, default='M')
     color = models.CharField(max_length=255, choices=COLOR_CHOICES, default='white')
     authenticity_document = models.FileField(upload_to='authenticity_documents/', null=True, blank=True)
     image = models.ImageField(upload_to='products/', null=True, blank=True)  # Made nullable for development
+    # Units available to buy; sales and reservations change it with conditional UPDATEs (accounts.inventory)
+    stock = models.PositiveIntegerField(default=1)
+    # Bumped on every write; updates are applied only if it still matches
+    version = models.PositiveIntegerField(default=1)
 
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         verbose_name_plural = "products"
+        # Catalog filters (category/brand) combined with each sort, the plain
+        # sorts for unfiltered browsing, and seller listings by date.
+        indexes = [
+            models.Index(fields=['created_at'], name='product_created_idx'),
+            models.Index(fields=['second_hand_price'], name='product_price_idx'),
+            models.Index(fields=['title'], name='product_title_idx'),
+            models.Index(fields=['category', 'created_at'], name='product_cat_created_idx'),
+            models.Index(fields=['category', 'second_hand_price'], name='product_cat_price_idx'),
+            models.Index(fields=['category', 'title'], name='product_cat_title_idx'),
+            models.Index(fields=['brand', 'created_at'], name='product_brand_created_idx'),
+            models.Index(fields=['brand', 'second_hand_price'], name='product_brand_price_idx'),
+            models.Index(fields=['brand', 'title'], name='product_brand_title_idx'),
+            models.Index(fields=['seller', 'created_at'], name='product_seller_created_idx'),
+        ]
 
     def __str__(self):
         return self.title
@@ -177,6 +219,8 @@ class Product(models.Model):
                 unique_slug = f"{base_slug}-{count}"
                 count += 1
             self.product_slug = unique_slug
+        if not self._state.adding:
+            self.version += 1
         super().save(*args, **kwargs)
 
 class Order(models.Model):
@@ -190,22 +234,186 @@ class Order(models.Model):
         ('Paid', 'Paid'),
         ('Failed', 'Failed'),
     ]
+    # Fulfilment only moves forward
+    STATUS_TRANSITIONS = {
+        'Pending': ('Shipped', 'Delivered'),
+        'Shipped': ('Delivered',),
+        'Delivered': (),
+    }
     
-    buyer = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
+    buyer = models.ForeignKey(CustomUser, on_delete=models.CASCADE, db_index=False)
+    # Copy of product.seller so seller dashboards don't join through Product
+    seller = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='sales', editable=False, db_index=False)
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     quantity = models.PositiveIntegerField(default=1)
     total_price = models.DecimalField(max_digits=10, decimal_places=2, editable=False)
     status = models.CharField(max_length=20, choices=ORDER_STATUS_CHOICES, default='Pending')
     payment_status = models.CharField(max_length=20, choices=PAYMENT_STATUS_CHOICES, default='Pending')
+    version = models.PositiveIntegerField(default=1)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         unique_together = ('buyer', 'product')  # Note: This may cause IntegrityError during testing
+        indexes = [
+            models.Index(fields=['seller', 'created_at'], name='order_seller_created_idx'),
+            models.Index(fields=['buyer', 'created_at'], name='order_buyer_created_idx'),
+        ]
+
+    @classmethod
+    def statuses_leading_to(cls, status):
+        return [source for source, targets in cls.STATUS_TRANSITIONS.items() if status in targets]
 
     def save(self, *args, **kwargs):
+        self.seller_id = self.product.seller_id
         self.total_price = self.product.second_hand_price * self.quantity
+        if not self._state.adding:
+            self.version += 1
         super().save(*args, **kwargs)
 
+class PaymentAttempt(models.Model):
+    """One asynchronous charge for an order, processed by the process_payments worker."""
+    STATUS_CHOICES = [
+        ('Queued', 'Queued'),
+        ('Processing', 'Processing'),
+        ('Succeeded', 'Succeeded'),
+        ('Failed', 'Failed'),
+    ]
+
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='payment_attempts')
+    # Sent to the gateway so a retried charge is never applied twice
+    idempotency_key = models.CharField(max_length=64)
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='Queued')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    gateway_reference = models.CharField(max_length=100, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['order', 'idempotency_key'], name='payment_attempt_idempotency_key'),
+            # At most one queued or processing attempt per order, without locking the order
+            models.UniqueConstraint(
+                fields=['order'], condition=models.Q(status__in=['Queued', 'Processing']),
+                name='payment_attempt_one_in_flight',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='payment_attempt_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"Payment {self.pk} for order {self.order_id} ({self.status})"
+
+class OutboxMessage(models.Model):
+    """An email or SMS queued by a request and delivered by the process_outbox worker."""
+    CHANNEL_CHOICES = [
+        ('email', 'Email'),
+        ('sms', 'SMS'),
+    ]
+    STATUS_CHOICES = [
+        ('Pending', 'Pending'),
+        ('Sending', 'Sending'),
+        ('Sent', 'Sent'),
+        ('Failed', 'Failed'),
+    ]
+
+    channel = models.CharField(max_length=10, choices=CHANNEL_CHOICES)
+    recipient = models.CharField(max_length=255)
+    subject = models.CharField(max_length=255, blank=True)
+    body = models.TextField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='Pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    # Set by the worker that claimed the message; lets it fetch its batch in one query
+    claim_token = models.CharField(max_length=32, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_due_idx'),
+            models.Index(fields=['claim_token'], name='outbox_claim_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.channel} to {self.recipient} ({self.status})"
+
+class StockReservation(models.Model):
+    """Units taken out of a product's stock for a buyer until expires_at."""
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='stock_reservations', db_index=False)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='reservations')
+    quantity = models.PositiveIntegerField()
+    expires_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'product'], name='stock_reservation_user_product'),
+        ]
+        indexes = [
+            models.Index(fields=['expires_at'], name='stock_reservation_expiry_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.quantity} x product {self.product_id} held for user {self.user_id}"
+
+class CartItem(models.Model):
+    """
+    One line of a user's server-side cart. The product's price, title and image
+    are copied in when the line is added, so reading the cart never touches Product.
+    """
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='cart_items', db_index=False)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='cart_items')
+    quantity = models.PositiveIntegerField(default=1)
+    unit_price = models.DecimalField(max_digits=10, decimal_places=2)
+    title = models.CharField(max_length=255)
+    product_slug = models.SlugField(max_length=255, blank=True)
+    image = models.CharField(max_length=255, blank=True)
+    added_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'product'], name='cart_item_user_product'),
+        ]
+
+    def __str__(self):
+        return f"{self.quantity} x {self.title} in {self.user.username}'s cart"
+
+class SalesCounters(models.Model):
+    """Order counts and totals maintained incrementally by accounts.sales."""
+    orders = models.PositiveIntegerField(default=0)
+    pending_orders = models.PositiveIntegerField(default=0)
+    shipped_orders = models.PositiveIntegerField(default=0)
+    delivered_orders = models.PositiveIntegerField(default=0)
+    paid_orders = models.PositiveIntegerField(default=0)
+    unpaid_orders = models.PositiveIntegerField(default=0)
+    failed_orders = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    paid_revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    unpaid_revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    failed_revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        abstract = True
+
+class SellerSalesSummary(SalesCounters):
+    seller = models.OneToOneField(CustomUser, on_delete=models.CASCADE, primary_key=True, related_name='sales_summary')
+    updated_at = models.DateTimeField(auto_now=True)
+
+class SellerDailySales(SalesCounters):
+    # Orders placed by day (TIME_ZONE date of created_at), for charts
+    seller = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='daily_sales', db_index=False)
+    day = models.DateField()
+
+    class Meta:
+        unique_together = ('seller', 'day')
+
 class Message(models.Model):
     sender = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='sent_messages')
     receiver = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='received_messages')
@@ -0,0 +1,39 @@
+"""
+Sign-up one-time codes.
+
+Each identifier (email or phone number) has at most one live code:
+``issue_otp`` deletes earlier codes in the same transaction that stores the
+new one. Verification is a single lookup on the (identifier, code) index.
+Abandoned codes are removed by ``manage.py purge_expired_otps``, which walks
+the expires_at index and deletes in short, bounded batches.
+"""
+import secrets
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import OTPCode
+
+
+def issue_otp(identifier):
+    """Store a new code for ``identifier``, replacing any earlier ones."""
+    code = str(secrets.randbelow(900000) + 100000)
+    with transaction.atomic():
+        OTPCode.objects.filter(identifier=identifier).delete()
+        return OTPCode.objects.create(user=None, code=code, identifier=identifier)
+
+
+def find_otp(identifier, code):
+    return OTPCode.objects.filter(identifier=identifier, code=code).first()
+
+
+def purge_expired_otps(batch_size=1000, now=None):
+    """Delete up to ``batch_size`` expired codes. Returns how many were deleted."""
+    now = now or timezone.now()
+    ids = list(
+        OTPCode.objects.filter(expires_at__lt=now).order_by('expires_at').values_list('id', flat=True)[:batch_size]
+    )
+    if not ids:
+        return 0
+    deleted, _ = OTPCode.objects.filter(id__in=ids).delete()
+    return deleted
@@ -0,0 +1,232 @@
+"""
+Outbox for OTP and password-reset delivery.
+
+Views only call ``enqueue_email`` / ``enqueue_sms``, which insert an
+``OutboxMessage`` row (usually in the same transaction as the code or token
+it carries), so request latency never depends on SMTP or an SMS provider.
+The ``process_outbox`` worker claims due messages in batches and delivers
+them through long-lived transports:
+
+* Transports are selected per channel with ``OUTBOX_TRANSPORTS`` (options in
+  ``OUTBOX_TRANSPORT_OPTIONS``). ``EmailTransport`` keeps one connection of
+  ``EMAIL_BACKEND`` open across a whole batch and reopens it after an error;
+  ``FakeTransport`` is a local stand-in for tests and benchmarks.
+* Failures are retried with exponential backoff up to ``OUTBOX_MAX_ATTEMPTS``;
+  ``PermanentDeliveryError`` (e.g. a refused recipient) fails immediately.
+* A batch is claimed with one conditional UPDATE that stamps a claim token
+  and a lease, so several workers can run side by side and a crashed
+  worker's messages are picked up again once the lease expires.
+"""
+import logging
+import random
+import smtplib
+import threading
+import time
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import OutboxMessage
+
+logger = logging.getLogger(__name__)
+
+
+class PermanentDeliveryError(Exception):
+    """The message can never be delivered; retrying will not help."""
+
+
+class OutboxTransport:
+    """Delivers messages of one channel. ``open``/``close`` bracket a series of ``send`` calls."""
+
+    def open(self):
+        pass
+
+    def close(self):
+        pass
+
+    def send(self, message):
+        """Deliver one OutboxMessage or raise; PermanentDeliveryError stops retries."""
+        raise NotImplementedError
+
+
+class EmailTransport(OutboxTransport):
+    def __init__(self, **options):
+        self.options = options
+        self.connection = None
+
+    def open(self):
+        if self.connection is None:
+            connection = get_connection(fail_silently=False, **self.options)
+            connection.open()
+            self.connection = connection
+
+    def close(self):
+        if self.connection is not None:
+            try:
+                self.connection.close()
+            except Exception:
+                pass
+            self.connection = None
+
+    def send(self, message):
+        self.open()
+        email = EmailMessage(
+            message.subject, message.body, settings.DEFAULT_FROM_EMAIL, [message.recipient],
+            connection=self.connection,
+        )
+        try:
+            email.send()
+        except smtplib.SMTPRecipientsRefused as e:
+            raise PermanentDeliveryError(f"Recipient refused: {e.recipients}")
+        except Exception:
+            # The connection may be unusable; the next message opens a new one
+            self.close()
+            raise
+
+
+class LogSMSTransport(OutboxTransport):
+    """Development SMS transport: writes the message to the log instead of sending it."""
+
+    def send(self, message):
+        logger.info(f"[DEV] SMS to {message.recipient}: {message.body}")
+
+
+class FakeTransport(OutboxTransport):
+    """In-memory transport with configurable connect/send latency and failure rate."""
+
+    def __init__(self, latency=0.0, connect_latency=0.0, failure_rate=0.0, seed=None):
+        self.latency = latency
+        self.connect_latency = connect_latency
+        self.failure_rate = failure_rate
+        self.random = random.Random(seed)
+        self.sent = []
+        self.connections = 0
+        self.is_open = False
+        self.lock = threading.Lock()
+
+    def open(self):
+        if not self.is_open:
+            time.sleep(self.connect_latency)
+            self.connections += 1
+            self.is_open = True
+
+    def close(self):
+        self.is_open = False
+
+    def send(self, message):
+        self.open()
+        time.sleep(self.latency)
+        with self.lock:
+            if self.random.random() < self.failure_rate:
+                self.is_open = False
+                raise ConnectionError("Fake transport dropped the connection")
+            self.sent.append((message.recipient, message.subject, message.body))
+
+
+def get_transports():
+    """Build a fresh transport for every configured channel."""
+    return {
+        channel: import_string(path)(**settings.OUTBOX_TRANSPORT_OPTIONS.get(channel, {}))
+        for channel, path in settings.OUTBOX_TRANSPORTS.items()
+    }
+
+
+def enqueue_email(recipient, subject, body):
+    return OutboxMessage.objects.create(channel='email', recipient=recipient, subject=subject, body=body)
+
+
+def enqueue_sms(recipient, body):
+    return OutboxMessage.objects.create(channel='sms', recipient=recipient, body=body)
+
+
+def _due():
+    now = timezone.now()
+    return Q(status='Pending', next_attempt_at__lte=now) | Q(status='Sending', locked_until__lt=now)
+
+
+def claim_batch(limit):
+    """Lease up to ``limit`` due messages to this worker and return them."""
+    candidates = list(
+        OutboxMessage.objects.filter(_due()).order_by('next_attempt_at').values_list('id', flat=True)[:limit]
+    )
+    if not candidates:
+        return []
+    token = uuid.uuid4().hex
+    # Rows another worker claimed since the SELECT no longer match _due()
+    OutboxMessage.objects.filter(_due(), id__in=candidates).update(
+        status='Sending',
+        claim_token=token,
+        locked_until=timezone.now() + timedelta(seconds=settings.OUTBOX_LEASE_SECONDS),
+        attempts=F('attempts') + 1,
+    )
+    return list(OutboxMessage.objects.filter(claim_token=token, status='Sending').order_by('id'))
+
+
+def deliver_batch(messages, transports):
+    """Send claimed messages and record the outcomes. Returns ``(sent, retried, failed)`` counts."""
+    sent_ids = []
+    retried = failed = 0
+    for message in messages:
+        transport = transports.get(message.channel)
+        try:
+            if transport is None:
+                raise PermanentDeliveryError(f"No transport configured for channel {message.channel!r}")
+            transport.send(message)
+        except PermanentDeliveryError as e:
+            _fail(message, str(e))
+            failed += 1
+        except Exception as e:
+            if message.attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+                _fail(message, f"Gave up after {message.attempts} attempts: {e}")
+                failed += 1
+            else:
+                _retry(message, str(e))
+                retried += 1
+        else:
+            sent_ids.append(message.id)
+    if sent_ids:
+        # Only rows still leased to this worker; an expired lease means another worker took over
+        OutboxMessage.objects.filter(id__in=sent_ids, claim_token=messages[0].claim_token, status='Sending').update(
+            status='Sent', sent_at=timezone.now(), locked_until=None, last_error='',
+        )
+    return len(sent_ids), retried, failed
+
+
+def _retry(message, error):
+    delay = settings.OUTBOX_RETRY_BACKOFF * 2 ** (message.attempts - 1)
+    OutboxMessage.objects.filter(id=message.id, claim_token=message.claim_token, status='Sending').update(
+        status='Pending',
+        next_attempt_at=timezone.now() + timedelta(seconds=delay),
+        locked_until=None,
+        last_error=error,
+    )
+    logger.warning(f"Outbox message {message.id} ({message.channel}) failed ({error}); retrying in {delay}s")
+
+
+def _fail(message, error):
+    OutboxMessage.objects.filter(id=message.id, claim_token=message.claim_token, status='Sending').update(
+        status='Failed', locked_until=None, last_error=error,
+    )
+    logger.error(f"Outbox message {message.id} ({message.channel}) to {message.recipient} failed: {error}")
+
+
+def purge_delivered(batch_size=1000):
+    """
+    Delete up to ``batch_size`` sent or failed messages older than
+    OUTBOX_RETENTION. Returns how many were deleted.
+    """
+    cutoff = timezone.now() - timedelta(seconds=settings.OUTBOX_RETENTION)
+    # next_attempt_at never follows the last attempt, and (status, next_attempt_at) is indexed
+    ids = list(
+        OutboxMessage.objects.filter(status__in=['Sent', 'Failed'], next_attempt_at__lt=cutoff)
+        .order_by('next_attempt_at').values_list('id', flat=True)[:batch_size]
+    )
+    if not ids:
+        return 0
+    deleted, _ = OutboxMessage.objects.filter(id__in=ids).delete()
+    return deleted
@@ -1,20 +1,225 @@
 # accounts/pagination.py
-from rest_framework.pagination import PageNumberPagination
+import base64
+import binascii
+import json
+from datetime import datetime
+from decimal import Decimal
+
+from functools import partial
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.paginator import Paginator as DjangoPaginator, Page, EmptyPage, PageNotAnInteger
+from django.db.models import Q
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
 from rest_framework.response import Response
 import math
 
+from .caching import catalog_cache, versioned_key
+from .filters import normalize_product_filters
+
+
+class EstimatedPage(Page):
+    """A page whose has_next() comes from peeking one row ahead, not from the total."""
+
+    def __init__(self, object_list, number, paginator, has_more):
+        super().__init__(object_list, number, paginator)
+        self.has_more = has_more
+
+    def has_next(self):
+        return self.has_more
+
+
+class CappedCountPaginator(DjangoPaginator):
+    """
+    Paginator whose total is cached per normalized filter set and capped.
+
+    The count runs as ``COUNT(*)`` over at most ``cap + 1`` rows, so broad
+    queries stop counting at the cap and report ``count_is_exact = False``.
+    Pages past the cap stay reachable; their has_next() peeks one row ahead.
+    """
+
+    def __init__(self, object_list, per_page, cache_key=None, cap=None, timeout=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.cache_key = cache_key
+        self.cap = cap if cap is not None else getattr(settings, 'PRODUCT_COUNT_CAP', 10000)
+        self.timeout = timeout if timeout is not None else getattr(settings, 'PRODUCT_COUNT_CACHE_TTL', 60)
+        self.count_is_exact = True
+
+    @cached_property
+    def count(self):
+        cache = catalog_cache()
+        cached = cache.get(self.cache_key) if self.cache_key else None
+        if cached is not None:
+            count, self.count_is_exact = cached
+            return count
+
+        counted = self.object_list.order_by().values('pk')[:self.cap + 1].count()
+        self.count_is_exact = counted <= self.cap
+        count = min(counted, self.cap)
+        if self.cache_key:
+            cache.set(self.cache_key, (count, self.count_is_exact), self.timeout)
+        return count
+
+    def validate_number(self, number):
+        self.count  # resolves count_is_exact
+        if self.count_is_exact:
+            return super().validate_number(number)
+        # With an estimated total only the lower bound can be checked
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger(self.error_messages["invalid_page"])
+        if number < 1:
+            raise EmptyPage(self.error_messages["min_page"])
+        return number
+
+    def page(self, number):
+        number = self.validate_number(number)
+        if self.count_is_exact:
+            return super().page(number)
+        bottom = (number - 1) * self.per_page
+        rows = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if not rows and number > 1:
+            raise EmptyPage(self.error_messages["no_results"])
+        return EstimatedPage(rows[:self.per_page], number, self, len(rows) > self.per_page)
+
+
 class ProductPagination(PageNumberPagination):
     page_size = 20  # default
     page_size_query_param = 'limit'
+    count_cache_prefix = 'product_count'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        cache_key = versioned_key(self.count_cache_prefix, normalize_product_filters(request.query_params))
+        self.django_paginator_class = partial(CappedCountPaginator, cache_key=cache_key)
+        return super().paginate_queryset(queryset, request, view)
 
     def get_paginated_response(self, data):
-        total_products = self.page.paginator.count
+        paginator = self.page.paginator
+        total_products = paginator.count
+        is_exact = paginator.count_is_exact
         total_pages = math.ceil(total_products / self.get_page_size(self.request))
         return Response({
             "current_page": self.page.number,
             "total_pages": total_pages,
             "found_products": total_products,
+            "found_products_display": f"{total_products:,}" if is_exact else f"{total_products:,}+",
+            "total_is_exact": is_exact,
             "limit": self.get_page_size(self.request),
             "has_next_page": self.page.has_next(),
             "products": data
         })
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor (keyset) pagination keyed on the queryset's leading sort field with
+    ``id`` as a tie-breaker.
+
+    Instead of OFFSET/COUNT each page is fetched with a WHERE clause on the
+    last seen ``(sort value, id)`` pair, so the cost of a page does not depend
+    on how deep into the list it is. Cursors are opaque base64 tokens.
+    """
+    page_size = 20
+    page_size_query_param = 'limit'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    default_ordering = '-created_at'
+    tie_breaker = 'id'
+    results_key = 'results'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(page_size, self.max_page_size) if page_size > 0 else self.page_size
+
+    def get_sort(self, queryset):
+        ordering = [field for field in queryset.query.order_by if isinstance(field, str)]
+        sort = ordering[0] if ordering else self.default_ordering
+        return sort.lstrip('-'), sort.startswith('-')
+
+    def encode_cursor(self, row, reverse):
+        # Rows are model instances or .values() dicts
+        if isinstance(row, dict):
+            value, pk = row[self.sort_field], row[self.tie_breaker]
+        else:
+            value, pk = getattr(row, self.sort_field), row.pk
+        if isinstance(value, (datetime, Decimal)):
+            value = value.isoformat() if isinstance(value, datetime) else str(value)
+        payload = json.dumps({'v': value, 'i': pk, 'r': reverse}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, request, model):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            padded = encoded + '=' * (-len(encoded) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+            value, pk, reverse = payload['v'], int(payload['i']), bool(payload['r'])
+            try:
+                value = model._meta.get_field(self.sort_field).to_python(value)
+            except FieldDoesNotExist:
+                # Annotated sort keys such as search_rank are floats
+                value = float(value)
+        except (TypeError, ValueError, KeyError, binascii.Error, ValidationError, UnicodeDecodeError):
+            raise NotFound(self.invalid_cursor_message)
+        return value, pk, reverse
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.sort_field, descending = self.get_sort(queryset)
+        cursor = self.decode_cursor(request, queryset.model)
+        reverse = cursor is not None and cursor[2]
+
+        # Walking backwards flips the scan direction; rows are re-reversed below.
+        scan_descending = descending != reverse
+        prefix = '-' if scan_descending else ''
+        queryset = queryset.order_by(f'{prefix}{self.sort_field}', f'{prefix}{self.tie_breaker}')
+
+        if cursor is not None:
+            value, pk, _ = cursor
+            lookup = 'lt' if scan_descending else 'gt'
+            queryset = queryset.filter(
+                Q(**{f'{self.sort_field}__{lookup}': value}) |
+                Q(**{self.sort_field: value, f'{self.tie_breaker}__{lookup}': pk})
+            )
+
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+
+        if reverse:
+            rows.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, cursor is not None
+
+        self.next_cursor = self.encode_cursor(rows[-1], False) if rows and self.has_next else None
+        self.previous_cursor = self.encode_cursor(rows[0], True) if rows and self.has_previous else None
+        return rows
+
+    def get_paginated_response(self, data):
+        return Response({
+            "limit": self.page_size,
+            "has_next_page": self.has_next,
+            "has_previous_page": self.has_previous,
+            "next_cursor": self.next_cursor,
+            "previous_cursor": self.previous_cursor,
+            self.results_key: data
+        })
+
+
+class ProductCursorPagination(KeysetPagination):
+    results_key = 'products'
+
+
+class OrderCursorPagination(KeysetPagination):
+    results_key = 'orders'
@@ -0,0 +1,253 @@
+"""
+Asynchronous order payments.
+
+``OrderPaymentView`` only records a ``PaymentAttempt`` and answers 202; the
+``process_payments`` worker claims due attempts, calls the configured gateway
+from a thread pool and writes the outcome back. Web request latency therefore
+never depends on the payment provider.
+
+* Gateways implement ``PaymentGateway.charge`` and are selected with the
+  ``PAYMENT_GATEWAY`` setting; ``FakeGateway`` is a local stand-in for tests.
+* Every attempt carries an idempotency key that is passed to the gateway, so
+  a charge retried after a timeout is not taken twice.
+* Timeouts and gateway errors are retried with exponential backoff up to
+  ``PAYMENT_MAX_ATTEMPTS``; declines fail immediately.
+* Attempts are claimed with a conditional UPDATE and a lease, so several
+  worker processes can run side by side and a crashed worker's attempts are
+  picked up again once the lease expires.
+"""
+import logging
+import random
+import threading
+import time
+import uuid
+from datetime import timedelta
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from rest_framework import status
+
+from .concurrency import VersionConflict
+from .models import Order, PaymentAttempt
+from .sales import SalesChanges
+
+logger = logging.getLogger(__name__)
+
+IN_FLIGHT = ('Queued', 'Processing')
+
+# Optimistic retries when the order changes between reading and writing it
+ORDER_UPDATE_RETRIES = 5
+
+
+class PaymentError(Exception):
+    def __init__(self, message, status_code=status.HTTP_400_BAD_REQUEST):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+class PaymentDeclined(Exception):
+    """The provider refused the charge; retrying will not help."""
+
+
+class GatewayError(Exception):
+    """A transient provider failure; the attempt is retried."""
+
+
+class GatewayTimeout(GatewayError):
+    pass
+
+
+class PaymentGateway:
+    def charge(self, *, amount, reference, idempotency_key, timeout):
+        """
+        Charge ``amount`` and return the provider's transaction reference.
+
+        Must give up after ``timeout`` seconds with GatewayTimeout, raise
+        PaymentDeclined for a refused payment and GatewayError for anything
+        worth retrying. Repeated calls with the same ``idempotency_key`` must
+        return the original charge instead of creating a new one.
+        """
+        raise NotImplementedError
+
+
+class FakeGateway(PaymentGateway):
+    """
+    In-memory gateway with configurable latency and failure rates.
+
+    A simulated timeout records the charge before failing, like a provider
+    whose response was lost, so retries exercise the idempotency key.
+    """
+
+    def __init__(self, latency=0.0, timeout_rate=0.0, error_rate=0.0, decline_rate=0.0, seed=None):
+        self.latency = latency
+        self.timeout_rate = timeout_rate
+        self.error_rate = error_rate
+        self.decline_rate = decline_rate
+        self.random = random.Random(seed)
+        self.charges = {}
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def charge(self, *, amount, reference, idempotency_key, timeout):
+        with self.lock:
+            self.calls += 1
+            roll = self.random.random()
+            if idempotency_key in self.charges:
+                return self.charges[idempotency_key]
+        if self.latency > timeout:
+            time.sleep(timeout)
+            raise GatewayTimeout(f"No response within {timeout}s")
+        time.sleep(self.latency)
+
+        if roll < self.decline_rate:
+            raise PaymentDeclined("Card declined")
+        roll -= self.decline_rate
+        if roll < self.error_rate:
+            raise GatewayError("Gateway unavailable")
+        roll -= self.error_rate
+        with self.lock:
+            charge_id = self.charges.setdefault(idempotency_key, f"fake_{uuid.uuid4().hex[:16]}")
+        if roll < self.timeout_rate:
+            raise GatewayTimeout("Response lost")
+        return charge_id
+
+
+@lru_cache(maxsize=None)
+def get_gateway():
+    return import_string(settings.PAYMENT_GATEWAY)(**settings.PAYMENT_GATEWAY_OPTIONS)
+
+
+def request_payment(order_id, buyer, idempotency_key=None):
+    """
+    Queue a payment for the buyer's order. Returns ``(attempt, created)``.
+
+    Repeating a request with the same idempotency key, or paying while an
+    attempt is still queued or processing, returns the existing attempt. No
+    row lock is taken: the partial unique constraint on in-flight attempts
+    decides between concurrent requests.
+    """
+    order = Order.objects.only('id', 'payment_status', 'total_price').get(id=order_id, buyer=buyer)
+    if idempotency_key:
+        existing = order.payment_attempts.filter(idempotency_key=idempotency_key).first()
+        if existing is not None:
+            return existing, False
+    if order.payment_status == 'Paid':
+        raise PaymentError("Order already paid.")
+    try:
+        with transaction.atomic():
+            attempt = PaymentAttempt.objects.create(
+                order=order,
+                idempotency_key=idempotency_key or uuid.uuid4().hex,
+                amount=order.total_price,
+            )
+    except IntegrityError:
+        # Another request queued a payment for this order first
+        existing = order.payment_attempts.filter(
+            Q(status__in=IN_FLIGHT) | Q(idempotency_key=idempotency_key or '')
+        ).order_by('-id').first()
+        if existing is None:
+            raise
+        return existing, False
+    return attempt, True
+
+
+def _due():
+    now = timezone.now()
+    return Q(status='Queued', next_attempt_at__lte=now) | Q(status='Processing', locked_until__lt=now)
+
+
+def claim_due_attempts(limit):
+    """Lease up to ``limit`` due attempts to this worker and return their ids."""
+    candidates = list(
+        PaymentAttempt.objects.filter(_due()).order_by('next_attempt_at').values_list('id', flat=True)[:limit]
+    )
+    claimed = []
+    for attempt_id in candidates:
+        # Another worker may have claimed it since the SELECT
+        if PaymentAttempt.objects.filter(_due(), id=attempt_id).update(
+            status='Processing',
+            locked_until=timezone.now() + timedelta(seconds=settings.PAYMENT_LEASE_SECONDS),
+            attempts=F('attempts') + 1,
+            updated_at=timezone.now(),
+        ):
+            claimed.append(attempt_id)
+    return claimed
+
+
+def process_attempt(attempt_id, gateway=None):
+    """Charge one claimed attempt and record the outcome. Returns the new status."""
+    gateway = gateway or get_gateway()
+    attempt = PaymentAttempt.objects.get(id=attempt_id)
+    try:
+        reference = gateway.charge(
+            amount=attempt.amount,
+            reference=f"order-{attempt.order_id}",
+            idempotency_key=attempt.idempotency_key,
+            timeout=settings.PAYMENT_GATEWAY_TIMEOUT,
+        )
+    except PaymentDeclined as e:
+        return _finish(attempt, 'Failed', error=str(e))
+    except Exception as e:
+        if not isinstance(e, GatewayError):
+            logger.exception(f"Unexpected error charging payment {attempt.id}")
+        if attempt.attempts >= settings.PAYMENT_MAX_ATTEMPTS:
+            return _finish(attempt, 'Failed', error=f"Gave up after {attempt.attempts} attempts: {e}")
+        return _retry(attempt, str(e))
+    return _finish(attempt, 'Succeeded', reference=reference)
+
+
+def _retry(attempt, error):
+    delay = settings.PAYMENT_RETRY_BACKOFF * 2 ** (attempt.attempts - 1)
+    PaymentAttempt.objects.filter(id=attempt.id, status='Processing').update(
+        status='Queued',
+        next_attempt_at=timezone.now() + timedelta(seconds=delay),
+        locked_until=None,
+        last_error=error,
+        updated_at=timezone.now(),
+    )
+    logger.warning(f"Payment {attempt.id} for order {attempt.order_id} failed ({error}); retrying in {delay}s")
+    return 'Queued'
+
+
+def _finish(attempt, outcome, reference='', error=''):
+    with transaction.atomic():
+        finished = PaymentAttempt.objects.filter(id=attempt.id, status='Processing').update(
+            status=outcome,
+            gateway_reference=reference,
+            last_error=error,
+            locked_until=None,
+            updated_at=timezone.now(),
+        )
+        if not finished:
+            # The lease expired and another worker already settled it
+            return PaymentAttempt.objects.values_list('status', flat=True).get(id=attempt.id)
+
+        new_payment_status = 'Paid' if outcome == 'Succeeded' else 'Failed'
+        for _ in range(ORDER_UPDATE_RETRIES):
+            row = (
+                Order.objects.filter(id=attempt.order_id)
+                .values('seller_id', 'status', 'payment_status', 'total_price', 'created_at', 'version').first()
+            )
+            if row is None or row['payment_status'] in ('Paid', new_payment_status):
+                break
+            # Only applies if the order is still at the version just read
+            if Order.objects.filter(id=attempt.order_id, version=row['version']).update(
+                payment_status=new_payment_status, version=F('version') + 1,
+            ):
+                changes = SalesChanges()
+                changes.state_changed(
+                    row['seller_id'], row['created_at'],
+                    (row['status'], row['payment_status'], row['total_price']),
+                    (row['status'], new_payment_status, row['total_price']),
+                )
+                changes.apply()
+                break
+        else:
+            raise VersionConflict(f"Order {attempt.order_id} kept changing while recording payment {attempt.id}")
+    logger.info(f"Payment {attempt.id} for order {attempt.order_id}: {outcome}")
+    return outcome
@@ -0,0 +1,80 @@
+"""
+JSON rendering for large responses.
+
+``FastJSONRenderer`` is a drop-in for DRF's ``JSONRenderer`` that encodes with
+orjson when it is installed. orjson writes datetimes itself and the ``default``
+hook covers Decimal and the other types DRF's encoder knows, so strings,
+integers, Decimals, dates and nested containers come out as the same bytes
+as the stock renderer's compact UTF-8 output. Floats differ in two ways:
+
+* exponents have no plus sign (``1e16`` where JSONRenderer writes ``1e+16``),
+  which parses to the same number;
+* NaN and infinities are written as ``null``, where JSONRenderer (with DRF's
+  default ``STRICT_JSON``) raises ValueError.
+
+Indented output (the browsable API) and anything orjson refuses fall back to
+the stock renderer.
+
+``StreamingJSONResponse`` sends a JSON array a batch of items at a time, so a
+full list export never holds more than one batch of rendered rows in memory.
+"""
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - the stdlib encoder is used instead
+    orjson = None
+
+_encoder = JSONEncoder()
+
+
+def _default(obj):
+    # Decimal, date, time, timedelta, UUID, lazy strings, querysets, ...
+    return _encoder.default(obj)
+
+
+class FastJSONRenderer(JSONRenderer):
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if orjson is None or self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(
+                data, default=_default,
+                option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS,
+            )
+        except orjson.JSONEncodeError:
+            # e.g. integers wider than 64 bits
+            return super().render(data, accepted_media_type, renderer_context)
+        # Same escaping as JSONRenderer: these break JavaScript string literals
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+
+def iter_json_array(items, renderer=None, batch_size=None):
+    """Yield the encoded JSON array of ``items`` one batch of items at a time."""
+    renderer = renderer or FastJSONRenderer()
+    batch_size = batch_size or settings.LIST_STREAM_BATCH_SIZE
+    yield b'['
+    separator = b''
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield separator + renderer.render(batch)[1:-1]
+            separator = b','
+            batch = []
+    if batch:
+        yield separator + renderer.render(batch)[1:-1]
+    yield b']'
+
+
+class StreamingJSONResponse(StreamingHttpResponse):
+
+    def __init__(self, items, renderer=None, batch_size=None, **kwargs):
+        kwargs.setdefault('content_type', 'application/json')
+        super().__init__(iter_json_array(items, renderer, batch_size), **kwargs)
@@ -0,0 +1,213 @@
+"""
+Incrementally maintained seller sales summaries.
+
+Every order write also applies its change to the seller's
+``SellerSalesSummary`` row and to the ``SellerDailySales`` row for the day the
+order was placed, using ``F()`` increments inside the caller's transaction.
+Dashboards then read a handful of summary rows instead of aggregating the
+order table. ``rebuild_sales_summary`` recomputes everything from ``Order``
+and reports drift.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, Count, F, Sum, Value, When
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Order, SellerSalesSummary, SellerDailySales
+
+STATUS_COLUMNS = {
+    'Pending': 'pending_orders',
+    'Shipped': 'shipped_orders',
+    'Delivered': 'delivered_orders',
+}
+PAYMENT_COLUMNS = {
+    'Pending': ('unpaid_orders', 'unpaid_revenue'),
+    'Paid': ('paid_orders', 'paid_revenue'),
+    'Failed': ('failed_orders', 'failed_revenue'),
+}
+COUNTER_FIELDS = [
+    'orders', 'pending_orders', 'shipped_orders', 'delivered_orders',
+    'paid_orders', 'unpaid_orders', 'failed_orders',
+    'revenue', 'paid_revenue', 'unpaid_revenue', 'failed_revenue',
+]
+
+
+def contribution(status, payment_status, total_price, count=1):
+    """The counter deltas ``count`` orders in the given state add to a summary."""
+    count_column, revenue_column = PAYMENT_COLUMNS[payment_status]
+    return {
+        'orders': count,
+        STATUS_COLUMNS[status]: count,
+        count_column: count,
+        'revenue': total_price,
+        revenue_column: total_price,
+    }
+
+
+def order_state(order):
+    # Order.save() re-prices total_price, so it is part of the state
+    return order.status, order.payment_status, order.total_price
+
+
+def order_day(created_at):
+    return timezone.localdate(created_at) if timezone.is_aware(created_at) else created_at.date()
+
+
+class SalesChanges:
+    """Collects counter deltas per seller and per seller/day, then writes them in one go."""
+
+    def __init__(self):
+        self.totals = defaultdict(lambda: defaultdict(int))
+        self.daily = defaultdict(lambda: defaultdict(int))
+
+    def add(self, seller_id, created_at, deltas, sign=1):
+        day = order_day(created_at)
+        for column, value in deltas.items():
+            self.totals[seller_id][column] += sign * value
+            self.daily[(seller_id, day)][column] += sign * value
+
+    def order_added(self, order):
+        self.add(order.seller_id, order.created_at, contribution(*order_state(order)))
+
+    def order_removed(self, order):
+        self.add(order.seller_id, order.created_at, contribution(*order_state(order)), -1)
+
+    def order_changed(self, order, previous):
+        # previous is order_state() taken before the order was modified
+        self.state_changed(order.seller_id, order.created_at, previous, order_state(order))
+
+    def state_changed(self, seller_id, created_at, previous, current):
+        if previous == current:
+            return
+        self.add(seller_id, created_at, contribution(*previous), -1)
+        self.add(seller_id, created_at, contribution(*current))
+
+    def apply(self, create=True):
+        """
+        Write the collected deltas. Must run inside the transaction that
+        changed the orders. With ``create=False`` missing rows are left alone
+        (used when orders are deleted, possibly along with their seller).
+        """
+        if create:
+            SellerSalesSummary.objects.bulk_create(
+                [SellerSalesSummary(seller_id=seller_id) for seller_id in self.totals], ignore_conflicts=True
+            )
+            SellerDailySales.objects.bulk_create(
+                [SellerDailySales(seller_id=seller_id, day=day) for seller_id, day in self.daily], ignore_conflicts=True
+            )
+        for seller_id, deltas in self.totals.items():
+            updates = _increments(deltas)
+            if updates:
+                SellerSalesSummary.objects.filter(seller_id=seller_id).update(updated_at=timezone.now(), **updates)
+        # One UPDATE per seller covers all of that seller's days
+        days_by_seller = defaultdict(dict)
+        for (seller_id, day), deltas in self.daily.items():
+            days_by_seller[seller_id][day] = deltas
+        for seller_id, days in days_by_seller.items():
+            updates = _daily_increments(days)
+            if updates:
+                SellerDailySales.objects.filter(seller_id=seller_id, day__in=days).update(**updates)
+
+
+def _increments(deltas):
+    return {column: F(column) + value for column, value in deltas.items() if value}
+
+
+def _daily_increments(days):
+    if len(days) == 1:
+        return _increments(next(iter(days.values())))
+    updates = {}
+    for column in COUNTER_FIELDS:
+        whens = [When(day=day, then=Value(deltas[column])) for day, deltas in days.items() if deltas.get(column)]
+        if whens:
+            field = SellerDailySales._meta.get_field(column)
+            updates[column] = F(column) + Case(*whens, default=Value(0), output_field=field)
+    return updates
+
+
+def record_orders_placed(orders):
+    changes = SalesChanges()
+    for order in orders:
+        changes.order_added(order)
+    changes.apply()
+
+
+def record_order_change(order, previous):
+    changes = SalesChanges()
+    changes.order_changed(order, previous)
+    changes.apply()
+
+
+def get_seller_summary(seller, day_from=None, day_to=None):
+    """Totals and daily rows for ``seller``, read from the summary tables only."""
+    summary = SellerSalesSummary.objects.filter(seller=seller).values(*COUNTER_FIELDS).first()
+    if summary is None:
+        summary = {field: 0 if field.endswith('orders') else Decimal('0.00') for field in COUNTER_FIELDS}
+    daily = SellerDailySales.objects.filter(seller=seller)
+    if day_from:
+        daily = daily.filter(day__gte=day_from)
+    if day_to:
+        daily = daily.filter(day__lte=day_to)
+    return summary, daily.order_by('day').values('day', *COUNTER_FIELDS)
+
+
+def compute_sales_from_orders():
+    """Recompute every summary and daily row from the order table in one GROUP BY."""
+    changes = SalesChanges()
+    rows = (
+        Order.objects.annotate(day=TruncDate('created_at'))
+        .values('seller_id', 'day', 'status', 'payment_status')
+        .annotate(count=Count('id'), total=Sum('total_price'))
+        .order_by()
+    )
+    for row in rows:
+        deltas = contribution(row['status'], row['payment_status'], row['total'], row['count'])
+        for column, value in deltas.items():
+            changes.totals[row['seller_id']][column] += value
+            changes.daily[(row['seller_id'], row['day'])][column] += value
+    return changes
+
+
+def _normalize(counters):
+    return {
+        field: Decimal(counters.get(field, 0)).quantize(Decimal('0.01')) if field.endswith('revenue') else counters.get(field, 0)
+        for field in COUNTER_FIELDS
+    }
+
+
+def diff_sales_summary(expected):
+    """Return ``[(label, stored, expected), ...]`` for rows that do not match ``expected``."""
+    mismatches = []
+    stored_totals = {row.pop('seller_id'): row for row in SellerSalesSummary.objects.values('seller_id', *COUNTER_FIELDS)}
+    stored_daily = {
+        (row.pop('seller_id'), row.pop('day')): row
+        for row in SellerDailySales.objects.values('seller_id', 'day', *COUNTER_FIELDS)
+    }
+    for label, stored, computed in (('seller', stored_totals, expected.totals), ('day', stored_daily, expected.daily)):
+        for key in set(stored) | set(computed):
+            stored_row, computed_row = _normalize(stored.get(key, {})), _normalize(computed.get(key, {}))
+            if stored_row != computed_row:
+                mismatches.append((f"{label} {key}", stored_row, computed_row))
+    return mismatches
+
+
+def rebuild_sales_summary(expected):
+    """
+    Replace every summary and daily row with ``expected``. Run it in the same
+    transaction as ``compute_sales_from_orders``: an order written in between
+    would otherwise be dropped from the rebuilt rows.
+    """
+    with transaction.atomic():
+        SellerDailySales.objects.all().delete()
+        SellerSalesSummary.objects.all().delete()
+        SellerSalesSummary.objects.bulk_create([
+            SellerSalesSummary(seller_id=seller_id, **_normalize(counters))
+            for seller_id, counters in expected.totals.items()
+        ], batch_size=1000)
+        SellerDailySales.objects.bulk_create([
+            SellerDailySales(seller_id=seller_id, day=day, **_normalize(counters))
+            for (seller_id, day), counters in expected.daily.items()
+        ], batch_size=1000)
@@ -0,0 +1,170 @@
+"""
+Full-text search for the product catalog.
+
+Products are mirrored into an SQLite FTS5 table (``accounts_product_fts``)
+whose rowid is the product id and whose columns hold the product title,
+description, brand title and category title. Keyword searches MATCH against
+that index instead of running ``icontains`` scans, and results can be ordered
+by bm25 relevance. The index is kept in sync by the receivers in
+``accounts.signals``; ``manage.py rebuild_search_index`` repopulates it.
+
+On databases without FTS5 the old ``icontains`` lookup is used instead.
+"""
+import logging
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = 'accounts_product_fts'
+
+# bm25 column weights: title, description, brand, category
+RANK_WEIGHTS = (10.0, 1.0, 5.0, 5.0)
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+INDEX_BATCH_SIZE = 500
+
+_index_ready = False
+
+
+def is_available():
+    """Return True when the FTS5 table exists on the default database."""
+    global _index_ready
+    if connection.vendor != 'sqlite':
+        return False
+    if not _index_ready:
+        _index_ready = FTS_TABLE in connection.introspection.table_names()
+    return _index_ready
+
+
+def build_match_query(keyword):
+    """
+    Turn free text into an FTS5 MATCH expression.
+
+    Every word becomes a quoted prefix term so "jack" still finds "jacket",
+    and the terms are ANDed together. Returns None if nothing searchable is left.
+    """
+    tokens = TOKEN_RE.findall((keyword or '').lower())
+    if not tokens:
+        return None
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+def filter_products(queryset, keyword):
+    """
+    Restrict a Product queryset to rows matching ``keyword``.
+
+    Returns ``(queryset, ranked)``. When ``ranked`` is True the queryset is
+    joined to the full-text table and ``annotate_rank`` can be applied to it.
+    """
+    match = build_match_query(keyword)
+    if match is None or not is_available():
+        queryset = queryset.filter(
+            Q(title__icontains=keyword) |
+            Q(brand__title__icontains=keyword) |
+            Q(category__title__icontains=keyword)
+        )
+        return queryset, False
+
+    # A join (rather than a correlated subquery) lets SQLite drive the query
+    # from the FTS match and evaluate bm25 once per matching row.
+    product_table = queryset.model._meta.db_table
+    queryset = queryset.extra(
+        tables=[FTS_TABLE],
+        where=[f"{FTS_TABLE} MATCH %s", f"{FTS_TABLE}.rowid = {product_table}.id"],
+        params=[match],
+    )
+    return queryset, True
+
+
+def annotate_rank(queryset):
+    """Annotate a queryset from filter_products with ``search_rank`` (lower is more relevant)."""
+    weights = ', '.join(str(weight) for weight in RANK_WEIGHTS)
+    return queryset.annotate(search_rank=RawSQL(f"bm25({FTS_TABLE}, {weights})", ()))
+
+
+def _chunks(values, size=INDEX_BATCH_SIZE):
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def _index_rows(queryset):
+    return queryset.values_list('id', 'title', 'description', 'brand__title', 'category__title')
+
+
+def _insert_rows(cursor, rows):
+    cursor.executemany(
+        f"INSERT INTO {FTS_TABLE}(rowid, title, description, brand, category) VALUES (%s, %s, %s, %s, %s)",
+        [(pk, title, description, brand or '', category or '') for pk, title, description, brand, category in rows]
+    )
+
+
+def index_products(product_ids):
+    """(Re)index the given products."""
+    from .models import Product
+
+    product_ids = list(product_ids)
+    if not product_ids or not is_available():
+        return
+    with connection.cursor() as cursor:
+        for chunk in _chunks(product_ids):
+            placeholders = ', '.join(['%s'] * len(chunk))
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})", chunk)
+            _insert_rows(cursor, _index_rows(Product.objects.filter(id__in=chunk)))
+
+
+def remove_products(product_ids):
+    """Drop the given products from the index."""
+    product_ids = list(product_ids)
+    if not product_ids or not is_available():
+        return
+    with connection.cursor() as cursor:
+        for chunk in _chunks(product_ids):
+            placeholders = ', '.join(['%s'] * len(chunk))
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})", chunk)
+
+
+def rename_related(column, related_field, related_id, title):
+    """
+    Rewrite the brand or category column for every product pointing at a
+    renamed Brand/Category in a single statement.
+    """
+    from .models import Product
+
+    if column not in ('brand', 'category') or not is_available():
+        return
+    product_table = Product._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"UPDATE {FTS_TABLE} SET {column} = %s "
+            f"WHERE rowid IN (SELECT id FROM {product_table} WHERE {related_field} = %s)",
+            [title or '', related_id]
+        )
+
+
+def rebuild_index():
+    """Repopulate the whole index from the product table. Returns the row count."""
+    from .models import Product
+
+    if not is_available():
+        logger.warning("Full-text index is not available on this database; nothing to rebuild.")
+        return 0
+    count = 0
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE}")
+        batch = []
+        for row in _index_rows(Product.objects.order_by('id')).iterator(chunk_size=INDEX_BATCH_SIZE):
+            batch.append(row)
+            if len(batch) >= INDEX_BATCH_SIZE:
+                _insert_rows(cursor, batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            _insert_rows(cursor, batch)
+            count += len(batch)
+    logger.info(f"Rebuilt product search index with {count} products")
+    return count
@@ -1,10 +1,13 @@
 from rest_framework import serializers
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
 from django.db.models import Q
 from django.core.mail import send_mail
 from django.conf import settings
 import re
 import random
-from .models import CustomUser, OTPCode, Product, Order, Category, Brand
+from .models import CustomUser, OTPCode, Product, Order, Category, Brand, SellerSalesSummary, SellerDailySales, PaymentAttempt
+from .sales import COUNTER_FIELDS
+from .tokens import FilteredRefreshToken
 from django.contrib.auth.password_validation import validate_password
 
 class CustomUserSerializer(serializers.ModelSerializer):
@@ -250,7 +253,74 @@ class ProductSerializer(serializers.ModelSerializer):
             "category_name",
             "brand",
             "brand_name",
+            "stock",
+            "version",
         ]
+        read_only_fields = ["version"]
+
+    def get_image_url(self, obj):
+        request = self.context.get('request')
+        return None if not (obj.image and request) else request.build_absolute_uri(obj.image.url)
+
+class ProductListSerializer(serializers.ModelSerializer):
+    """
+    Compact product representation for catalog grids.
+
+    ``?fields=a,b`` trims the output to the listed fields (unknown names are
+    ignored; if none are known, all fields are kept) and ``?expand=seller``
+    adds the full nested seller profile. List views render it through
+    ``ValuesSerializer``, which selects only the columns these fields read.
+    """
+    image_url = serializers.SerializerMethodField()
+    category_name = serializers.CharField(source="category.title", read_only=True)
+    brand_name = serializers.CharField(source="brand.title", read_only=True)
+    seller_username = serializers.CharField(source="seller.username", read_only=True)
+
+    expandable_fields = {
+        "seller": CustomUserSerializer,
+    }
+
+    class Meta:
+        model = Product
+        fields = [
+            "id",
+            "title",
+            "product_slug",
+            "image_url",
+            "second_hand_price",
+            "original_price",
+            "condition",
+            "size",
+            "color",
+            "created_at",
+            "category",
+            "category_name",
+            "brand",
+            "brand_name",
+            "seller_username",
+        ]
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        requested, expanded = self.parse_field_params(self.context.get('request'))
+        for name in expanded:
+            self.fields[name] = self.expandable_fields[name](read_only=True)
+        requested &= set(self.fields)
+        if requested:
+            for name in set(self.fields) - requested - expanded:
+                self.fields.pop(name)
+
+    @classmethod
+    def parse_field_params(cls, request):
+        if request is None:
+            return set(), set()
+        params = request.query_params
+        requested = {name.strip() for name in params.get('fields', '').split(',') if name.strip()}
+        expanded = {
+            name.strip() for name in params.get('expand', '').split(',')
+            if name.strip() in cls.expandable_fields
+        }
+        return requested, expanded
 
     def get_image_url(self, obj):
         request = self.context.get('request')
@@ -270,9 +340,39 @@ class OrderSerializer(serializers.ModelSerializer):
             'total_price',
             'status',
             'payment_status',
+            'version',
+            'created_at',
+        ]
+        read_only_fields = ['version']
+
+class PaymentAttemptSerializer(serializers.ModelSerializer):
+    order_payment_status = serializers.CharField(source="order.payment_status", read_only=True)
+
+    class Meta:
+        model = PaymentAttempt
+        fields = [
+            'id',
+            'order',
+            'amount',
+            'status',
+            'order_payment_status',
+            'attempts',
+            'next_attempt_at',
+            'last_error',
             'created_at',
+            'updated_at',
         ]
 
+class SellerSalesSummarySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = SellerSalesSummary
+        fields = COUNTER_FIELDS
+
+class SellerDailySalesSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = SellerDailySales
+        fields = ['day'] + COUNTER_FIELDS
+
 class CategorySerializer(serializers.ModelSerializer):
     class Meta:
         model = Category
@@ -281,4 +381,9 @@ class CategorySerializer(serializers.ModelSerializer):
 class BrandSerializer(serializers.ModelSerializer):
     class Meta:
         model = Brand
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+
+
+class FilteredTokenRefreshSerializer(TokenRefreshSerializer):
+    # Checks the blacklist through the in-process filter before the database
+    token_class = FilteredRefreshToken
@@ -0,0 +1,71 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from . import search
+from .caching import bump_catalog_version
+from .authentication import SNAPSHOT_FIELDS, invalidate_user
+from .cart import invalidate_cart
+from .models import Product, Brand, Category, Order, CartItem, CustomUser, SnapshotUser
+from .sales import SalesChanges
+
+
+@receiver(post_save, sender=Product)
+def index_product(sender, instance, **kwargs):
+    search.index_products([instance.pk])
+
+
+@receiver(post_delete, sender=Product)
+def unindex_product(sender, instance, **kwargs):
+    # Also covers products removed by a Brand/Category cascade delete.
+    search.remove_products([instance.pk])
+
+
+@receiver(post_save, sender=Brand)
+def reindex_brand_products(sender, instance, created, **kwargs):
+    if not created:
+        search.rename_related('brand', 'brand_id', instance.pk, instance.title)
+
+
+@receiver(post_save, sender=Category)
+def reindex_category_products(sender, instance, created, **kwargs):
+    if not created:
+        search.rename_related('category', 'category_id', instance.pk, instance.title)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Brand)
+@receiver(post_delete, sender=Brand)
+def invalidate_catalog_cache(sender, **kwargs):
+    bump_catalog_version()
+
+
+@receiver(post_delete, sender=Order)
+def remove_order_from_sales(sender, instance, **kwargs):
+    # Admin deletes and product/user cascades; the views never delete orders
+    changes = SalesChanges()
+    changes.order_removed(instance)
+    changes.apply(create=False)
+
+
+@receiver(post_delete, sender=CartItem)
+def drop_cached_cart(sender, instance, **kwargs):
+    # Lines removed by a product cascade would otherwise linger in the cached cart
+    invalidate_cart(instance.user_id)
+
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_save, sender=SnapshotUser)
+def invalidate_user_snapshot(sender, instance, update_fields=None, **kwargs):
+    # Login only updates last_login, which the snapshot does not hold; a
+    # password change still drops it so the next request rereads the user
+    if update_fields is None or set(update_fields) & {'password', *SNAPSHOT_FIELDS}:
+        invalidate_user(instance.pk)
+
+
+@receiver(post_delete, sender=CustomUser)
+@receiver(post_delete, sender=SnapshotUser)
+def drop_user_snapshot(sender, instance, **kwargs):
+    invalidate_user(instance.pk)
@@ -1,3 +1,954 @@
-from django.test import TestCase
+import threading
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock, skipIf
 
-# Create your tests here.
+from django.contrib.auth import authenticate
+from django.contrib.auth.hashers import pbkdf2
+from django.core.management import CommandError, call_command
+from django.core.paginator import EmptyPage
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from . import authentication, fulfillment, inventory, otp, outbox, payments, tokens
+from .authentication import SNAPSHOT_FIELDS
+from .caching import catalog_cache, catalog_version
+from .checkout import place_orders
+from .fast_serializers import ValuesSerializer
+from .models import (
+    Brand, Category, CustomUser, Order, OTPCode, OutboxMessage, PaymentAttempt, Product, SellerSalesSummary,
+    SnapshotUser, StockReservation,
+)
+from .pagination import CappedCountPaginator, EstimatedPage
+from .renderers import FastJSONRenderer, orjson
+from .sales import compute_sales_from_orders, diff_sales_summary
+from .serializers import OrderSerializer, ProductListSerializer
+from .throttling import take_token, throttle_cache
+
+
+def make_product(seller, title='Red coat', price='50.00', stock=10):
+    category = Category.objects.get_or_create(title='Coats')[0]
+    return Product.objects.create(
+        seller=seller, title=title, description='Synthetic product', second_hand_price=Decimal(price),
+        category=category, stock=stock,
+    )
+
+
+class OrderAdminSalesTests(TestCase):
+    def setUp(self):
+        self.admin = CustomUser.objects.create_superuser(username='admin', email='admin@example.com', password='pw')
+        self.seller = CustomUser.objects.create(username='seller', email='seller@example.com')
+        self.buyer = CustomUser.objects.create(username='buyer', email='buyer@example.com')
+        self.client.force_login(self.admin)
+
+    def test_admin_add_and_change_keep_summary_in_step(self):
+        product = make_product(self.seller)
+        response = self.client.post('/admin/accounts/order/add/', {
+            'buyer': self.buyer.id, 'product': product.id, 'quantity': 2,
+            'status': 'Pending', 'payment_status': 'Pending', 'version': 1,
+        })
+        self.assertEqual(response.status_code, 302, response.content)
+        order = Order.objects.get()
+        summary = SellerSalesSummary.objects.get(seller=self.seller)
+        self.assertEqual((summary.orders, summary.pending_orders, summary.revenue), (1, 1, Decimal('100.00')))
+
+        response = self.client.post(f'/admin/accounts/order/{order.id}/change/', {
+            'buyer': self.buyer.id, 'product': product.id, 'quantity': 2,
+            'status': 'Shipped', 'payment_status': 'Paid', 'version': order.version,
+        })
+        self.assertEqual(response.status_code, 302, response.content)
+        summary.refresh_from_db()
+        self.assertEqual((summary.pending_orders, summary.shipped_orders, summary.paid_orders), (0, 1, 1))
+        self.assertEqual(diff_sales_summary(compute_sales_from_orders()), [])
+
+    def test_rebuild_repairs_drift(self):
+        place_orders(self.buyer, [{'product': make_product(self.seller).id, 'quantity': 2}])
+        SellerSalesSummary.objects.update(orders=5, revenue=Decimal('1.00'))
+        with self.assertRaisesMessage(CommandError, "1 summary rows differ"):
+            call_command('rebuild_sales_summary', '--check', stdout=StringIO())
+        out = StringIO()
+        call_command('rebuild_sales_summary', stdout=out)
+        self.assertIn("(1 had drifted)", out.getvalue())
+        summary = SellerSalesSummary.objects.get(seller=self.seller)
+        self.assertEqual((summary.orders, summary.revenue), (1, Decimal('100.00')))
+        self.assertEqual(diff_sales_summary(compute_sales_from_orders()), [])
+
+
+@override_settings(
+    PAYMENT_GATEWAY='accounts.payments.FakeGateway', PAYMENT_RETRY_BACKOFF=0, PAYMENT_GATEWAY_TIMEOUT=0.05,
+)
+class ProcessPaymentsTests(TransactionTestCase):
+    def setUp(self):
+        seller = CustomUser.objects.create(username='seller', email='seller@example.com')
+        self.buyer = CustomUser.objects.create(username='buyer', email='buyer@example.com')
+        product = make_product(seller)
+        self.order = place_orders(self.buyer, [{'product': product.id}])[0]
+        payments.get_gateway.cache_clear()
+        self.addCleanup(payments.get_gateway.cache_clear)
+
+    def run_worker(self, **gateway_options):
+        with override_settings(PAYMENT_GATEWAY_OPTIONS=gateway_options):
+            call_command('process_payments', '--once', '--workers', '2', stdout=StringIO())
+            return payments.get_gateway()
+
+    def test_success(self):
+        attempt, created = payments.request_payment(self.order.id, self.buyer)
+        self.assertTrue(created)
+        gateway = self.run_worker()
+        attempt.refresh_from_db()
+        self.assertEqual((attempt.status, attempt.attempts), ('Succeeded', 1))
+        self.assertEqual(attempt.gateway_reference, gateway.charges[attempt.idempotency_key])
+        self.assertEqual(Order.objects.get(id=self.order.id).payment_status, 'Paid')
+        self.assertEqual(diff_sales_summary(compute_sales_from_orders()), [])
+
+    def test_timeout_is_retried_without_charging_twice(self):
+        attempt, _ = payments.request_payment(self.order.id, self.buyer)
+        # Every response is lost after the charge is taken; the retry finds it by idempotency key
+        gateway = self.run_worker(timeout_rate=1.0)
+        attempt.refresh_from_db()
+        self.assertEqual((attempt.status, attempt.attempts), ('Succeeded', 2))
+        self.assertEqual((gateway.calls, len(gateway.charges)), (2, 1))
+        self.assertEqual(Order.objects.get(id=self.order.id).payment_status, 'Paid')
+
+    def test_one_attempt_in_flight_per_order(self):
+        results = []
+
+        def pay(key):
+            try:
+                results.append(payments.request_payment(self.order.id, self.buyer, idempotency_key=key))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=pay, args=(f'key-{i}',)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(results), 4)
+        self.assertEqual(len({attempt.id for attempt, _ in results}), 1)
+        self.assertEqual(sum(created for _, created in results), 1)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            PaymentAttempt.objects.create(order=self.order, idempotency_key='direct', amount=self.order.total_price)
+
+        gateway = self.run_worker()
+        self.assertEqual(len(gateway.charges), 1)
+        self.assertEqual(PaymentAttempt.objects.get().status, 'Succeeded')
+
+    def test_expired_lease_is_reclaimed(self):
+        attempt, _ = payments.request_payment(self.order.id, self.buyer)
+        # A worker claims the attempt and dies before charging it
+        self.assertEqual(payments.claim_due_attempts(10), [attempt.id])
+        self.assertEqual(payments.claim_due_attempts(10), [])
+        PaymentAttempt.objects.filter(id=attempt.id).update(locked_until=timezone.now() - timedelta(seconds=1))
+
+        self.run_worker()
+        attempt.refresh_from_db()
+        self.assertEqual((attempt.status, attempt.attempts), ('Succeeded', 2))
+        self.assertEqual(Order.objects.get(id=self.order.id).payment_status, 'Paid')
+
+
+class InventoryTests(TransactionTestCase):
+    def setUp(self):
+        seller = CustomUser.objects.create(username='seller', email='seller@example.com')
+        self.buyer = CustomUser.objects.create(username='buyer', email='buyer@example.com')
+        self.coat = make_product(seller, stock=5)
+        self.hat = make_product(seller, title='Hat', stock=1)
+
+    def stock(self, product):
+        return Product.objects.get(id=product.id).stock
+
+    def test_take_stock_is_all_or_nothing(self):
+        with self.assertRaisesMessage(inventory.StockError, f"product(s): {self.hat.id}"), transaction.atomic():
+            inventory.take_stock({self.coat.id: 2, self.hat.id: 3})
+        self.assertEqual((self.stock(self.coat), self.stock(self.hat)), (5, 1))
+
+        version = catalog_version()
+        with transaction.atomic():
+            inventory.take_stock({self.coat.id: 2, self.hat.id: 1})
+        self.assertEqual((self.stock(self.coat), self.stock(self.hat)), (3, 0))
+        self.assertGreater(catalog_version(), version)
+
+    def test_consume_reservations_gives_back_the_excess(self):
+        inventory.reserve(self.buyer, self.coat.id, 3)
+        self.assertEqual(self.stock(self.coat), 2)
+        with transaction.atomic():
+            inventory.consume_reservations(self.buyer, [(self.coat.id, 1)])
+        self.assertEqual(self.stock(self.coat), 4)
+        self.assertFalse(StockReservation.objects.exists())
+
+    def test_changing_a_reservation_keeps_its_expiry(self):
+        expires_at = inventory.reserve(self.buyer, self.coat.id, 1)
+        self.assertEqual(inventory.reserve(self.buyer, self.coat.id, 4), expires_at)
+        self.assertEqual(StockReservation.objects.get().expires_at, expires_at)
+        self.assertEqual(self.stock(self.coat), 1)
+
+    def test_release_expired_returns_stock_once(self):
+        inventory.reserve(self.buyer, self.coat.id, 3)
+        StockReservation.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        version = catalog_version()
+        self.assertEqual(inventory.release_expired(), 1)
+        self.assertEqual(inventory.release_expired(), 0)
+        self.assertEqual(self.stock(self.coat), 5)
+        self.assertGreater(catalog_version(), version)
+        with self.assertRaises(inventory.StockError), transaction.atomic():
+            inventory.consume_reservations(self.buyer, [(self.coat.id, 6)])
+
+    def test_concurrent_buyers_do_not_oversell(self):
+        sold = []
+
+        def buy():
+            try:
+                with transaction.atomic():
+                    inventory.take_stock({self.coat.id: 2})
+                sold.append(2)
+            except inventory.StockError:
+                pass
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=buy) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sum(sold), 4)
+        self.assertEqual(self.stock(self.coat), 1)
+
+
+class RefusingTransport(outbox.OutboxTransport):
+    def send(self, message):
+        raise outbox.PermanentDeliveryError("Recipient refused")
+
+
+@override_settings(OUTBOX_RETRY_BACKOFF=10, OUTBOX_MAX_ATTEMPTS=5, OUTBOX_LEASE_SECONDS=60)
+class OutboxTests(TransactionTestCase):
+    def enqueue(self, count):
+        return [outbox.enqueue_email(f'user{i}@example.com', 'Code', f'Your code is {i}') for i in range(count)]
+
+    def test_concurrent_workers_never_claim_the_same_message(self):
+        self.enqueue(20)
+        claimed = []
+
+        def work():
+            try:
+                while batch := outbox.claim_batch(3):
+                    claimed.extend(message.id for message in batch)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sorted(claimed), sorted(OutboxMessage.objects.values_list('id', flat=True)))
+        self.assertFalse(OutboxMessage.objects.exclude(attempts=1).exists())
+
+    def test_failures_back_off_exponentially(self):
+        message, = self.enqueue(1)
+        transports = {'email': outbox.FakeTransport(failure_rate=1.0)}
+        for attempt, delay in ((1, 10), (2, 20), (3, 40)):
+            before = timezone.now()
+            self.assertEqual(outbox.deliver_batch(outbox.claim_batch(10), transports), (0, 1, 0))
+            message.refresh_from_db()
+            self.assertEqual((message.status, message.attempts), ('Pending', attempt))
+            self.assertGreaterEqual(message.next_attempt_at, before + timedelta(seconds=delay))
+            self.assertLess(message.next_attempt_at, before + timedelta(seconds=delay + 5))
+            self.assertEqual(outbox.claim_batch(10), [])
+            OutboxMessage.objects.update(next_attempt_at=timezone.now())
+
+    def test_permanent_error_fails_at_once(self):
+        message, = self.enqueue(1)
+        self.assertEqual(outbox.deliver_batch(outbox.claim_batch(10), {'email': RefusingTransport()}), (0, 0, 1))
+        message.refresh_from_db()
+        self.assertEqual((message.status, message.attempts), ('Failed', 1))
+        self.assertEqual(outbox.claim_batch(10), [])
+
+    def test_sending_after_losing_the_lease_leaves_the_row_alone(self):
+        self.enqueue(2)
+        stale = outbox.claim_batch(10)
+        OutboxMessage.objects.update(locked_until=timezone.now() - timedelta(seconds=1))
+        current = outbox.claim_batch(10)
+        self.assertEqual([m.id for m in current], [m.id for m in stale])
+
+        outbox.deliver_batch(stale, {'email': outbox.FakeTransport()})
+        self.assertEqual(
+            set(OutboxMessage.objects.values_list('status', 'claim_token')), {('Sending', current[0].claim_token)},
+        )
+        self.assertEqual(outbox.deliver_batch(current, {'email': outbox.FakeTransport()}), (2, 0, 0))
+        self.assertEqual(OutboxMessage.objects.filter(status='Sent').count(), 2)
+
+    @override_settings(OUTBOX_RETENTION=60)
+    def test_purge_removes_old_sent_and_failed_messages(self):
+        sent, failed, pending, recent = self.enqueue(4)
+        old = timezone.now() - timedelta(seconds=120)
+        OutboxMessage.objects.filter(id=sent.id).update(status='Sent', next_attempt_at=old)
+        OutboxMessage.objects.filter(id=failed.id).update(status='Failed', next_attempt_at=old)
+        OutboxMessage.objects.filter(id=pending.id).update(next_attempt_at=old)
+        OutboxMessage.objects.filter(id=recent.id).update(status='Sent')
+        self.assertEqual(outbox.purge_delivered(), 2)
+        self.assertEqual(set(OutboxMessage.objects.values_list('id', flat=True)), {pending.id, recent.id})
+
+
+@override_settings(
+    PASSWORD_HASH_ITERATIONS=1000, AUTH_THROTTLE_RATES={'login': {'ip': '5/min', 'identifier': '3/min'}},
+)
+class LoginThrottleTests(TestCase):
+    def setUp(self):
+        throttle_cache().clear()
+        self.addCleanup(throttle_cache().clear)
+        user = CustomUser(username='alice', email='alice@example.com')
+        user.set_password('correct-password')
+        user.save()
+
+    def login(self, email='alice@example.com', **extra):
+        return self.client.post(
+            '/api/auth/login/', {'email': email, 'password': 'wrong-password'}, content_type='application/json', **extra,
+        )
+
+    def test_bucket_allows_a_burst_then_refills_at_the_rate(self):
+        take = lambda now: take_token('throttle:test', 3, 60, now_ms=now)  # noqa: E731
+        self.assertEqual([take(1_000_000) for _ in range(3)], [0, 0, 0])
+        self.assertEqual(take(1_000_000), 20.0)
+        # One token comes back every 60 / 3 seconds; rejections do not push that back
+        self.assertEqual(take(1_019_000), 1.0)
+        self.assertEqual(take(1_020_000), 0)
+        self.assertEqual(take(1_020_000), 20.0)
+        # An idle bucket starts full again
+        self.assertEqual([take(1_200_000) for _ in range(3)], [0, 0, 0])
+
+    def test_rejection_is_429_with_retry_after(self):
+        self.assertEqual([self.login().status_code for _ in range(3)], [401, 401, 401])
+        response = self.login()
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '20')
+        # Another identifier from the same address still has tokens
+        self.assertEqual(self.login(email='bob@example.com').status_code, 401)
+
+    def test_forwarded_for_does_not_reset_the_address_bucket(self):
+        statuses = [
+            self.login(email=f'user{i}@example.com', HTTP_X_FORWARDED_FOR=f'203.0.113.{i}').status_code
+            for i in range(6)
+        ]
+        self.assertEqual(statuses, [401] * 5 + [429])
+        self.assertEqual(self.login(email='other@example.com', REMOTE_ADDR='198.51.100.7').status_code, 401)
+
+    def test_rejection_skips_the_database_and_the_hasher(self):
+        for _ in range(3):
+            self.login()
+        with mock.patch('django.contrib.auth.hashers.pbkdf2') as pbkdf2, self.assertNumQueries(0):
+            self.assertEqual(self.login().status_code, 429)
+        pbkdf2.assert_not_called()
+
+
+class WriteOnLookup(dict):
+    """STATUS_TRANSITIONS stand-in that lets another client write after the order was read."""
+
+    def __init__(self, write):
+        super().__init__(Order.STATUS_TRANSITIONS)
+        self.write = write
+
+    def __getitem__(self, key):
+        if self.write:
+            self.write, write = None, self.write
+            write()
+        return super().__getitem__(key)
+
+
+class OptimisticConcurrencyTests(TransactionTestCase):
+    def setUp(self):
+        self.seller = CustomUser.objects.create(username='seller', email='seller@example.com')
+        buyer = CustomUser.objects.create(username='buyer', email='buyer@example.com')
+        self.product = make_product(self.seller)
+        self.order = place_orders(buyer, [{'product': self.product.id}])[0]
+        # Taking stock for the order already moved the product past version 1
+        self.version = Product.objects.get(id=self.product.id).version
+        self.client = APIClient()
+        self.client.force_authenticate(self.seller)
+        self.other_client = APIClient()
+        self.other_client.force_authenticate(self.seller)
+
+    def product_row(self):
+        return Product.objects.values_list('title', 'version').get(id=self.product.id)
+
+    def order_row(self):
+        return Order.objects.values_list('status', 'version').get(id=self.order.id)
+
+    def set_status(self, client, target, **data):
+        return client.put(f'/api/auth/order/{self.order.id}/status/', {'status': target, **data}, format='json')
+
+    def test_stale_if_match_on_a_product_is_409(self):
+        url = f'/api/auth/products/{self.product.id}/'
+        if_match = f'"{self.version}"'
+        response = self.other_client.patch(url, {'title': 'Theirs'}, format='json', HTTP_IF_MATCH=if_match)
+        self.assertEqual(response.status_code, 200)
+        response = self.client.patch(url, {'title': 'Mine'}, format='json', HTTP_IF_MATCH=if_match)
+        self.assertEqual((response.status_code, response.json()['version']), (409, self.version + 1))
+        self.assertEqual(self.product_row(), ('Theirs', self.version + 1))
+
+    def test_product_write_after_the_read_is_not_overwritten(self):
+        def write_then_read_version(request):
+            Product.objects.filter(id=self.product.id).update(title='Theirs', version=F('version') + 1)
+            return None
+
+        with mock.patch('accounts.views.expected_version', side_effect=write_then_read_version):
+            response = self.client.patch(f'/api/auth/products/{self.product.id}/', {'title': 'Mine'}, format='json')
+        self.assertEqual((response.status_code, response.json()['version']), (409, self.version + 1))
+        self.assertEqual(self.product_row(), ('Theirs', self.version + 1))
+
+    def test_two_clients_claiming_one_order(self):
+        self.assertEqual(self.set_status(self.other_client, 'Shipped', version=1).status_code, 200)
+        response = self.set_status(self.client, 'Delivered', version=1)
+        self.assertEqual((response.status_code, response.json()['version']), (409, 2))
+        self.assertEqual(self.order_row(), ('Shipped', 2))
+        self.assertEqual(diff_sales_summary(compute_sales_from_orders()), [])
+
+    def test_order_write_after_the_read_is_not_overwritten(self):
+        def deliver():
+            Order.objects.filter(id=self.order.id).update(status='Delivered', version=F('version') + 1)
+
+        with mock.patch.object(Order, 'STATUS_TRANSITIONS', WriteOnLookup(deliver)):
+            response = self.set_status(self.client, 'Shipped')
+        self.assertEqual((response.status_code, response.json()['version']), (409, 2))
+        self.assertEqual(self.order_row(), ('Delivered', 2))
+
+    def test_disallowed_transition_is_409(self):
+        self.assertEqual(self.set_status(self.client, 'Delivered').status_code, 200)
+        self.assertEqual(self.set_status(self.client, 'Shipped').status_code, 409)
+        response = self.client.post(
+            '/api/auth/seller/orders/status/', {'order_ids': [self.order.id], 'status': 'Pending'}, format='json',
+        )
+        self.assertEqual(
+            response.json()['results'], [{'id': self.order.id, 'result': 'invalid_transition', 'status': 'Delivered'}],
+        )
+        self.assertEqual(self.order_row(), ('Delivered', 2))
+
+    def test_bulk_update_rechecks_the_status_when_writing(self):
+        state_changed = fulfillment.SalesChanges.state_changed
+
+        def deliver_first(changes, *args):
+            # A writer the row lock did not hold back
+            Order.objects.filter(id=self.order.id).update(status='Delivered')
+            state_changed(changes, *args)
+
+        with mock.patch.object(fulfillment.SalesChanges, 'state_changed', deliver_first):
+            response = self.client.post(
+                '/api/auth/seller/orders/status/', {'order_ids': [self.order.id], 'status': 'Shipped'}, format='json',
+            )
+        self.assertEqual(response.status_code, 409)
+        # The whole batch rolled back, including the interfering write
+        self.assertEqual(self.order_row(), ('Pending', 1))
+        self.assertEqual(diff_sales_summary(compute_sales_from_orders()), [])
+
+
+class ValuesSerializerTests(TestCase):
+    def setUp(self):
+        seller = CustomUser.objects.create(username='seller', email='seller@example.com', country='Myanmar')
+        self.buyer = CustomUser.objects.create(username='buyer', email='buyer@example.com')
+        brand = Brand.objects.create(title='Acme', brand_slug='acme')
+        coat = make_product(seller, price='50.10')
+        coat.brand, coat.original_price, coat.image = brand, Decimal('120.00'), 'products/coat one.jpg'
+        coat.save()
+        # No brand, no original price and no image: nested keys are skipped or null
+        hat = make_product(seller, title='Hat', price='7.00')
+        place_orders(self.buyer, [{'product': coat.id}, {'product': hat.id, 'quantity': 2}])
+
+    def assertRendersIdentically(self, serializer_class, queryset, params):
+        request = Request(APIRequestFactory().get('/api/auth/products/', params, HTTP_HOST='testserver'))
+        expected = serializer_class(queryset, many=True, context={'request': request}).data
+        fast = ValuesSerializer(serializer_class(context={'request': request}))
+        actual = fast.render(fast.values(queryset))
+        self.assertEqual(JSONRenderer().render(actual), JSONRenderer().render(expected))
+        return actual
+
+    def test_product_list_variants(self):
+        products = Product.objects.select_related('seller', 'category', 'brand').order_by('id')
+        rows = self.assertRendersIdentically(ProductListSerializer, products, {})
+        self.assertEqual(rows[0]['brand_name'], 'Acme')
+        self.assertNotIn('brand_name', rows[1])
+        rows = self.assertRendersIdentically(ProductListSerializer, products, {'expand': 'seller'})
+        self.assertEqual(rows[0]['seller']['country'], 'Myanmar')
+        rows = self.assertRendersIdentically(ProductListSerializer, products, {'fields': 'id,image_url,brand_name'})
+        self.assertEqual(set(rows[0]), {'id', 'image_url', 'brand_name'})
+        rows = self.assertRendersIdentically(
+            ProductListSerializer, products, {'fields': 'title,category_name,seller', 'expand': 'seller'},
+        )
+        self.assertEqual(set(rows[0]), {'title', 'category_name', 'seller'})
+
+    def test_unknown_field_names_are_ignored(self):
+        def keys(**params):
+            response = self.client.get('/api/auth/products/', params)
+            self.assertEqual(response.status_code, 200)
+            return [set(row) for row in response.json()['products']]
+
+        default = keys()
+        self.assertIn('title', default[0])
+        self.assertEqual(keys(fields='bogus'), default)
+        self.assertEqual(keys(fields=','), default)
+        self.assertEqual(keys(fields='id,bogus'), [{'id'}, {'id'}])
+
+    def test_order_history(self):
+        orders = (
+            Order.objects.filter(buyer=self.buyer)
+            .select_related('buyer', 'product__seller', 'product__category', 'product__brand').order_by('id')
+        )
+        rows = self.assertRendersIdentically(OrderSerializer, orders, {})
+        self.assertEqual(rows[0]['product']['brand_name'], 'Acme')
+        self.assertNotIn('brand_name', rows[1]['product'])
+        self.assertEqual(rows[0]['product']['image_url'], 'http://testserver/media/products/coat%20one.jpg')
+
+
+class ProductPaginationTests(TestCase):
+    def setUp(self):
+        catalog_cache().clear()
+        seller = CustomUser.objects.create(username='seller', email='seller@example.com')
+        products = [make_product(seller, title=f'Plain item {i:02d}', price=str(i % 3 + 1)) for i in range(20)]
+        products += [make_product(seller, title='Linen shirt', price='9') for _ in range(3)]
+        # Equal sort keys everywhere: cursors must fall back to the id tie-breaker
+        Product.objects.filter(id__in=[product.id for product in products[::2]]).update(
+            created_at=timezone.now() - timedelta(days=1),
+        )
+        self.ids = {product.id for product in products}
+
+    def get(self, **params):
+        response = self.client.get('/api/auth/products/', params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def walk(self, **params):
+        """Page forwards to the end, then backwards to the start; return the forward pages."""
+        data = self.get(pagination='cursor', limit=4, **params)
+        self.assertFalse(data['has_previous_page'])
+        pages = [[product['id'] for product in data['products']]]
+        while data['next_cursor']:
+            data = self.get(cursor=data['next_cursor'], limit=4, **params)
+            pages.append([product['id'] for product in data['products']])
+        self.assertFalse(data['has_next_page'])
+        backwards = [pages[-1]]
+        while data['previous_cursor']:
+            data = self.get(cursor=data['previous_cursor'], limit=4, **params)
+            self.assertTrue(data['has_next_page'])
+            backwards.insert(0, [product['id'] for product in data['products']])
+        self.assertEqual(backwards, pages)
+        walked = [product_id for page in pages for product_id in page]
+        # One page holding everything is the same scan without cursors
+        everything = self.get(pagination='cursor', limit=100, **params)['products']
+        self.assertEqual(walked, [product['id'] for product in everything])
+        return walked
+
+    def test_cursor_round_trips(self):
+        for sort_by in ('date-desc', 'date-acs', 'low_to_high', 'high_to_low', 'a_z'):
+            with self.subTest(sort_by=sort_by):
+                self.assertEqual(sorted(self.walk(sort_by=sort_by)), sorted(self.ids))
+
+    def test_cursor_round_trip_in_relevance_order(self):
+        walked = self.walk(keyword='item')
+        self.assertEqual(len(walked), 20)
+        # Matches with an identical text rank equal; the walk orders them by id
+        self.assertEqual(walked, sorted(walked))
+        shirts = self.walk(keyword='linen shirt')
+        self.assertEqual(len(shirts), 3)
+
+    def test_garbage_cursor_is_404(self):
+        self.assertEqual(self.client.get('/api/auth/products/', {'cursor': 'not-a-cursor'}).status_code, 404)
+
+
+@override_settings(PRODUCT_COUNT_CAP=10)
+class CappedCountTests(TestCase):
+    def setUp(self):
+        catalog_cache().clear()
+        seller = CustomUser.objects.create(username='seller', email='seller@example.com')
+        for i in range(20):
+            make_product(seller, title=f'Plain item {i:02d}')
+        for _ in range(3):
+            make_product(seller, title='Linen shirt')
+
+    def get(self, **params):
+        response = self.client.get('/api/auth/products/', params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_capped_total(self):
+        data = self.get(limit=5)
+        self.assertEqual(
+            (data['found_products'], data['total_is_exact'], data['found_products_display'], data['total_pages']),
+            (10, False, '10+', 2),
+        )
+        # Pages past the cap stay reachable and peek ahead for has_next
+        self.assertTrue(self.get(limit=5, page=4)['has_next_page'])
+        last = self.get(limit=5, page=5)
+        self.assertEqual((len(last['products']), last['has_next_page']), (3, False))
+        self.assertEqual(self.client.get('/api/auth/products/', {'limit': 5, 'page': 6}).status_code, 404)
+
+    def test_exact_total_is_cached_per_filter_set(self):
+        data = self.get(limit=5, keyword='linen')
+        self.assertEqual((data['found_products'], data['total_is_exact'], data['found_products_display']), (3, True, '3'))
+        # Only the page query runs: sorting does not change the filter set
+        with self.assertNumQueries(1):
+            self.assertEqual(self.get(limit=5, keyword='linen', sort_by='a_z')['found_products'], 3)
+
+    def test_estimated_page(self):
+        paginator = CappedCountPaginator(Product.objects.order_by('id'), 5, cap=10)
+        self.assertEqual((paginator.count, paginator.count_is_exact), (10, False))
+        page = paginator.page(5)
+        self.assertIsInstance(page, EstimatedPage)
+        self.assertEqual((len(page), page.has_next(), page.has_previous()), (3, False, True))
+        self.assertTrue(paginator.page(2).has_next())
+        with self.assertRaises(EmptyPage):
+            paginator.page(6)
+
+
+class CatalogCacheTests(TransactionTestCase):
+    def setUp(self):
+        catalog_cache().clear()
+        self.seller = CustomUser.objects.create(username='seller', email='seller@example.com')
+        self.buyer = CustomUser.objects.create(username='buyer', email='buyer@example.com')
+        self.brand = Brand.objects.create(title='Acme', brand_slug='acme')
+        self.product = make_product(self.seller)
+        self.product.brand = self.brand
+        self.product.save()
+
+    def listing(self):
+        response = self.client.get('/api/auth/products/', {'sort_by': 'a_z'})
+        self.assertEqual(response.status_code, 200)
+        return response['X-Cache'], response.json()['products']
+
+    def assertWriteRefreshes(self, write):
+        """HIT before ``write``, MISS after it; returns the fresh rows."""
+        self.listing()
+        self.assertEqual(self.listing()[0], 'HIT')
+        write()
+        state, rows = self.listing()
+        self.assertEqual(state, 'MISS')
+        return rows
+
+    def test_product_writes(self):
+        def rename():
+            self.product.title = 'Blue coat'
+            self.product.save()
+
+        self.assertEqual(self.assertWriteRefreshes(rename)[0]['title'], 'Blue coat')
+        rows = self.assertWriteRefreshes(lambda: make_product(self.seller, title='Anorak'))
+        self.assertEqual([row['title'] for row in rows], ['Anorak', 'Blue coat'])
+        rows = self.assertWriteRefreshes(lambda: Product.objects.get(title='Anorak').delete())
+        self.assertEqual([row['title'] for row in rows], ['Blue coat'])
+
+    def test_brand_and_category_writes(self):
+        def rename_brand():
+            self.brand.title = 'Zenith'
+            self.brand.save()
+
+        def rename_category():
+            category = Category.objects.get()
+            category.title = 'Outerwear'
+            category.save()
+
+        self.assertEqual(self.assertWriteRefreshes(rename_brand)[0]['brand_name'], 'Zenith')
+        self.assertEqual(self.assertWriteRefreshes(rename_category)[0]['category_name'], 'Outerwear')
+        # Products cascade with their brand
+        self.assertEqual(self.assertWriteRefreshes(self.brand.delete), [])
+
+    def test_stock_changes(self):
+        # Stock is not in the list rows, but these writes skip Product.save()
+        self.assertWriteRefreshes(lambda: place_orders(self.buyer, [{'product': self.product.id}]))
+        self.assertWriteRefreshes(lambda: inventory.reserve(self.buyer, self.product.id, 2))
+
+        def expire():
+            StockReservation.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+            self.assertEqual(inventory.release_expired(), 1)
+
+        self.assertWriteRefreshes(expire)
+        self.assertEqual(Product.objects.get(id=self.product.id).stock, 9)
+
+
+class ProductSearchTests(TestCase):
+    def setUp(self):
+        catalog_cache().clear()
+        self.seller = CustomUser.objects.create(username='seller', email='seller@example.com')
+        self.brand = Brand.objects.create(title='Acme', brand_slug='acme')
+
+    def search(self, keyword, **params):
+        response = self.client.get('/api/auth/products/', {'keyword': keyword, **params})
+        self.assertEqual(response.status_code, 200)
+        return [product['id'] for product in response.json()['products']]
+
+    def test_index_follows_product_writes(self):
+        product = make_product(self.seller, title='Velvet blazer')
+        self.assertEqual(self.search('velv'), [product.id])
+        product.title = 'Cotton blazer'
+        product.save()
+        self.assertEqual(self.search('velvet'), [])
+        self.assertEqual(self.search('cotton blazer'), [product.id])
+        product.delete()
+        self.assertEqual(self.search('blazer'), [])
+
+    def test_index_follows_brand_and_category_renames(self):
+        product = make_product(self.seller)
+        product.brand = self.brand
+        product.save()
+        self.assertEqual(self.search('acme coats'), [product.id])
+        self.brand.title = 'Zenith'
+        self.brand.save()
+        category = Category.objects.get()
+        category.title = 'Outerwear'
+        category.save()
+        self.assertEqual(self.search('acme'), [])
+        self.assertEqual(self.search('coats'), [])
+        self.assertEqual(self.search('zenith outerwear'), [product.id])
+
+    def test_relevance_ordering(self):
+        in_description = make_product(self.seller, title='Plain shirt')
+        in_description.description = 'Goes well with a denim jacket'
+        in_description.save()
+        in_title = make_product(self.seller, title='Denim jacket')
+        in_brand = make_product(self.seller, title='Work shirt')
+        in_brand.brand = Brand.objects.create(title='Denim Co', brand_slug='denim-co')
+        in_brand.save()
+
+        # Title outweighs brand, which outweighs description (RANK_WEIGHTS)
+        expected = [in_title.id, in_brand.id, in_description.id]
+        self.assertEqual(self.search('denim'), expected)
+        self.assertEqual(self.search('denim', sort_by='relevance'), expected)
+        # An explicit sort still wins over relevance
+        self.assertEqual(self.search('denim', sort_by='a_z'), [in_title.id, in_description.id, in_brand.id])
+
+
+class FastJSONRendererTests(TestCase):
+    def render_both(self, data):
+        return FastJSONRenderer().render(data), JSONRenderer().render(data)
+
+    def test_matches_the_stock_renderer(self):
+        data = {
+            'text': 'caf\u00e9 \u2028 "quoted"', 'count': 3, 'price': Decimal('12.50'), 'big': 2 ** 70,
+            'created_at': timezone.now(), 'day': timezone.localdate(), 'nested': [{'ok': True, 'none': None}], 1: 'key',
+            'ratio': 0.25,
+        }
+        fast, stock = self.render_both(data)
+        self.assertEqual(fast, stock)
+
+    @skipIf(orjson is None, "without orjson the stock encoder is used")
+    def test_float_differences(self):
+        fast, stock = self.render_both([1e16, 2.5e-7])
+        self.assertEqual((fast, stock), (b'[1e16,2.5e-7]', b'[1e+16,2.5e-07]'))
+        self.assertEqual(FastJSONRenderer().render([float('nan'), float('inf')]), b'[null,null]')
+        with self.assertRaises(ValueError):
+            JSONRenderer().render([float('nan')])
+
+
+@override_settings(PASSWORD_HASH_ITERATIONS=1000)
+class LoginBackendTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser(username='alice', email='alice@example.com', phone_number='+95 912-345')
+        self.user.set_password('correct-password')
+        self.user.save()
+
+    def test_one_query_per_login(self):
+        lookups = [
+            {'email': 'alice@example.com'}, {'phone_number': '+95912345'}, {'username': 'alice'},
+            {'username': '+95 912 345'}, {'username': 'alice@example.com'},
+        ]
+        for credentials in lookups:
+            with self.subTest(**credentials), self.assertNumQueries(1):
+                self.assertEqual(authenticate(None, password='correct-password', **credentials), self.user)
+        with self.assertNumQueries(1):
+            self.assertIsNone(authenticate(None, email='alice@example.com', password='wrong-password'))
+
+    def test_unknown_user_still_pays_for_one_hash(self):
+        for email in ('alice@example.com', 'nobody@example.com'):
+            with self.subTest(email=email), mock.patch('django.contrib.auth.hashers.pbkdf2', wraps=pbkdf2) as hashed:
+                self.assertIsNone(authenticate(None, email=email, password='wrong-password'))
+            self.assertEqual(hashed.call_count, 1)
+            self.assertEqual(hashed.call_args.args[2], 1000)
+
+    def test_new_cost_rehashes_on_next_login(self):
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$1000$'))
+        with override_settings(PASSWORD_HASH_ITERATIONS=2000):
+            self.assertIsNone(authenticate(None, email='alice@example.com', password='wrong-password'))
+            self.user.refresh_from_db()
+            self.assertTrue(self.user.password.startswith('pbkdf2_sha256$1000$'))
+            # The successful login verifies at the old cost, then saves the new hash
+            with self.assertNumQueries(2):
+                self.assertEqual(authenticate(None, email='alice@example.com', password='correct-password'), self.user)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$2000$'))
+        self.assertTrue(self.user.check_password('correct-password'))
+
+
+@override_settings(AUTH_THROTTLE_RATES={}, PASSWORD_HASH_ITERATIONS=1000)
+class OTPTests(TestCase):
+    def verify(self, code, email='new@example.com', username='newbie'):
+        return self.client.post('/api/auth/verify-otp/', {
+            'email': email, 'code': code, 'username': username,
+            'password': 'A-long-passphrase-9', 'confirm_password': 'A-long-passphrase-9',
+        }, content_type='application/json')
+
+    def test_new_code_replaces_earlier_ones(self):
+        with mock.patch('accounts.otp.secrets.randbelow', side_effect=[1, 2, 3]):
+            first = otp.issue_otp('new@example.com')
+            other = otp.issue_otp('other@example.com')
+            second = otp.issue_otp('new@example.com')
+        self.assertEqual(set(OTPCode.objects.values_list('id', flat=True)), {other.id, second.id})
+        self.assertIsNone(otp.find_otp('new@example.com', first.code))
+        self.assertEqual(self.verify(first.code).status_code, 400)
+        self.assertEqual(self.verify(second.code).status_code, 201)
+
+    def test_used_and_expired_codes_are_rejected(self):
+        code = otp.issue_otp('new@example.com').code
+        self.assertEqual(self.verify(code).status_code, 201)
+        self.assertIsNone(otp.find_otp('new@example.com', code))
+        self.assertEqual(self.verify(code, username='second').status_code, 400)
+
+        expired = otp.issue_otp('late@example.com')
+        OTPCode.objects.filter(id=expired.id).update(expires_at=timezone.now() - timedelta(seconds=1))
+        response = self.verify(expired.code, email='late@example.com', username='late')
+        self.assertEqual((response.status_code, response.json()), (400, {'error': 'OTP has expired'}))
+        self.assertFalse(OTPCode.objects.exists())
+        self.assertFalse(CustomUser.objects.filter(username='late').exists())
+
+    def test_purge_deletes_expired_codes_in_batches(self):
+        live = [otp.issue_otp(f'live{i}@example.com').id for i in range(2)]
+        for i in range(5):
+            otp.issue_otp(f'old{i}@example.com')
+        OTPCode.objects.exclude(id__in=live).update(expires_at=timezone.now() - timedelta(minutes=1))
+        self.assertEqual([otp.purge_expired_otps(batch_size=2) for _ in range(4)], [2, 2, 1, 0])
+        self.assertEqual(sorted(OTPCode.objects.values_list('id', flat=True)), sorted(live))
+
+        OTPCode.objects.filter(id=live[0]).update(expires_at=timezone.now() - timedelta(minutes=1))
+        out = StringIO()
+        call_command('purge_expired_otps', '--batch-size', '2', '--pause', '0', stdout=out)
+        self.assertIn("Deleted 1 expired OTP codes in 1 batches", out.getvalue())
+        self.assertEqual(list(OTPCode.objects.values_list('id', flat=True)), [live[1]])
+
+
+@override_settings(JWT_BLACKLIST_FILTER=True, JWT_BLACKLIST_SYNC_INTERVAL=3600)
+class TokenBlacklistTests(TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(tokens, 'blacklist_filter', tokens.BlacklistFilter())
+        self.filter = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = CustomUser.objects.create(username='alice', email='alice@example.com')
+
+    def refresh(self, token):
+        return self.client.post('/api/auth/token/refresh/', {'refresh': str(token)}, content_type='application/json')
+
+    def test_bloom_filter_has_no_false_negatives(self):
+        bloom = tokens.BloomFilter(500, 0.01)
+        members = [f'member-{i}' for i in range(500)]
+        for member in members:
+            bloom.add(member)
+        self.assertTrue(all(member in bloom for member in members))
+        false_positives = sum(f'other-{i}' in bloom for i in range(5000))
+        self.assertLess(false_positives / 5000, 0.03)
+
+    def test_rotated_token_is_refused_at_once(self):
+        token = RefreshToken.for_user(self.user)
+        response = self.refresh(token)
+        self.assertEqual(response.status_code, 200)
+        # Rotation blacklisted the old token in this process; no sync is needed to see it
+        self.assertEqual(self.refresh(token).status_code, 401)
+        self.assertEqual(self.refresh(response.json()['refresh']).status_code, 200)
+        self.assertEqual(self.filter.stats()['db_checks'], 1)
+
+    def test_tokens_blacklisted_elsewhere_are_picked_up_by_the_sync(self):
+        revoked = RefreshToken.for_user(self.user)
+        self.assertEqual(self.refresh(RefreshToken.for_user(self.user)).status_code, 200)
+        # Another process blacklists a token without touching this filter
+        BlacklistedToken.objects.create(token=OutstandingToken.objects.get(jti=revoked['jti']))
+        with override_settings(JWT_BLACKLIST_SYNC_INTERVAL=0):
+            self.assertEqual(self.refresh(revoked).status_code, 401)
+        self.assertIn(revoked['jti'], self.filter.bloom)
+
+    def test_prune_deletes_only_expired_tokens(self):
+        issued = [RefreshToken.for_user(self.user) for _ in range(5)]
+        expired, live = issued[:3], issued[3:]
+        for token in (expired[0], expired[1], live[0]):
+            token.blacklist()
+        OutstandingToken.objects.filter(jti__in=[token['jti'] for token in expired]).update(
+            expires_at=timezone.now() - timedelta(seconds=1),
+        )
+        batches, after_id = [], 0
+        while True:
+            outstanding, blacklisted, after_id = tokens.prune_expired_tokens(batch_size=2, after_id=after_id)
+            if not outstanding:
+                break
+            batches.append((outstanding, blacklisted))
+        self.assertEqual(batches, [(2, 2), (1, 0)])
+        self.assertEqual(
+            set(OutstandingToken.objects.values_list('jti', flat=True)), {token['jti'] for token in live},
+        )
+        self.assertEqual(list(BlacklistedToken.objects.values_list('token__jti', flat=True)), [live[0]['jti']])
+
+
+class CachedJWTAuthenticationTests(TestCase):
+    def setUp(self):
+        authentication._user_snapshots.clear()
+        self.addCleanup(authentication._user_snapshots.clear)
+        self.user = CustomUser.objects.create(username='alice', email='alice@example.com', phone_number='0912345')
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+
+    def user_queries(self, queries):
+        return [query['sql'] for query in queries if 'FROM "accounts_customuser"' in query['sql']]
+
+    def test_snapshot_is_reused_between_requests(self):
+        self.assertEqual(self.client.get('/api/auth/my-products/').status_code, 200)
+        self.assertIn(self.user.id, authentication._user_snapshots)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get('/api/auth/my-products/').status_code, 200)
+        self.assertEqual(self.user_queries(queries), [])
+
+    def test_saving_the_user_drops_the_snapshot(self):
+        self.client.get('/api/auth/my-products/')
+        # Login only touches last_login, which the snapshot does not hold
+        self.user.save(update_fields=['last_login'])
+        self.assertIn(self.user.id, authentication._user_snapshots)
+        self.user.is_staff = True
+        self.user.save()
+        self.assertNotIn(self.user.id, authentication._user_snapshots)
+        self.client.get('/api/auth/my-products/')
+        self.assertTrue(authentication.get_user_snapshot(self.user.id)[SNAPSHOT_FIELDS.index('is_staff')])
+
+    def test_deactivated_user_is_refused_at_once(self):
+        self.assertEqual(self.client.get('/api/auth/my-products/').status_code, 200)
+        self.user.is_active = False
+        self.user.save(update_fields=['is_active'])
+        response = self.client.get('/api/auth/my-products/')
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json()['detail'], 'User is inactive')
+
+    def test_deleted_user_is_refused(self):
+        self.assertEqual(self.client.get('/api/auth/my-products/').status_code, 200)
+        self.user.delete()
+        self.assertNotIn(self.user.id, authentication._user_snapshots)
+        self.assertEqual(self.client.get('/api/auth/my-products/').status_code, 401)
+
+    def test_password_change_drops_the_snapshot(self):
+        self.client.get('/api/auth/my-products/')
+        self.user.set_password('a new password')
+        self.user.save(update_fields=['password'])
+        self.assertNotIn(self.user.id, authentication._user_snapshots)
+
+    def test_deferred_fields_load_lazily_in_one_query(self):
+        values = authentication.get_user_snapshot(self.user.id)
+        user = SnapshotUser.from_db('default', SNAPSHOT_FIELDS, values)
+        self.assertIn('email', user.get_deferred_fields())
+        self.assertNotIn('is_active', user.get_deferred_fields())
+        with self.assertNumQueries(1):
+            self.assertEqual(user.email, 'alice@example.com')
+            self.assertEqual(user.phone_number, '0912345')
+        self.assertEqual(user.get_deferred_fields(), set())
+
+    def test_profile_view_reads_deferred_fields(self):
+        self.client.get('/api/auth/user/')
+        response = self.client.get('/api/auth/user/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['email'], 'alice@example.com')
@@ -0,0 +1,106 @@
+"""
+Token-bucket throttling for the anonymous auth endpoints.
+
+Each view names a ``throttle_scope``; ``AUTH_THROTTLE_RATES[scope]`` gives
+an ``"<requests>/<period>"`` limit per client IP (``ip``) and per email or
+phone number (``identifier``). A bucket holds that many requests and refills
+continuously at that rate, so short bursts are allowed but sustained floods
+are not.
+
+Buckets live in the ``AUTH_THROTTLE_CACHE_ALIAS`` cache so every worker
+shares them. The bucket is kept as its "theoretical arrival time" (GCRA) in
+integer milliseconds and advanced with ``cache.incr``, which is atomic on
+Redis, Memcached and the local-memory cache, so concurrent requests cannot
+both take the last token. Throttle checks only read the request and the
+cache: a rejected request never reaches the database or a password hasher.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.throttling import BaseThrottle
+
+PERIODS = {'s': 1, 'sec': 1, 'm': 60, 'min': 60, 'h': 3600, 'hour': 3600, 'd': 86400, 'day': 86400}
+
+
+def parse_rate(rate):
+    """``"10/min"`` -> ``(10, 60)``: bucket capacity and seconds to refill it."""
+    count, period = rate.split('/')
+    return int(count), PERIODS[period]
+
+
+def throttle_cache():
+    return caches[settings.AUTH_THROTTLE_CACHE_ALIAS]
+
+
+def take_token(key, capacity, period, now_ms=None):
+    """Take one token from the bucket. Returns 0 if allowed, else seconds until one is free."""
+    cache = throttle_cache()
+    now = now_ms if now_ms is not None else int(time.time() * 1000)
+    interval = max(1, period * 1000 // capacity)
+    burst = capacity * interval
+    try:
+        tat = cache.incr(key, interval)
+    except ValueError:
+        tat = None
+    if tat is None or tat < now + interval:
+        # New or idle bucket: start full. Racing resets only ever lose a token.
+        tat = now + interval
+        cache.set(key, tat, period + 1)
+    elif tat - now > burst:
+        # Refund: a rejected request does not use up capacity
+        cache.decr(key, interval)
+        return (tat - now - burst) / 1000
+    else:
+        cache.touch(key, period + 1)
+    return 0
+
+
+class TokenBucketThrottle(BaseThrottle):
+    kind = None
+
+    def get_rate(self, view):
+        rates = settings.AUTH_THROTTLE_RATES.get(getattr(view, 'throttle_scope', None)) or {}
+        return rates.get(self.kind)
+
+    def get_bucket_ident(self, request, view):
+        raise NotImplementedError
+
+    def allow_request(self, request, view):
+        self.retry_after = None
+        rate = self.get_rate(view)
+        if not rate:
+            return True
+        ident = self.get_bucket_ident(request, view)
+        if ident is None:
+            return True
+        capacity, period = parse_rate(rate)
+        key = f"throttle:{view.throttle_scope}:{self.kind}:{ident}"
+        self.retry_after = take_token(key, capacity, period) or None
+        return self.retry_after is None
+
+    def wait(self):
+        return self.retry_after
+
+
+class IPTokenBucketThrottle(TokenBucketThrottle):
+    """Limits each client address; honours X-Forwarded-For per DRF's NUM_PROXIES."""
+    kind = 'ip'
+
+    def get_bucket_ident(self, request, view):
+        return self.get_ident(request)
+
+
+class IdentifierTokenBucketThrottle(TokenBucketThrottle):
+    """Limits each email address or phone number, whichever addresses it comes from."""
+    kind = 'identifier'
+
+    def get_bucket_ident(self, request, view):
+        data = request.data if hasattr(request.data, 'get') else {}
+        identifier = data.get('email') or data.get('phone_number')
+        if not identifier or not isinstance(identifier, str):
+            return None
+        identifier = identifier.strip().lower().replace(" ", "").replace("-", "")
+        # Keep raw emails and phone numbers out of cache keys
+        return hashlib.sha256(identifier.encode()).hexdigest()[:32]
@@ -0,0 +1,195 @@
+"""
+Refresh-token blacklist checks without a query per refresh.
+
+simplejwt looks every refresh token up in ``BlacklistedToken`` before
+accepting it. ``FilteredRefreshToken`` first asks a per-process Bloom filter
+over the JTIs of unexpired blacklisted tokens: a negative answer is exact for
+everything the filter has seen, so only possible members (real ones plus
+roughly ``JWT_BLACKLIST_FILTER_FP_RATE`` of the rest) reach the database.
+
+* Tokens blacklisted by this process are added to the filter immediately.
+* Tokens blacklisted by other processes are picked up by an incremental sync
+  at most every ``JWT_BLACKLIST_SYNC_INTERVAL`` seconds (one indexed range
+  query on the blacklist's primary key). Until then such a token can still
+  be refreshed; set ``JWT_BLACKLIST_FILTER = False`` to check every refresh
+  against the database instead.
+* The filter is rebuilt from scratch every ``JWT_BLACKLIST_REBUILD_INTERVAL``
+  seconds, dropping expired tokens and resizing for the current blacklist.
+
+``manage.py prune_tokens`` keeps the tables themselves bounded.
+"""
+import hashlib
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import RefreshToken
+
+
+class BloomFilter:
+    def __init__(self, capacity, fp_rate):
+        capacity = max(1, capacity)
+        self.size = max(64, math.ceil(-capacity * math.log(fp_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.capacity = capacity
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        # Double hashing: k positions from two 64-bit halves
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+    def estimated_fp_rate(self):
+        return (1 - math.exp(-self.hashes * self.count / self.size)) ** self.hashes
+
+
+class BlacklistFilter:
+    """A periodically refreshed Bloom filter over blacklisted, unexpired refresh-token JTIs."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.bloom = None
+        self.built_at = self.synced_at = 0.0
+        self.high_water = self.previous_high_water = 0
+        self.checks = self.db_checks = self.false_positives = 0
+
+    def rebuild(self):
+        high_water = BlacklistedToken.objects.aggregate(top=Max('id'))['top'] or 0
+        jtis = list(
+            BlacklistedToken.objects.filter(token__expires_at__gt=timezone.now()).values_list('token__jti', flat=True)
+        )
+        # Headroom for tokens blacklisted before the next rebuild
+        bloom = BloomFilter(max(1024, 2 * len(jtis)), settings.JWT_BLACKLIST_FILTER_FP_RATE)
+        for jti in jtis:
+            bloom.add(jti)
+        self.bloom = bloom
+        self.high_water = self.previous_high_water = high_water
+        self.built_at = self.synced_at = time.monotonic()
+
+    def sync(self):
+        # Re-read from the previous sync's mark: a blacklist row can commit after a higher id
+        rows = list(
+            BlacklistedToken.objects.filter(id__gt=self.previous_high_water).values_list('id', 'token__jti')
+        )
+        for _, jti in rows:
+            self.bloom.add(jti)
+        self.previous_high_water = self.high_water
+        self.high_water = max([self.high_water] + [row_id for row_id, _ in rows])
+        self.synced_at = time.monotonic()
+
+    def refresh(self, force=False):
+        now = time.monotonic()
+        if not force and self.bloom is not None and now - self.synced_at < settings.JWT_BLACKLIST_SYNC_INTERVAL:
+            return
+        with self.lock:
+            if (force or self.bloom is None or self.bloom.count > self.bloom.capacity
+                    or now - self.built_at >= settings.JWT_BLACKLIST_REBUILD_INTERVAL):
+                self.rebuild()
+            elif now - self.synced_at >= settings.JWT_BLACKLIST_SYNC_INTERVAL:
+                self.sync()
+
+    def might_contain(self, jti):
+        self.refresh()
+        self.checks += 1
+        return jti in self.bloom
+
+    def add(self, jti):
+        self.refresh()
+        self.bloom.add(jti)
+
+    def record_db_check(self, blacklisted):
+        self.db_checks += 1
+        if not blacklisted:
+            self.false_positives += 1
+
+    def stats(self):
+        bloom = self.bloom
+        negatives = self.checks - self.db_checks
+        return {
+            "items": bloom.count if bloom else 0,
+            "bits": bloom.size if bloom else 0,
+            "hashes": bloom.hashes if bloom else 0,
+            "estimated_fp_rate": round(bloom.estimated_fp_rate(), 6) if bloom else None,
+            "checks": self.checks,
+            "db_checks": self.db_checks,
+            "false_positives": self.false_positives,
+            # Share of tokens that are not blacklisted but still cost a query
+            "observed_fp_rate": (
+                round(self.false_positives / (self.false_positives + negatives), 6)
+                if self.false_positives + negatives else None
+            ),
+        }
+
+
+blacklist_filter = BlacklistFilter()
+
+
+class FilteredRefreshToken(RefreshToken):
+    def check_blacklist(self):
+        if not settings.JWT_BLACKLIST_FILTER:
+            return super().check_blacklist()
+        if not blacklist_filter.might_contain(self.payload[api_settings.JTI_CLAIM]):
+            return
+        try:
+            super().check_blacklist()
+        except TokenError:
+            blacklist_filter.record_db_check(blacklisted=True)
+            raise
+        blacklist_filter.record_db_check(blacklisted=False)
+
+    def blacklist(self):
+        result = super().blacklist()
+        if settings.JWT_BLACKLIST_FILTER:
+            blacklist_filter.add(self.payload[api_settings.JTI_CLAIM])
+        return result
+
+
+def prune_expired_tokens(batch_size=1000, now=None, after_id=0):
+    """
+    Delete up to ``batch_size`` expired outstanding tokens with ids above
+    ``after_id``, and their blacklist rows, in one short transaction.
+    Returns ``(outstanding, blacklisted, last_id)``; pass ``last_id`` back in
+    to continue.
+    """
+    now = now or timezone.now()
+    # expires_at is not indexed; walking the primary key from the last batch
+    # keeps each scan short (tokens share one lifetime, so expired rows are
+    # mostly the lowest ids anyway)
+    ids = list(
+        OutstandingToken.objects.filter(id__gt=after_id, expires_at__lte=now)
+        .order_by('id').values_list('id', flat=True)[:batch_size]
+    )
+    if not ids:
+        return 0, 0, after_id
+    with transaction.atomic():
+        blacklisted, _ = BlacklistedToken.objects.filter(token_id__in=ids).delete()
+        outstanding, _ = OutstandingToken.objects.filter(id__in=ids).delete()
+    return outstanding, blacklisted, ids[-1]
+
+
+def token_table_stats():
+    now = timezone.now()
+    return {
+        "outstanding": OutstandingToken.objects.count(),
+        "outstanding_expired": OutstandingToken.objects.filter(expires_at__lte=now).count(),
+        "blacklisted": BlacklistedToken.objects.count(),
+        "blacklist_filter": blacklist_filter.stats() if settings.JWT_BLACKLIST_FILTER else None,
+    }
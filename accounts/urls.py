@@ -16,6 +16,7 @@ auth_patterns = [
     path('login/', views.LoginView.as_view(), name='login'),
     path('logout/', views.LogoutView.as_view(), name='logout'),
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('token/stats/', views.TokenStatsView.as_view(), name='token_stats'),
     path('forgot-password/', views.ForgotPasswordView.as_view(), name='forgot_password'),
     path('reset-password/<str:token>/', views.ResetPasswordView.as_view(), name='reset_password'),
 ]
@@ -34,8 +35,16 @@ product_order_patterns = [
     path('my-products/', views.MyProductsView.as_view(), name='my_products'),
     path('orders/', views.MyOrderHistoryView.as_view(), name='order_history'),
     path('seller/orders/', views.SellerOrderView.as_view(), name='seller_orders'),
+    path('seller/orders/status/', views.BulkUpdateOrderStatusView.as_view(), name='bulk_update_order_status'),
+    path('seller/orders/export/', views.SellerOrderExportView.as_view(), name='seller_order_export'),
+    path('seller/summary/', views.SellerSalesSummaryView.as_view(), name='seller_sales_summary'),
     path('place-order/', views.PlaceOrderView.as_view(), name='place_order'),
+    path('cart/', views.CartView.as_view(), name='cart'),
+    path('cart/items/', views.CartItemView.as_view(), name='cart_items'),
+    path('cart/items/<int:product_id>/', views.CartItemDetailView.as_view(), name='cart_item_detail'),
+    path('cart/checkout/', views.CartCheckoutView.as_view(), name='cart_checkout'),
     path('order/<int:order_id>/pay/', views.OrderPaymentView.as_view(), name='order_payment'),
+    path('payments/<int:payment_id>/', views.PaymentStatusView.as_view(), name='payment_status'),
     path('order/<int:order_id>/status/', views.UpdateOrderStatusView.as_view(), name='update_order_status'),
     path('product/<int:id>/', views.ProductDetailView.as_view(), name='product_detail'),
 ]
@@ -1,33 +1,61 @@
 import secrets
 import logging
-import random
-from django.core.mail import send_mail
 from django.conf import settings
 from django.utils.crypto import get_random_string
-from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from datetime import timedelta
+from django.db import transaction
+from django.urls import reverse
+from django.http import StreamingHttpResponse
+from django.db.models import F
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status, generics, viewsets
+from rest_framework.decorators import action
 from rest_framework.generics import ListAPIView, RetrieveAPIView
-from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly, AllowAny
+from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly, AllowAny, IsAdminUser
 from rest_framework_simplejwt.tokens import RefreshToken
-from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework_simplejwt.token_blacklist.models import OutstandingToken, BlacklistedToken
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 from django.contrib.auth import authenticate
 from .serializers import (
-    RegisterSerializer, CustomUserSerializer, ProductSerializer, CategorySerializer,
-    BrandSerializer, OrderSerializer, OTPSerializer, OTPVerifySerializer, AccountSetupSerializer
+    RegisterSerializer, CustomUserSerializer, ProductSerializer, ProductListSerializer, CategorySerializer,
+    BrandSerializer, OrderSerializer, OTPSerializer, OTPVerifySerializer, AccountSetupSerializer,
+    SellerSalesSummarySerializer, SellerDailySalesSerializer, PaymentAttemptSerializer
 )
-from .models import CustomUser, Product, Category, Brand, Order, OTPCode, PasswordResetToken
+from .models import CustomUser, Product, Category, Brand, Order, PasswordResetToken, PaymentAttempt
 from .pagination import *
+from .filters import normalize_product_filters, filter_products, order_products, normalize_order_filters, filter_orders
+from .facets import get_product_facets
+from .caching import list_response_key, get_list_response, set_list_response, list_cache_stats
+from .fast_serializers import ValuesSerializer
+from .renderers import StreamingJSONResponse
+from .exports import EXPORT_FORMATS, export_rows, iter_csv, iter_ndjson
+from .checkout import CheckoutError, PriceChanged, place_orders
+from .cart import add_item, checkout_cart, get_cart_lines, remove_item, render_cart
+from .fulfillment import OrderStatusError, bulk_update_status, update_order_status, UPDATED
+from .concurrency import VersionConflict, etag, expected_version
+from .throttling import IPTokenBucketThrottle, IdentifierTokenBucketThrottle
+from .otp import find_otp, issue_otp
+from .tokens import FilteredRefreshToken, token_table_stats
+from .authentication import CachedJWTAuthentication
+from .outbox import enqueue_email, enqueue_sms
+from .sales import get_seller_summary
+from .payments import PaymentError, request_payment
 
 
 logger = logging.getLogger(__name__)
 
+# Anonymous auth endpoints skip authentication so throttled requests never touch the database
+AUTH_THROTTLES = [IPTokenBucketThrottle, IdentifierTokenBucketThrottle]
+
 class SendOTPView(APIView):
     permission_classes = [AllowAny]
+    authentication_classes = []
+    throttle_classes = AUTH_THROTTLES
+    throttle_scope = 'send_otp'
 
     @swagger_auto_schema(
         operation_description="Send a one-time password (OTP) to the user's email or phone number for registration.",
@@ -40,6 +68,7 @@ class SendOTPView(APIView):
                 }
             )),
             400: "Invalid email or phone number",
+            429: "Too many requests",
             500: "Failed to send OTP"
         }
     )
@@ -50,35 +79,28 @@ class SendOTPView(APIView):
             phone_number = serializer.validated_data.get('phone_number')
             identifier = email or phone_number
 
-            otp_code = str(random.randint(100000, 999999))
-            otp = OTPCode(
-                user=None,  # No user yet
-                code=otp_code,
-                identifier=identifier
-            )
-            otp.save()
-
+            message = "Your OTP code is {code}. It is valid for 10 minutes."
             try:
-                if email:
-                    send_mail(
-                        "Your OTP Code",
-                        f"Your OTP code is {otp_code}. It is valid for 10 minutes.",
-                        settings.DEFAULT_FROM_EMAIL,
-                        [email],
-                        fail_silently=False,
-                    )
-                    logger.info(f"OTP sent to email: {email}")
-                else:
-                    logger.info(f"OTP {otp_code} would be sent to phone: {phone_number}")
-                return Response({"message": "OTP sent successfully"}, status=status.HTTP_200_OK)
+                # The worker sends it; the code and its message are committed together
+                with transaction.atomic():
+                    # Replaces any code sent earlier to this identifier
+                    otp = issue_otp(identifier)
+                    if email:
+                        enqueue_email(email, "Your OTP Code", message.format(code=otp.code))
+                    else:
+                        enqueue_sms(phone_number, message.format(code=otp.code))
             except Exception as e:
-                otp.delete()
-                logger.error(f"Failed to send OTP for {identifier}: {str(e)}")
+                logger.error(f"Failed to queue OTP for {identifier}: {str(e)}")
                 return Response({"error": f"Failed to send OTP: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            logger.info(f"OTP queued for {identifier}")
+            return Response({"message": "OTP sent successfully"}, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 class VerifyOTPView(APIView):
     permission_classes = [AllowAny]
+    authentication_classes = []
+    throttle_classes = AUTH_THROTTLES
+    throttle_scope = 'verify_otp'
 
     @swagger_auto_schema(
         operation_description="Verify the OTP and register a new user.",
@@ -93,7 +115,8 @@ class VerifyOTPView(APIView):
                 }
             )),
             400: "Invalid OTP or user data",
-            404: "OTP not found or expired"
+            404: "OTP not found or expired",
+            429: "Too many requests"
         }
     )
     def post(self, request):
@@ -106,15 +129,14 @@ class VerifyOTPView(APIView):
             password = serializer.validated_data['password']
             username = serializer.validated_data['username']
 
-            try:
-                otp = OTPCode.objects.get(identifier=identifier, code=code)
-                if not otp.is_valid():
-                    otp.delete()
-                    logger.warning(f"Expired OTP for {identifier}")
-                    return Response({"error": "OTP has expired"}, status=status.HTTP_400_BAD_REQUEST)
-            except OTPCode.DoesNotExist:
+            otp = find_otp(identifier, code)
+            if otp is None:
                 logger.warning(f"Invalid OTP code for {identifier}")
                 return Response({"error": "Invalid OTP code"}, status=status.HTTP_400_BAD_REQUEST)
+            if not otp.is_valid():
+                otp.delete()
+                logger.warning(f"Expired OTP for {identifier}")
+                return Response({"error": "OTP has expired"}, status=status.HTTP_400_BAD_REQUEST)
 
             # Create user
             user_data = {
@@ -141,6 +163,9 @@ class VerifyOTPView(APIView):
 
 class RegisterView(APIView):
     permission_classes = [AllowAny]
+    authentication_classes = []
+    throttle_classes = AUTH_THROTTLES
+    throttle_scope = 'register'
 
     @swagger_auto_schema(
         operation_description="Register a new user (alternative to OTP flow)",
@@ -170,6 +195,9 @@ class RegisterView(APIView):
 
 class LoginView(APIView):
     permission_classes = [AllowAny]
+    authentication_classes = []
+    throttle_classes = AUTH_THROTTLES
+    throttle_scope = 'login'
 
     @swagger_auto_schema(
         operation_description="Login using either email or phone number along with password",
@@ -190,7 +218,8 @@ class LoginView(APIView):
             200: openapi.Response("Login successful"),
             400: openapi.Response("Missing credentials"),
             401: openapi.Response("Invalid credentials"),
-            404: openapi.Response("User not found")
+            404: openapi.Response("User not found"),
+            429: openapi.Response("Too many login attempts")
         }
     )
     def post(self, request):
@@ -211,22 +240,9 @@ class LoginView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        # Look up user by email or phone_number
-        try:
-            if email:
-                user = CustomUser.objects.get(email=email)
-            else:
-                user = CustomUser.objects.get(phone_number=phone_number)
-        except CustomUser.DoesNotExist:
-            logger.warning(f"User not found for email: {email}, phone_number: {phone_number}")
-            return Response(
-                {"error": "Invalid email/phone number or password"},
-                status=status.HTTP_401_UNAUTHORIZED
-            )
-
-        # Authenticate using the user's username
-        authenticated_user = authenticate(request, username=user.username, password=password)
-        if authenticated_user and authenticated_user.is_active:
+        # One user lookup and one password check (see CustomAuthenticationBackend)
+        authenticated_user = authenticate(request, email=email, phone_number=phone_number, password=password)
+        if authenticated_user:
             refresh = RefreshToken.for_user(authenticated_user)
             logger.info(f"User {authenticated_user.id} logged in successfully")
             return Response({
@@ -241,7 +257,7 @@ class LoginView(APIView):
                 }
             }, status=status.HTTP_200_OK)
         else:
-            logger.warning(f"Invalid password for user: {user.username}")
+            logger.warning(f"Failed login for email: {email}, phone_number: {phone_number}")
             return Response(
                 {"error": "Invalid email/phone number or password"},
                 status=status.HTTP_401_UNAUTHORIZED
@@ -249,7 +265,7 @@ class LoginView(APIView):
 
 class LogoutView(APIView):
     permission_classes = [IsAuthenticated]
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
 
     @swagger_auto_schema(
         operation_description="Logout user by blacklisting the refresh token",
@@ -276,7 +292,7 @@ class LogoutView(APIView):
                 logger.warning(f"Logout attempt by user ID {request.user.id if request.user else 'unknown'} with no refresh token")
                 return Response({"error": "Refresh token required"}, status=status.HTTP_400_BAD_REQUEST)
             
-            token = RefreshToken(refresh_token)
+            token = FilteredRefreshToken(refresh_token)
             token.blacklist()
             logger.info(f"User {request.user.id} logged out successfully")
             return Response({"message": "Logged out successfully"}, status=status.HTTP_200_OK)
@@ -284,6 +300,17 @@ class LogoutView(APIView):
             logger.error(f"Logout failed for user ID {request.user.id if request.user else 'unknown'}: {str(e)}")
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
+class TokenStatsView(APIView):
+    permission_classes = [IsAdminUser]
+    authentication_classes = [CachedJWTAuthentication]
+
+    @swagger_auto_schema(
+        operation_description="Token table sizes and this worker's blacklist filter counters (staff only)",
+        responses={200: "Token statistics", 403: "Staff only"}
+    )
+    def get(self, request):
+        return Response(token_table_stats(), status=status.HTTP_200_OK)
+
 class AccountSetupView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -362,12 +389,52 @@ class UserView(APIView):
         logger.info(f"Shipping address updated for user ID {user.id}")
         return Response({"message": "Shipping address updated successfully."}, status=status.HTTP_200_OK)
 
-class MyOrderHistoryView(ListAPIView):
+class FastListMixin:
+    """
+    Renders list responses through ValuesSerializer, which reads ``.values()``
+    rows instead of model instances but produces the serializer's exact output.
+
+    ``?stream=true`` skips pagination and streams the whole list as a JSON array.
+    """
+
+    def stream_requested(self):
+        return self.request.query_params.get('stream', '').lower() in ('1', 'true')
+
+    def stream_response(self, fast, queryset):
+        rows = queryset.iterator(chunk_size=settings.LIST_STREAM_BATCH_SIZE)
+        return StreamingJSONResponse(fast.iter_render(rows))
+
+    def list(self, request, *args, **kwargs):
+        fast = ValuesSerializer(self.get_serializer())
+        queryset = fast.values(self.filter_queryset(self.get_queryset()))
+        if self.stream_requested():
+            return self.stream_response(fast, queryset)
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(fast.render(page))
+        return Response(fast.render(queryset))
+
+ORDER_LIST_PARAMETERS = [
+    openapi.Parameter("status", openapi.IN_QUERY, description="Order status, or a comma-separated list (Pending, Shipped, Delivered)", type=openapi.TYPE_STRING),
+    openapi.Parameter("payment_status", openapi.IN_QUERY, description="Payment status, or a comma-separated list (Pending, Paid, Failed)", type=openapi.TYPE_STRING),
+    openapi.Parameter("created_from", openapi.IN_QUERY, description="Orders placed on or after this date (YYYY-MM-DD) or ISO datetime", type=openapi.TYPE_STRING),
+    openapi.Parameter("created_to", openapi.IN_QUERY, description="Orders placed on or before this date (YYYY-MM-DD) or ISO datetime", type=openapi.TYPE_STRING),
+    openapi.Parameter("limit", openapi.IN_QUERY, description="Results per page (max 100)", type=openapi.TYPE_INTEGER),
+    openapi.Parameter("cursor", openapi.IN_QUERY, description="Opaque cursor from next_cursor/previous_cursor", type=openapi.TYPE_STRING),
+]
+
+class MyOrderHistoryView(FastListMixin, ListAPIView):
     serializer_class = OrderSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = OrderCursorPagination
+
+    @swagger_auto_schema(operation_description="Orders placed by the current user, newest first", manual_parameters=ORDER_LIST_PARAMETERS)
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
 
     def get_queryset(self):
-        return Order.objects.filter(buyer=self.request.user).order_by('-created_at')
+        filters = normalize_order_filters(self.request.query_params)
+        return filter_orders(Order.objects.filter(buyer=self.request.user), filters).order_by('-created_at')
 
 class PublicUserProfileView(RetrieveAPIView):
     permission_classes = [AllowAny]
@@ -388,80 +455,58 @@ class PublicUserProfileView(RetrieveAPIView):
             return Response({"error": "Internal server error"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 class PublicUserProductsView(ListAPIView):
-    serializer_class = ProductSerializer
+    serializer_class = ProductListSerializer
     permission_classes = [AllowAny]
 
     def get_queryset(self):
         username = self.kwargs.get("username")
-        return Product.objects.filter(seller__username=username)
+        return Product.objects.filter(seller__username=username).order_by('-created_at')
 
     def list(self, request, *args, **kwargs):
         username = self.kwargs.get("username")
-        queryset = self.get_queryset()
+        fast = ValuesSerializer(self.get_serializer())
+        data = fast.render(fast.values(self.get_queryset()))
 
-        if not queryset.exists():
+        if not data:
             logger.info(f"No products found for user: {username}")
             return Response({"message": "No products found."}, status=status.HTTP_200_OK)
 
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        return Response(data, status=status.HTTP_200_OK)
 
-class UserListView(generics.ListAPIView):
+class UserListView(FastListMixin, generics.ListAPIView):
     queryset = CustomUser.objects.all()
     serializer_class = CustomUserSerializer
     permission_classes = [AllowAny]
 
-class ProductViewSet(viewsets.ModelViewSet):
+class ProductViewSet(FastListMixin, viewsets.ModelViewSet):
     serializer_class = ProductSerializer
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticatedOrReadOnly]
     pagination_class = ProductPagination
 
-    def get_queryset(self):
-        queryset = Product.objects.all()
-        request = self.request
-
-        keyword = request.query_params.get('keyword')
-        price_range = request.query_params.get('price_range')
-        sort_by = request.query_params.get('sort_by', 'date-desc')
-        category = request.query_params.get('category')
-        brand = request.query_params.get('brand')
-
-        if keyword:
-            queryset = queryset.filter(
-                Q(title__icontains=keyword) |
-                Q(brand__title__icontains=keyword) |
-                Q(category__title__icontains=keyword)
-            )
+    @property
+    def paginator(self):
+        # ?pagination=cursor (or any ?cursor=) switches to keyset pagination
+        if not hasattr(self, '_paginator'):
+            request = getattr(self, 'request', None)
+            params = request.query_params if request is not None else {}
+            if params.get('pagination') == 'cursor' or 'cursor' in params:
+                self._paginator = ProductCursorPagination()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
 
-        if price_range:
-            try:
-                min_price, max_price = map(float, price_range.split("_"))
-                queryset = queryset.filter(
-                    second_hand_price__gte=min_price,
-                    second_hand_price__lte=max_price
-                )
-            except ValueError:
-                logger.warning(f"Invalid price range format: {price_range}")
-                pass
-
-        if category and category.isdigit():
-            queryset = queryset.filter(category__id=category)
-
-        if brand and brand.isdigit():
-            queryset = queryset.filter(brand__id=brand)
-
-        sort_map = {
-            "a_z": "title",
-            "z_a": "-title",
-            "low_to_high": "second_hand_price",
-            "high_to_low": "-second_hand_price",
-            "date-acs": "created_at",
-            "date-desc": "-created_at",
-        }
-        queryset = queryset.order_by(sort_map.get(sort_by, "-created_at"))
+    def get_queryset(self):
+        params = self.request.query_params
+        filters = normalize_product_filters(params)
+        queryset, ranked = filter_products(Product.objects.select_related('seller', 'category', 'brand'), filters)
+        return order_products(queryset, params.get('sort_by'), ranked)
 
-        return queryset
+    def get_serializer_class(self):
+        # Compact rows for the catalog grid; the full nested form everywhere else
+        if self.action == 'list':
+            return ProductListSerializer
+        return ProductSerializer
 
     def get_serializer_context(self):
         return {"request": self.request}
@@ -477,12 +522,33 @@ class ProductViewSet(viewsets.ModelViewSet):
                 {"error": "You are not allowed to edit this product."},
                 status=status.HTTP_403_FORBIDDEN
             )
+        try:
+            expected = expected_version(request)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        if expected is not None and expected != instance.version:
+            return Response(
+                {"error": "Product was modified by another request.", "version": instance.version},
+                status=status.HTTP_409_CONFLICT
+            )
         serializer = self.get_serializer(instance, data=request.data, partial=True)
-        if serializer.is_valid():
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            # Claim the version we read; a concurrent writer that got there first makes this match nothing
+            claimed = Product.objects.filter(pk=instance.pk, version=instance.version).update(version=F('version') + 1)
+            if not claimed:
+                current = Product.objects.filter(pk=instance.pk).values_list('version', flat=True).first()
+                logger.info(f"Product {instance.id} update by user {request.user.id} conflicted at version {instance.version}")
+                return Response(
+                    {"error": "Product was modified by another request.", "version": current},
+                    status=status.HTTP_409_CONFLICT
+                )
+            # save() increments version to the value claimed above
             serializer.save()
-            logger.info(f"Product {instance.id} updated by user {request.user.id}")
-            return Response(serializer.data)
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        logger.info(f"Product {instance.id} updated by user {request.user.id}")
+        return Response(serializer.data, headers={"ETag": etag(instance.version)})
 
     def destroy(self, request, *args, **kwargs):
         instance = self.get_object()
@@ -498,31 +564,71 @@ class ProductViewSet(viewsets.ModelViewSet):
 
     @swagger_auto_schema(
         manual_parameters=[
-            openapi.Parameter("sort_by", openapi.IN_QUERY, description="Sorting options", type=openapi.TYPE_STRING),
+            openapi.Parameter("sort_by", openapi.IN_QUERY, description="Sorting options (a_z, z_a, low_to_high, high_to_low, date-acs, date-desc, relevance). Keyword searches default to relevance.", type=openapi.TYPE_STRING),
             openapi.Parameter("keyword", openapi.IN_QUERY, description="Search by product, brand, or category", type=openapi.TYPE_STRING),
-            openapi.Parameter("price_range", openapi.IN_QUERY, description="Price range: min_max (e.g., 100_500)", type=openapi.TYPE_STRING),
+            openapi.Parameter("price_range", openapi.IN_QUERY, description="Price range: min_max (e.g., 100_500) or min_ for no upper limit", type=openapi.TYPE_STRING),
             openapi.Parameter("category", openapi.IN_QUERY, description="Filter by category ID", type=openapi.TYPE_INTEGER),
             openapi.Parameter("brand", openapi.IN_QUERY, description="Filter by brand ID", type=openapi.TYPE_INTEGER),
             openapi.Parameter("limit", openapi.IN_QUERY, description="Results per page", type=openapi.TYPE_INTEGER),
             openapi.Parameter("page", openapi.IN_QUERY, description="Page number", type=openapi.TYPE_INTEGER),
+            openapi.Parameter("pagination", openapi.IN_QUERY, description="Set to 'cursor' for keyset pagination", type=openapi.TYPE_STRING),
+            openapi.Parameter("cursor", openapi.IN_QUERY, description="Opaque cursor from next_cursor/previous_cursor", type=openapi.TYPE_STRING),
+            openapi.Parameter("fields", openapi.IN_QUERY, description="Comma-separated subset of fields to return", type=openapi.TYPE_STRING),
+            openapi.Parameter("expand", openapi.IN_QUERY, description="Comma-separated nested objects to include (seller)", type=openapi.TYPE_STRING),
+            openapi.Parameter("stream", openapi.IN_QUERY, description="Set to 'true' to stream every matching product as one JSON array, without pagination", type=openapi.TYPE_STRING),
         ]
     )
     def list(self, request, *args, **kwargs):
-        queryset = self.get_queryset()
+        if self.stream_requested():
+            fast = ValuesSerializer(self.get_serializer())
+            return self.stream_response(fast, fast.values(self.get_queryset()))
+
+        # Anonymous browsing is served from the shared catalog cache
+        cache_key = None if request.user.is_authenticated else list_response_key(request)
+        if cache_key:
+            data = get_list_response(cache_key)
+            if data is not None:
+                return Response(data, headers={"X-Cache": "HIT"})
+
+        fast = ValuesSerializer(self.get_serializer())
+        queryset = fast.values(self.get_queryset())
         page = self.paginate_queryset(queryset)
         if page is not None:
-            serializer = self.get_serializer(page, many=True, context=self.get_serializer_context())
-            return self.get_paginated_response(serializer.data)
-        serializer = self.get_serializer(queryset, many=True, context=self.get_serializer_context())
-        return Response(serializer.data)
+            response = self.get_paginated_response(fast.render(page))
+        else:
+            response = Response(fast.render(queryset))
+
+        if cache_key:
+            set_list_response(cache_key, response.data)
+            response["X-Cache"] = "MISS"
+        return response
 
     def retrieve(self, request, *args, **kwargs):
         instance = self.get_object()
         serializer = self.get_serializer(instance, context=self.get_serializer_context())
-        return Response(serializer.data)
+        return Response(serializer.data, headers={"ETag": etag(instance.version)})
+
+    @swagger_auto_schema(operation_description="Hit/miss counters for the anonymous product list cache (staff only)")
+    @action(detail=False, methods=['get'], url_path='cache-stats', permission_classes=[IsAdminUser])
+    def cache_stats(self, request):
+        return Response(list_cache_stats(), status=status.HTTP_200_OK)
+
+    @swagger_auto_schema(
+        operation_description="Counts per category, brand, condition, size, color and price range for the filtered catalog",
+        manual_parameters=[
+            openapi.Parameter("keyword", openapi.IN_QUERY, description="Search by product, brand, or category", type=openapi.TYPE_STRING),
+            openapi.Parameter("price_range", openapi.IN_QUERY, description="Price range: min_max (e.g., 100_500) or min_ for no upper limit", type=openapi.TYPE_STRING),
+            openapi.Parameter("category", openapi.IN_QUERY, description="Filter by category ID", type=openapi.TYPE_INTEGER),
+            openapi.Parameter("brand", openapi.IN_QUERY, description="Filter by brand ID", type=openapi.TYPE_INTEGER),
+        ]
+    )
+    @action(detail=False, methods=['get'])
+    def facets(self, request):
+        filters = normalize_product_filters(request.query_params)
+        return Response(get_product_facets(filters), status=status.HTTP_200_OK)
 
 class ProductDetailView(generics.RetrieveAPIView):
-    queryset = Product.objects.all()
+    queryset = Product.objects.select_related('seller', 'category', 'brand')
     serializer_class = ProductSerializer
     lookup_field = 'id'
 
@@ -536,9 +642,9 @@ class BrandViewSet(viewsets.ModelViewSet):
     serializer_class = BrandSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
 
-class MyProductsView(ListAPIView):
-    serializer_class = ProductSerializer
-    authentication_classes = [JWTAuthentication]
+class MyProductsView(FastListMixin, ListAPIView):
+    serializer_class = ProductListSerializer
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
@@ -546,7 +652,7 @@ class MyProductsView(ListAPIView):
 
 class PlaceOrderView(APIView):
     permission_classes = [IsAuthenticated]
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
 
     @swagger_auto_schema(
         operation_description="Place an order for one or more products",
@@ -574,8 +680,9 @@ class PlaceOrderView(APIView):
         ),
         responses={
             200: openapi.Response("Order(s) placed successfully"),
-            400: openapi.Response("No orders provided"),
-            404: openapi.Response("Product not found")
+            400: openapi.Response("No orders provided or invalid order lines"),
+            404: openapi.Response("Product not found"),
+            409: openapi.Response("Product already ordered")
         }
     )
     def post(self, request):
@@ -583,95 +690,337 @@ class PlaceOrderView(APIView):
         if not orders_data:
             return Response({"error": "No orders provided"}, status=status.HTTP_400_BAD_REQUEST)
 
-        created_orders = []
-        for item in orders_data:
-            try:
-                product = Product.objects.get(id=item.get("product"))
-                order = Order.objects.create(
-                    buyer=request.user,
-                    product=product,
-                    quantity=item.get("quantity", 1),
-                    total_price=product.second_hand_price * item.get("quantity", 1),
-                )
-                created_orders.append(OrderSerializer(order).data)
-            except Product.DoesNotExist:
-                logger.warning(f"Product with ID {item.get('product')} not found for user {request.user.id}")
-                return Response({"error": f"Product with ID {item.get('product')} not found"}, status=status.HTTP_404_NOT_FOUND)
+        try:
+            orders = place_orders(request.user, orders_data)
+        except CheckoutError as e:
+            logger.warning(f"Checkout rejected for user {request.user.id}: {e.message}")
+            return Response({"error": e.message}, status=e.status_code)
 
-        logger.info(f"User {request.user.id} placed order(s): {created_orders}")
+        created_orders = OrderSerializer(orders, many=True).data
+        logger.info(f"User {request.user.id} placed order(s): {[order.id for order in orders]}")
         return Response({"message": "Order(s) placed successfully", "orders": created_orders}, status=status.HTTP_200_OK)
 
+class CartView(APIView):
+    permission_classes = [IsAuthenticated]
+    authentication_classes = [CachedJWTAuthentication]
+
+    @swagger_auto_schema(
+        operation_description="List the items in your cart, at the prices they were added at",
+        responses={200: openapi.Response("Cart contents")}
+    )
+    def get(self, request):
+        return Response(render_cart(get_cart_lines(request.user), request), status=status.HTTP_200_OK)
+
+class CartItemView(APIView):
+    permission_classes = [IsAuthenticated]
+    authentication_classes = [CachedJWTAuthentication]
+
+    @swagger_auto_schema(
+        operation_description="Add a product to your cart, or change its quantity",
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                'product': openapi.Schema(type=openapi.TYPE_INTEGER, description='Product ID'),
+                'quantity': openapi.Schema(type=openapi.TYPE_INTEGER, description='Quantity', default=1),
+            },
+            required=['product'],
+            example={'product': 1, 'quantity': 1}
+        ),
+        responses={
+            200: openapi.Response("Cart item updated"),
+            201: openapi.Response("Product added to cart"),
+            400: openapi.Response("Invalid quantity or cart full"),
+            404: openapi.Response("Product not found")
+        }
+    )
+    def post(self, request):
+        try:
+            created = add_item(request.user, request.data.get("product"), request.data.get("quantity", 1))
+        except CheckoutError as e:
+            return Response({"error": e.message}, status=e.status_code)
+        logger.info(f"User {request.user.id} put product {request.data.get('product')} in their cart")
+        return Response(
+            render_cart(get_cart_lines(request.user), request),
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK,
+        )
+
+class CartItemDetailView(APIView):
+    permission_classes = [IsAuthenticated]
+    authentication_classes = [CachedJWTAuthentication]
+
+    @swagger_auto_schema(
+        operation_description="Remove a product from your cart",
+        responses={
+            200: openapi.Response("Product removed"),
+            404: openapi.Response("Product not in cart")
+        }
+    )
+    def delete(self, request, product_id):
+        if not remove_item(request.user, product_id):
+            return Response({"error": "Product is not in your cart."}, status=status.HTTP_404_NOT_FOUND)
+        return Response(render_cart(get_cart_lines(request.user), request), status=status.HTTP_200_OK)
+
+class CartCheckoutView(APIView):
+    permission_classes = [IsAuthenticated]
+    authentication_classes = [CachedJWTAuthentication]
+
+    @swagger_auto_schema(
+        operation_description="Place orders for everything in your cart at the listed prices and empty it",
+        responses={
+            200: openapi.Response("Order(s) placed successfully"),
+            400: openapi.Response("Cart is empty"),
+            404: openapi.Response("Product no longer available"),
+            409: openapi.Response("Prices changed or product already ordered")
+        }
+    )
+    def post(self, request):
+        try:
+            orders = checkout_cart(request.user)
+        except PriceChanged as e:
+            logger.info(f"Cart checkout for user {request.user.id} stopped: {e.message}")
+            return Response(
+                {"error": e.message, "cart": render_cart(get_cart_lines(request.user), request)},
+                status=e.status_code,
+            )
+        except CheckoutError as e:
+            logger.warning(f"Cart checkout rejected for user {request.user.id}: {e.message}")
+            return Response({"error": e.message}, status=e.status_code)
+
+        logger.info(f"User {request.user.id} checked out their cart: {[order.id for order in orders]}")
+        return Response(
+            {"message": "Order(s) placed successfully", "orders": OrderSerializer(orders, many=True).data},
+            status=status.HTTP_200_OK,
+        )
+
 class OrderPaymentView(APIView):
     permission_classes = [IsAuthenticated]
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
 
     @swagger_auto_schema(
-        operation_description="Process payment for an order",
+        operation_description="Queue a payment for an order. The charge runs in the background; poll the returned status URL.",
+        manual_parameters=[
+            openapi.Parameter("Idempotency-Key", openapi.IN_HEADER, description="Repeat-safe key; resending it returns the same payment", type=openapi.TYPE_STRING),
+        ],
         responses={
-            200: openapi.Response("Payment successful"),
+            202: openapi.Response("Payment queued"),
             400: openapi.Response("Order already paid"),
             404: openapi.Response("Order not found")
         }
     )
     def post(self, request, order_id):
+        idempotency_key = (request.headers.get("Idempotency-Key") or "").strip()[:64] or None
         try:
-            order = Order.objects.get(id=order_id, buyer=request.user)
-            if order.payment_status == 'Paid':
-                logger.info(f"Order {order_id} already paid by user {request.user.id}")
-                return Response({"message": "Order already paid."}, status=status.HTTP_400_BAD_REQUEST)
-            order.payment_status = 'Paid'
-            order.save()
-            logger.info(f"Payment successful for order {order_id} by user {request.user.id}")
-            return Response({"message": "Payment successful."}, status=status.HTTP_200_OK)
+            attempt, created = request_payment(order_id, request.user, idempotency_key)
         except Order.DoesNotExist:
             logger.warning(f"Order {order_id} not found for user {request.user.id}")
             return Response({"error": "Order not found."}, status=status.HTTP_404_NOT_FOUND)
+        except PaymentError as e:
+            logger.info(f"Payment for order {order_id} rejected for user {request.user.id}: {e.message}")
+            return Response({"message": e.message}, status=e.status_code)
+
+        if created:
+            logger.info(f"Payment {attempt.id} queued for order {order_id} by user {request.user.id}")
+        status_url = reverse('payment_status', kwargs={'payment_id': attempt.id})
+        return Response(
+            {
+                "message": "Payment is being processed.",
+                "payment": PaymentAttemptSerializer(attempt).data,
+                "status_url": request.build_absolute_uri(status_url),
+            },
+            status=status.HTTP_202_ACCEPTED,
+            headers={"Location": status_url, "Retry-After": "1"},
+        )
 
-class SellerOrderView(ListAPIView):
+class PaymentStatusView(APIView):
+    permission_classes = [IsAuthenticated]
+    authentication_classes = [CachedJWTAuthentication]
+
+    @swagger_auto_schema(
+        operation_description="Status of a queued payment",
+        responses={
+            200: openapi.Response("Payment status"),
+            404: openapi.Response("Payment not found")
+        }
+    )
+    def get(self, request, payment_id):
+        attempt = PaymentAttempt.objects.select_related('order').filter(id=payment_id, order__buyer=request.user).first()
+        if attempt is None:
+            return Response({"error": "Payment not found."}, status=status.HTTP_404_NOT_FOUND)
+        headers = {"Retry-After": "1"} if attempt.status in ('Queued', 'Processing') else {}
+        return Response(PaymentAttemptSerializer(attempt).data, status=status.HTTP_200_OK, headers=headers)
+
+class SellerOrderView(FastListMixin, ListAPIView):
     serializer_class = OrderSerializer
     permission_classes = [IsAuthenticated]
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
+    pagination_class = OrderCursorPagination
+
+    @swagger_auto_schema(operation_description="Orders for the current seller's products, newest first", manual_parameters=ORDER_LIST_PARAMETERS)
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
 
     def get_queryset(self):
-        return Order.objects.filter(product__seller=self.request.user).order_by('-created_at')
+        filters = normalize_order_filters(self.request.query_params)
+        return filter_orders(Order.objects.filter(seller=self.request.user), filters).order_by('-created_at')
+
+class SellerOrderExportView(APIView):
+    permission_classes = [IsAuthenticated]
+    authentication_classes = [CachedJWTAuthentication]
+
+    @swagger_auto_schema(
+        operation_description="Download the current seller's orders as CSV or NDJSON, with product and buyer columns",
+        manual_parameters=[
+            openapi.Parameter("output", openapi.IN_QUERY, description="csv (default) or ndjson", type=openapi.TYPE_STRING),
+        ] + [parameter for parameter in ORDER_LIST_PARAMETERS if parameter.name not in ("limit", "cursor")],
+        responses={
+            200: openapi.Response("Streamed export"),
+            400: openapi.Response("Unsupported output format")
+        }
+    )
+    def get(self, request):
+        output = request.query_params.get("output", "csv").lower()
+        if output not in EXPORT_FORMATS:
+            return Response({"error": f"output must be one of: {', '.join(EXPORT_FORMATS)}"}, status=status.HTTP_400_BAD_REQUEST)
+
+        filters = normalize_order_filters(request.query_params)
+        queryset = filter_orders(Order.objects.filter(seller=request.user), filters).order_by('-created_at', '-id')
+        rows = export_rows(queryset)
+        content = iter_csv(rows) if output == "csv" else iter_ndjson(rows)
+
+        response = StreamingHttpResponse(content, content_type=EXPORT_FORMATS[output])
+        response["Content-Disposition"] = f'attachment; filename="orders-{timezone.localdate():%Y%m%d}.{output}"'
+        logger.info(f"Seller {request.user.id} exported orders as {output} with filters {filters}")
+        return response
+
+class SellerSalesSummaryView(APIView):
+    permission_classes = [IsAuthenticated]
+    authentication_classes = [CachedJWTAuthentication]
+    default_days = 30
+
+    @staticmethod
+    def parse_day(value):
+        if not value:
+            return None
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(value)
+        return day
+
+    @swagger_auto_schema(
+        operation_description="Sales totals for the current seller plus one row per day orders were placed",
+        manual_parameters=[
+            openapi.Parameter("created_from", openapi.IN_QUERY, description="First day of the daily rows (YYYY-MM-DD), default 30 days ago", type=openapi.TYPE_STRING),
+            openapi.Parameter("created_to", openapi.IN_QUERY, description="Last day of the daily rows (YYYY-MM-DD)", type=openapi.TYPE_STRING),
+        ],
+        responses={
+            200: openapi.Response("Sales summary"),
+            400: openapi.Response("Invalid date")
+        }
+    )
+    def get(self, request):
+        try:
+            day_from = self.parse_day(request.query_params.get("created_from"))
+            day_to = self.parse_day(request.query_params.get("created_to"))
+        except ValueError:
+            return Response({"error": "Dates must be in YYYY-MM-DD format."}, status=status.HTTP_400_BAD_REQUEST)
+        if day_from is None:
+            day_from = timezone.localdate() - timedelta(days=self.default_days - 1)
+
+        summary, daily = get_seller_summary(request.user, day_from, day_to)
+        return Response({
+            "summary": SellerSalesSummarySerializer(summary).data,
+            "daily": SellerDailySalesSerializer(daily, many=True).data,
+        }, status=status.HTTP_200_OK)
 
 class UpdateOrderStatusView(APIView):
     permission_classes = [IsAuthenticated]
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
 
     @swagger_auto_schema(
-        operation_description="Update the status of an order (seller only)",
+        operation_description="Update the status of an order (seller only). Send the order version as If-Match or 'version' to reject stale updates.",
+        manual_parameters=[
+            openapi.Parameter("If-Match", openapi.IN_HEADER, description="Order version the update is based on", type=openapi.TYPE_STRING),
+        ],
         request_body=openapi.Schema(
             type=openapi.TYPE_OBJECT,
             properties={
                 'status': openapi.Schema(type=openapi.TYPE_STRING, description='Order status (Pending, Shipped, Delivered)'),
+                'version': openapi.Schema(type=openapi.TYPE_INTEGER, description='Order version the update is based on'),
             },
             required=['status'],
-            example={'status': 'Shipped'}
+            example={'status': 'Shipped', 'version': 1}
         ),
         responses={
             200: openapi.Response("Order status updated successfully"),
             400: openapi.Response("Invalid status"),
-            404: openapi.Response("Order not found or unauthorized")
+            404: openapi.Response("Order not found or unauthorized"),
+            409: openapi.Response("Order changed concurrently or transition not allowed")
         }
     )
     def put(self, request, order_id):
         status_value = request.data.get("status")
-        if status_value not in ['Pending', 'Shipped', 'Delivered']:
-            return Response({"error": "Invalid status"}, status=status.HTTP_400_BAD_REQUEST)
-
         try:
-            order = Order.objects.get(id=order_id, product__seller=request.user)
-            order.status = status_value
-            order.save()
-            logger.info(f"Order {order_id} status updated to {status_value} by seller {request.user.id}")
-            return Response({"message": "Order status updated successfully."}, status=status.HTTP_200_OK)
+            result, version = update_order_status(request.user, order_id, status_value, expected_version(request))
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
         except Order.DoesNotExist:
             logger.warning(f"Order {order_id} not found or user {request.user.id} is not the seller")
             return Response({"error": "Order not found or you're not the seller."}, status=status.HTTP_404_NOT_FOUND)
+        except VersionConflict as e:
+            logger.info(f"Order {order_id} status update by seller {request.user.id} conflicted: {e.message}")
+            return Response({"error": e.message, "version": e.current_version}, status=e.status_code)
+        except OrderStatusError as e:
+            return Response({"error": e.message}, status=e.status_code)
+
+        if result == UPDATED:
+            logger.info(f"Order {order_id} status updated to {status_value} by seller {request.user.id}")
+        return Response(
+            {"message": "Order status updated successfully.", "status": status_value, "version": version},
+            status=status.HTTP_200_OK,
+            headers={"ETag": etag(version)},
+        )
+
+class BulkUpdateOrderStatusView(APIView):
+    permission_classes = [IsAuthenticated]
+    authentication_classes = [CachedJWTAuthentication]
+
+    @swagger_auto_schema(
+        operation_description="Update the status of many orders at once (seller only). Each id is reported as updated, unchanged, not_found or invalid_transition.",
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                'order_ids': openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_INTEGER), description='Order IDs'),
+                'status': openapi.Schema(type=openapi.TYPE_STRING, description='Target status (Shipped, Delivered)'),
+            },
+            required=['order_ids', 'status'],
+            example={'order_ids': [12, 13, 14], 'status': 'Shipped'}
+        ),
+        responses={
+            200: openapi.Response("Per-order results"),
+            400: openapi.Response("Invalid status or order IDs"),
+            409: openapi.Response("Orders changed concurrently")
+        }
+    )
+    def post(self, request):
+        try:
+            results = bulk_update_status(request.user, request.data.get("order_ids"), request.data.get("status"))
+        except OrderStatusError as e:
+            logger.warning(f"Bulk status update rejected for seller {request.user.id}: {e.message}")
+            return Response({"error": e.message}, status=e.status_code)
+
+        updated = [result["id"] for result in results if result["result"] == UPDATED]
+        logger.info(f"Seller {request.user.id} moved orders {updated} to {request.data.get('status')}")
+        return Response({
+            "message": f"{len(updated)} order(s) updated.",
+            "updated": len(updated),
+            "results": results,
+        }, status=status.HTTP_200_OK)
 
 class ForgotPasswordView(APIView):
     permission_classes = [AllowAny]
+    authentication_classes = []
+    throttle_classes = AUTH_THROTTLES
+    throttle_scope = 'forgot_password'
 
     @swagger_auto_schema(
         operation_description="Send a password reset link to the user's email address or via SMS to their phone number",
@@ -688,6 +1037,7 @@ class ForgotPasswordView(APIView):
             200: openapi.Response("Reset link sent"),
             400: openapi.Response("Email or phone number required"),
             404: openapi.Response("User not found"),
+            429: openapi.Response("Too many requests"),
             500: openapi.Response("Failed to send reset email or SMS")
         }
     )
@@ -705,19 +1055,23 @@ class ForgotPasswordView(APIView):
                 user = CustomUser.objects.get(phone_number=phone_number)
 
             token = secrets.token_urlsafe(32)
-            PasswordResetToken.objects.filter(user=user).delete()
-            reset_token = PasswordResetToken(user=user, token=token)
-            reset_token.save()
-
             reset_url = f"https://ladyfirst.me/reset-password/{token}/"
+            message = f"Use this link to reset your password: {reset_url}\nIt is valid for 1 hour."
 
-            if email:  # Simulate sending email by logging
-                logger.info(f"[DEV] Password reset link would be sent via email to {email} for user ID {user.id}: {reset_url}")
-                print(f"[DEV] Password reset link for {email}: {reset_url}")  # Also print to console for easy access
+            with transaction.atomic():
+                PasswordResetToken.objects.filter(user=user).delete()
+                reset_token = PasswordResetToken(user=user, token=token)
+                reset_token.save()
+                if email:
+                    enqueue_email(email, "Reset your password", message)
+                else:
+                    enqueue_sms(phone_number, message)
+
+            if email:
+                logger.info(f"Password reset link queued for email {email}, user ID {user.id}")
                 return Response({"message": "Reset link sent to your email"}, status=status.HTTP_200_OK)
-            else:  # Simulate sending SMS by logging
-                logger.info(f"[DEV] Password reset link would be sent via SMS to {phone_number} for user ID {user.id}: {reset_url}")
-                print(f"[DEV] Password reset link for {phone_number}: {reset_url}")  # Also print to console
+            else:
+                logger.info(f"Password reset link queued for SMS to {phone_number}, user ID {user.id}")
                 return Response({"message": "Reset link sent via SMS to your phone"}, status=status.HTTP_200_OK)
 
         except CustomUser.DoesNotExist:
@@ -730,6 +1084,9 @@ class ForgotPasswordView(APIView):
 
 class ResetPasswordView(APIView):
     permission_classes = [AllowAny]
+    authentication_classes = []
+    throttle_classes = AUTH_THROTTLES
+    throttle_scope = 'reset_password'
 
     @swagger_auto_schema(
         operation_description="Reset user's password using a valid token",
@@ -61,15 +61,19 @@ DEFAULT_FROM_EMAIL = 'support@ladyfirst.com'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'accounts.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
     'DEFAULT_RENDERER_CLASSES': (
-        'rest_framework.renderers.JSONRenderer',
+        'accounts.renderers.FastJSONRenderer',
         'rest_framework.renderers.BrowsableAPIRenderer',
     ),
+    # Reverse proxies in front of the app. Throttles identify clients by the
+    # address this many hops from the end of X-Forwarded-For; 0 ignores the
+    # header and uses REMOTE_ADDR, so clients cannot pick their own address.
+    'NUM_PROXIES': config('NUM_PROXIES', default=0, cast=int),
 }
 
 SIMPLE_JWT = {
@@ -79,7 +83,101 @@ SIMPLE_JWT = {
     'BLACKLIST_AFTER_ROTATION': True,
     'UPDATE_LAST_LOGIN': True,
     'AUTH_HEADER_TYPES': ('Bearer',),
+    'TOKEN_REFRESH_SERIALIZER': 'accounts.serializers.FilteredTokenRefreshSerializer',
 }
+# Refreshes check an in-process Bloom filter of blacklisted tokens before the
+# database (see accounts/tokens.py); `manage.py prune_tokens` deletes expired ones
+JWT_BLACKLIST_FILTER = config('JWT_BLACKLIST_FILTER', default=True, cast=bool)
+JWT_BLACKLIST_FILTER_FP_RATE = config('JWT_BLACKLIST_FILTER_FP_RATE', default=0.01, cast=float)
+JWT_BLACKLIST_SYNC_INTERVAL = config('JWT_BLACKLIST_SYNC_INTERVAL', default=1, cast=float)
+JWT_BLACKLIST_REBUILD_INTERVAL = config('JWT_BLACKLIST_REBUILD_INTERVAL', default=600, cast=int)
+# Seconds each worker reuses a user's id/username/flags for JWT-authenticated
+# requests (0 loads the user every time); see CachedJWTAuthentication
+AUTH_USER_CACHE_TTL = config('AUTH_USER_CACHE_TTL', default=30, cast=float)
+AUTH_USER_CACHE_MAX_ENTRIES = config('AUTH_USER_CACHE_MAX_ENTRIES', default=10000, cast=int)
+
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='ladyfirst'),
+    }
+}
+
+# Token-bucket limits for the anonymous auth endpoints (accounts.throttling),
+# as "<requests>/<sec|min|hour|day>" per client IP and per email/phone number.
+# The buckets must live in a cache shared by all workers in production.
+AUTH_THROTTLE_CACHE_ALIAS = config('AUTH_THROTTLE_CACHE_ALIAS', default='default')
+AUTH_THROTTLE_RATES = {
+    'login': {
+        'ip': config('THROTTLE_LOGIN_IP', default='30/min'),
+        'identifier': config('THROTTLE_LOGIN_IDENTIFIER', default='10/min'),
+    },
+    'send_otp': {
+        'ip': config('THROTTLE_SEND_OTP_IP', default='10/min'),
+        'identifier': config('THROTTLE_SEND_OTP_IDENTIFIER', default='3/min'),
+    },
+    'verify_otp': {
+        'ip': config('THROTTLE_VERIFY_OTP_IP', default='20/min'),
+        'identifier': config('THROTTLE_VERIFY_OTP_IDENTIFIER', default='5/min'),
+    },
+    'forgot_password': {
+        'ip': config('THROTTLE_FORGOT_PASSWORD_IP', default='10/min'),
+        'identifier': config('THROTTLE_FORGOT_PASSWORD_IDENTIFIER', default='3/min'),
+    },
+    'reset_password': {
+        'ip': config('THROTTLE_RESET_PASSWORD_IP', default='10/min'),
+    },
+    'register': {
+        'ip': config('THROTTLE_REGISTER_IP', default='10/min'),
+    },
+}
+
+# Cache alias holding anonymous product list responses, totals and facets
+PRODUCT_LIST_CACHE_ALIAS = config('PRODUCT_LIST_CACHE_ALIAS', default='default')
+PRODUCT_LIST_CACHE_TTL = config('PRODUCT_LIST_CACHE_TTL', default=300, cast=int)
+
+# Product catalog totals: exact counts are cached per filter set for
+# PRODUCT_COUNT_CACHE_TTL seconds and stop counting at PRODUCT_COUNT_CAP.
+PRODUCT_COUNT_CACHE_TTL = config('PRODUCT_COUNT_CACHE_TTL', default=60, cast=int)
+PRODUCT_COUNT_CAP = config('PRODUCT_COUNT_CAP', default=10000, cast=int)
+PRODUCT_FACETS_CACHE_TTL = config('PRODUCT_FACETS_CACHE_TTL', default=60, cast=int)
+
+# ?stream=true list responses are rendered and sent this many rows at a time
+LIST_STREAM_BATCH_SIZE = config('LIST_STREAM_BATCH_SIZE', default=500, cast=int)
+ORDER_EXPORT_CHUNK_SIZE = config('ORDER_EXPORT_CHUNK_SIZE', default=1000, cast=int)
+
+# Largest batch accepted by the seller bulk order status endpoint
+BULK_ORDER_STATUS_MAX_IDS = config('BULK_ORDER_STATUS_MAX_IDS', default=500, cast=int)
+
+# Server-side carts: cached per user, persisted as CartItem rows
+CART_CACHE_ALIAS = config('CART_CACHE_ALIAS', default='default')
+CART_CACHE_TTL = config('CART_CACHE_TTL', default=86400, cast=int)
+CART_MAX_ITEMS = config('CART_MAX_ITEMS', default=100, cast=int)
+# Seconds a product stays reserved after it is put in a cart; expired
+# reservations are returned to stock by `manage.py release_reservations`
+STOCK_RESERVATION_TTL = config('STOCK_RESERVATION_TTL', default=900, cast=int)
+
+# Payments are charged asynchronously by `manage.py process_payments`
+PAYMENT_GATEWAY = config('PAYMENT_GATEWAY', default='accounts.payments.FakeGateway')
+PAYMENT_GATEWAY_OPTIONS = {}
+PAYMENT_GATEWAY_TIMEOUT = config('PAYMENT_GATEWAY_TIMEOUT', default=10, cast=float)
+PAYMENT_MAX_ATTEMPTS = config('PAYMENT_MAX_ATTEMPTS', default=5, cast=int)
+PAYMENT_RETRY_BACKOFF = config('PAYMENT_RETRY_BACKOFF', default=5, cast=int)
+PAYMENT_LEASE_SECONDS = config('PAYMENT_LEASE_SECONDS', default=60, cast=int)
+PAYMENT_WORKERS = config('PAYMENT_WORKERS', default=4, cast=int)
+
+# OTP and password-reset messages are queued and sent by `manage.py process_outbox`
+OUTBOX_TRANSPORTS = {
+    'email': config('OUTBOX_EMAIL_TRANSPORT', default='accounts.outbox.EmailTransport'),
+    'sms': config('OUTBOX_SMS_TRANSPORT', default='accounts.outbox.LogSMSTransport'),
+}
+OUTBOX_TRANSPORT_OPTIONS = {}
+OUTBOX_BATCH_SIZE = config('OUTBOX_BATCH_SIZE', default=50, cast=int)
+OUTBOX_MAX_ATTEMPTS = config('OUTBOX_MAX_ATTEMPTS', default=5, cast=int)
+OUTBOX_RETRY_BACKOFF = config('OUTBOX_RETRY_BACKOFF', default=5, cast=int)
+OUTBOX_LEASE_SECONDS = config('OUTBOX_LEASE_SECONDS', default=60, cast=int)
+# Sent and failed messages (which contain codes and reset links) are deleted after this many seconds
+OUTBOX_RETENTION = config('OUTBOX_RETENTION', default=86400, cast=int)
 
 LOGGING = {
     'version': 1,
@@ -114,9 +212,27 @@ LOGGING = {
     },
 }
 
+# Handles email, phone number and username logins (it extends ModelBackend)
 AUTHENTICATION_BACKENDS = [
     'accounts.authentication.CustomAuthenticationBackend',
-    'django.contrib.auth.backends.ModelBackend',
+]
+
+# Password hashing profile. New and re-hashed passwords use
+# PASSWORD_HASH_ALGORITHM at the configured cost; changing either upgrades
+# each user's stored hash on their next login.
+PASSWORD_HASH_ALGORITHM = config('PASSWORD_HASH_ALGORITHM', default='pbkdf2_sha256')
+PASSWORD_HASH_ITERATIONS = config('PASSWORD_HASH_ITERATIONS', default=870000, cast=int)
+PASSWORD_HASH_SCRYPT_WORK_FACTOR = config('PASSWORD_HASH_SCRYPT_WORK_FACTOR', default=2 ** 14, cast=int)
+_TUNABLE_HASHERS = {
+    'pbkdf2_sha256': 'accounts.hashers.TunablePBKDF2PasswordHasher',
+    'scrypt': 'accounts.hashers.TunableScryptPasswordHasher',
+}
+PASSWORD_HASHERS = [
+    _TUNABLE_HASHERS[PASSWORD_HASH_ALGORITHM],
+    *[hasher for algorithm, hasher in _TUNABLE_HASHERS.items() if algorithm != PASSWORD_HASH_ALGORITHM],
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
 ]
 
 ROOT_URLCONF = 'myproject.urls'
@@ -143,6 +259,19 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Write transactions take the lock up front and wait for it instead of
+        # failing with "database is locked" when they upgrade from a read; WAL
+        # keeps readers running alongside the writer. WAL is stored in the
+        # database file and switched on once by migration 0026, so connecting
+        # does not rewrite the file.
+        'OPTIONS': {
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': config('SQLITE_BUSY_TIMEOUT', default=20, cast=int),
+            'init_command': 'PRAGMA synchronous=NORMAL;',
+        },
+        # In-memory SQLite fails concurrent writers at once instead of waiting,
+        # so the threaded tests run against a file
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
     }
 }
 